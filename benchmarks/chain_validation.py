@@ -0,0 +1,103 @@
+"""
+Benchmarks the blockchain validation that runs after each coin reaction.
+
+Builds synthetic chains of increasing length and measures, for each length,
+the time to validate one newly appended block with
+`IncrementalChainValidator.validate_new_blocks()`, compared to verifying the
+entire chain like `Blockchain.is_chain_valid()` did.
+
+Run from the repository root:
+    python benchmarks/chain_validation.py
+"""
+# region Imports
+# Standard library
+import json
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import abspath, dirname, join
+from time import perf_counter, time
+from typing import Any, Dict, List, TextIO
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# Local
+from models.chain_validator import IncrementalChainValidator  # noqa: E402
+from sponsorblockchain.models.block import Block  # noqa: E402
+# endregion
+
+# region Constants
+CHAIN_LENGTHS: List[int] = [1_000, 10_000, 50_000]
+NEW_BLOCKS: int = 200
+# endregion
+
+# region Chain
+
+
+def write_block(file: TextIO, index: int, previous_hash: str) -> str:
+    """
+    Appends a block with one reaction transaction to the chain file.
+
+    Returns:
+        str: The hash of the block.
+    """
+    data: List[Dict[str, Any]] = [{"transaction": {
+        "sender": f"sender{index}",
+        "receiver": f"receiver{index}",
+        "amount": 1,
+        "method": "reaction"}}]
+    block = Block(index=index,
+                  timestamp=time(),
+                  data=data,
+                  previous_block_hash=previous_hash,
+                  nonce=0)
+    block_hash: str = block.calculate_hash()
+    file.write(json.dumps({"index": index,
+                           "timestamp": block.timestamp,
+                           "data": data,
+                           "previous_block_hash": previous_hash,
+                           "nonce": 0,
+                           "hash": block_hash}) + "\n")
+    return block_hash
+# endregion
+
+# region Benchmark
+
+
+def benchmark(chain_length: int, directory: str) -> None:
+    """
+    Prints the time to validate a new block, and to verify the entire
+    chain, at the given chain length.
+    """
+    chain_file_name: str = join(directory, f"chain_{chain_length}.json")
+    previous_hash: str = "0"
+    with open(chain_file_name, "w") as file:
+        for index in range(chain_length):
+            previous_hash = write_block(file, index, previous_hash)
+    validator = IncrementalChainValidator(chain_file_name=chain_file_name)
+    with redirect_stdout(StringIO()):
+        started_at: float = perf_counter()
+        assert validator.full_audit()
+        full_elapsed: float = perf_counter() - started_at
+    incremental_elapsed: float = 0.0
+    for index in range(chain_length, chain_length + NEW_BLOCKS):
+        with open(chain_file_name, "a") as file:
+            previous_hash = write_block(file, index, previous_hash)
+        started_at = perf_counter()
+        assert validator.validate_new_blocks()
+        incremental_elapsed += perf_counter() - started_at
+    print(f"{chain_length:>10,} blocks: "
+          f"new block {incremental_elapsed / NEW_BLOCKS * 1000:8.3f} ms, "
+          f"entire chain {full_elapsed * 1000:10.1f} ms")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for chain_length in CHAIN_LENGTHS:
+            benchmark(chain_length, directory)
+# endregion
+
+
+if __name__ == "__main__":
+    main()
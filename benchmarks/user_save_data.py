@@ -0,0 +1,108 @@
+"""
+Benchmarks the construction of `UserSaveData` for an existing user.
+
+Writes save data files with an increasing number of mined messages and
+measures, for each, the time to construct an instance that reads the file,
+and an instance served from the save data cache.
+
+Run from the repository root:
+    python benchmarks/user_save_data.py
+"""
+# region Imports
+# Standard library
+import json
+import sys
+import tempfile
+from os import chdir, getcwd, makedirs
+from os.path import abspath, dirname
+from time import perf_counter
+from typing import Any, Dict, List
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+# Local
+import core.global_state as g  # noqa: E402
+from models.user_save_data import UserSaveData  # noqa: E402
+from models.user_save_data_cache import UserSaveDataCache  # noqa: E402
+# endregion
+
+# region Constants
+MINED_MESSAGE_COUNTS: List[int] = [0, 2_000]
+CONSTRUCTIONS: int = 2_000
+USER_NAME: str = "benchmark"
+# endregion
+
+# region Save data
+
+
+def write_save_data(user_id: int, mined_message_count: int) -> None:
+    """
+    Writes a save data file for the user, with the given number of mined
+    messages.
+    """
+    record: Dict[str, Any] = {
+        "user_name": USER_NAME,
+        "has_visited_casino": True,
+        "starting_bonus_available": False,
+        "when_last_bonus_received": 1_700_000_000.0,
+        "starting_bonus_level": 2,
+        "reaction_message_received": True,
+        "mining_messages_enabled": True,
+        "network_mining_mentions_enabled": False,
+        "network_mining_highlights_mentions_enabled": False,
+        "blocked_from_receiving_coins": False,
+        "blocked_from_receiving_coins_reason": None,
+        "messages_mined": list(range(mined_message_count))}
+    directory: str = f"data/save_data/{user_id}"
+    makedirs(directory, exist_ok=True)
+    with open(f"{directory}/save_data.json", "w") as file:
+        json.dump(record, file)
+# endregion
+
+# region Benchmark
+
+
+def time_constructions(user_id: int) -> float:
+    """
+    Returns the average time, in microseconds, to construct an instance.
+    """
+    started_at: float = perf_counter()
+    for _ in range(CONSTRUCTIONS):
+        UserSaveData(user_id=user_id, user_name=USER_NAME)
+    return (perf_counter() - started_at) / CONSTRUCTIONS * 1_000_000
+
+
+def benchmark(mined_message_count: int) -> None:
+    """
+    Prints the time to construct an instance that reads the save data file,
+    and one that is served from the save data cache.
+    """
+    user_id: int = mined_message_count + 1
+    write_save_data(user_id, mined_message_count)
+    g.user_save_data_cache = None
+    file_elapsed: float = time_constructions(user_id)
+    # The flusher thread is not started, and no values are saved
+    g.user_save_data_cache = UserSaveDataCache()
+    cached_elapsed: float = time_constructions(user_id)
+    g.user_save_data_cache = None
+    print(f"{mined_message_count:>6,} mined messages: "
+          f"file {file_elapsed:8.1f} us, "
+          f"cached {cached_elapsed:8.1f} us per instance")
+
+
+def main() -> None:
+    g.mined_messages_store = None
+    g.user_identity_index = None
+    working_directory: str = getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        chdir(directory)
+        try:
+            for mined_message_count in MINED_MESSAGE_COUNTS:
+                benchmark(mined_message_count)
+        finally:
+            chdir(working_directory)
+# endregion
+
+
+if __name__ == "__main__":
+    main()
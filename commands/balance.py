@@ -1,7 +1,4 @@
 # region Imports
-# Standard library
-from hashlib import sha256
-
 # Third party
 from discord import Interaction, Member, app_commands, AllowedMentions
 from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
@@ -9,8 +6,8 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
+from utils.blockchain_utils import get_balance
 from utils.formatting import format_coin_label
-from sponsorblockchain.models.blockchain import Blockchain
 
 # region /balance
 assert isinstance(g.bot, Bot), "bot has not been initialized."
@@ -31,8 +28,7 @@ async def balance(interaction: Interaction,
 
         user: The user to check the balance. Defaults to None.
     """
-    from core.global_state import coins, blockchain
-    assert isinstance(blockchain, Blockchain)
+    from core.global_state import coins
     user_to_check: str
     if user is None:
         user_to_check = interaction.user.mention
@@ -42,8 +38,7 @@ async def balance(interaction: Interaction,
         user_id: int = user.id
 
     # print(f"Getting balance for user {user_to_check} ({user_id})...")
-    user_id_hash: str = sha256(str(user_id).encode()).hexdigest()
-    balance: int | None = blockchain.get_balance(user=user_id_hash)
+    balance: int | None = get_balance(user_id)
     message_content: str = ""
     if balance is None and user is None:
         message_content = f"You have 0 {coins}."
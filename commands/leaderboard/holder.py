@@ -1,14 +1,12 @@
 # region Imports
-# Standard library
-from typing import Any, cast
-
 # Third party
-from numpy import ndarray
-import pandas as pd
 from discord import Interaction, Member, User, app_commands
 
 # Local
 import core.global_state as g
+from models.balance_ledger import BalanceLedger
+from models.user_identity import UserIdentityIndex
+from schemas.typed import UserIdentity
 from utils.formatting import format_coin_label
 from .leaderboard_main import leaderboard_group
 # endregion
@@ -28,8 +26,10 @@ async def holder(interaction: Interaction,
     """
     assert g.bot, (
         "Bot is not initialized.")
-    assert g.decrypted_transactions_spreadsheet, (
-        "Decrypted transactions spreadsheet is not initialized.")
+    assert isinstance(g.balance_ledger, BalanceLedger), (
+        "Balance ledger is not initialized.")
+    assert isinstance(g.user_identity_index, UserIdentityIndex), (
+        "User identity index is not initialized.")
     if g.leaderboard_holder_blocked:
         if (g.donation_goal is not None and
                 g.donation_goal.reward_setting_key
@@ -48,48 +48,19 @@ async def holder(interaction: Interaction,
                                                 ephemeral=private)
         return
     await interaction.response.defer(thinking=True, ephemeral=private)
-    g.decrypted_transactions_spreadsheet.decrypt()
-
-    transactions_decrypted: pd.DataFrame = (
-        pd.read_csv(  # pyright: ignore[reportUnknownMemberType]
-            g.decrypted_transactions_spreadsheet.decrypted_spreadsheet_path,
-            sep="\t", dtype={"Sender": str, "Receiver": str, "Method": str,
-                             "Amount": str}))
     invoker: User | Member = interaction.user
     invoker_name: str = invoker.name
-    transactions_decrypted["Sender"] = transactions_decrypted["Sender"]
-    transactions_decrypted["Receiver"] = transactions_decrypted["Receiver"]
-    transactions_decrypted["Receiver (normalized)"] = (
-        transactions_decrypted["Receiver"].astype(str).str.strip().str.lower()
-    )
+    # The balance ledger already holds the balance of every account,
+    # so there is no need to replay the transactions spreadsheet
     holder: dict[str, int] = {}
-    senders_extracted: pd.Series[str | float] = (
-        transactions_decrypted["Sender"])
-    unique_senders: ndarray[Any, Any] = (
-        senders_extracted
-        .unique())  # pyright: ignore[reportUnknownMemberType]
-    for sender in unique_senders:
-        balance: int = 0
-        user_receipts: (  # pyright: ignore[reportUnknownVariableType]
-            pd.Series[str]) = transactions_decrypted[
-            (transactions_decrypted["Receiver"] == sender)
-        ]["Amount"]
-        for receipt in (  # pyright: ignore[reportUnknownVariableType]
-            user_receipts):
-            receipt: str = cast(str, receipt)
-            balance += int(receipt)
-        user_remittances: (  # pyright: ignore[reportUnknownVariableType]
-            pd.Series[str]) = transactions_decrypted[
-            (transactions_decrypted["Sender"] == sender) &
-            (transactions_decrypted["Method"] != "reaction") &
-            (transactions_decrypted["Method"] != "reaction_network")
-        ]["Amount"]
-        for remittance in (  # pyright: ignore[reportUnknownVariableType]
-            user_remittances):
-            remittance: str = cast(str, remittance)
-            balance -= int(remittance)
-        if balance != 0:
-            holder[sender] = balance
+    for user_id_hash, balance in g.balance_ledger.get_balances().items():
+        if balance == 0:
+            continue
+        holder_identity: UserIdentity | None = (
+            g.user_identity_index.get(user_id_hash))
+        if holder_identity is None:
+            continue
+        holder[holder_identity["user_name"]] = balance
     holder = dict(sorted(
         holder.items(), key=lambda item: item[1], reverse=True))
     message_content: str = f"## Top {g.coin} holders\n"
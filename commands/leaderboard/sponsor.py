@@ -1,14 +1,15 @@
 # region Imports
 # Standard library
-from typing import Any, cast
+from typing import Dict, List
 
 # Third party
-from numpy import ndarray
-import pandas as pd
 from discord import Interaction, Member, User, app_commands
 
 # Local
 import core.global_state as g
+from models.transaction_index import TransactionIndex
+from models.user_identity import UserIdentityIndex, hash_user_id
+from schemas.typed import TransactionRow, UserIdentity
 from utils.formatting import format_coin_label
 from utils.smart_send_interaction_message import smart_send_interaction_message
 from .leaderboard_main import leaderboard_group
@@ -29,55 +30,32 @@ async def sponsor(interaction: Interaction,
     """
     assert g.bot, (
         "Bot is not initialized.")
-    assert g.decrypted_transactions_spreadsheet, (
-        "Decrypted transactions spreadsheet is not initialized.")
-    g.decrypted_transactions_spreadsheet.decrypt()
-
-    transactions_decrypted: pd.DataFrame = (
-        pd.read_csv(  # pyright: ignore[reportUnknownMemberType]
-            g.decrypted_transactions_spreadsheet.decrypted_spreadsheet_path,
-            sep="\t", dtype={"Sender": str, "Receiver": str, "Method": str,
-                             "Amount": str}))
+    assert isinstance(g.transaction_index, TransactionIndex), (
+        "Transaction index is not initialized.")
+    assert isinstance(g.user_identity_index, UserIdentityIndex), (
+        "User identity index is not initialized.")
     has_sent_message: bool = False
     invoker: User | Member = interaction.user
     invoker_name: str = invoker.name
-    try:
-        casino_house: User = await g.bot.fetch_user(g.casino_house_id)
-    except Exception as e:
-        print(f"Error fetching casino house: {e}")
-        await interaction.response.send_message(
-            "Error fetching casino house. Please try again later.",
-            ephemeral=True)
-        return
-    casino_username: str = casino_house.name
-    transactions_decrypted["Sender"] = transactions_decrypted[
-        "Sender"]
-    transactions_decrypted["Receiver"] = transactions_decrypted[
-        "Receiver"]
-    transactions_decrypted["Receiver (normalized)"] = (
-        transactions_decrypted["Receiver"].astype(str).str.strip().str.lower()
-    )
-    donations: pd.DataFrame = transactions_decrypted[
-        (transactions_decrypted["Receiver (normalized)"]
-         == casino_username.lower()) &
-        (transactions_decrypted[
-            "Method"
-        ].isin(  # pyright: ignore[reportUnknownMemberType]
-            ["transfer", "transfer_aml"]))]
+    casino_house_id_hash: str = hash_user_id(g.casino_house_id)
+    donations: List[TransactionRow] = g.transaction_index.query(
+        receiver=casino_house_id_hash,
+        methods=["transfer", "transfer_aml"])
+    donations_per_sender: Dict[str, int] = {}
+    for donation in donations:
+        donations_per_sender[donation["Sender"]] = (
+            donations_per_sender.get(donation["Sender"], 0) +
+            donation["Amount"])
     donators: dict[str, int] = {}
-    donators_extracted: pd.Series[str | float] = donations["Sender"]
-    unique_senders: ndarray[Any, Any] = (
-        donators_extracted \
-            .unique())  # pyright: ignore[reportUnknownMemberType]
-    for sender in unique_senders:
-        total_amount: int = 0
-        user_donations: pd.DataFrame = cast(pd.DataFrame, donations[
-            donations["Sender"] == sender])
-        user_donations_amounts: pd.Series[str] = user_donations["Amount"]
-        for donation in user_donations_amounts:
-            total_amount += int(donation)
-        if total_amount != 0:
-            donators[sender] = total_amount
+    for sender, total_amount in donations_per_sender.items():
+        if total_amount == 0:
+            continue
+        sender_identity: UserIdentity | None = (
+            g.user_identity_index.get(sender))
+        if sender_identity is None:
+            print(f"WARNING: Unknown sponsor {sender}.")
+            continue
+        donators[sender_identity["user_name"]] = total_amount
     donators = dict(sorted(
         donators.items(), key=lambda item: item[1], reverse=True))
     message_content: str = f"## {g.Coin} Casino's top sponsors\n"
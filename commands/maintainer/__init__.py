@@ -1,5 +1,6 @@
 # Local
 from .maintainer_main import (maintainer_group,
+                              maintainer_blockchain_group,
                               maintainer_donation_goal_group,
                               aml_group)
 from .aml import (
@@ -9,14 +10,22 @@ from .aml import (
 from .maintainer_donation_goal import (
     donation_goal_add,  # pyright: ignore [reportUnknownVariableType]
     donation_goal_remove)  # pyright: ignore [reportUnknownVariableType]
+from .maintainer_blockchain import (
+    archive,  # pyright: ignore [reportUnknownVariableType]
+    audit,  # pyright: ignore [reportUnknownVariableType]
+    check_balances)  # pyright: ignore [reportUnknownVariableType]
 from .reels import reels  # pyright: ignore [reportUnknownVariableType]
 
 __all__: list[str] = [
     "maintainer_group",
+    "maintainer_blockchain_group",
     "maintainer_donation_goal_group",
     "aml_group",
     "approve",
+    "archive",
+    "audit",
     "block_receivals",
+    "check_balances",
     "decrypt_spreadsheet",
     "donation_goal_add",
     "donation_goal_remove",
@@ -0,0 +1,154 @@
+# region Imports
+# Standard library
+import asyncio
+from time import monotonic
+
+# Third party
+from discord import Interaction, app_commands
+
+# Local
+import core.global_state as g
+from models.balance_snapshots import BalanceSnapshotStore
+from schemas.typed import BalanceSnapshot
+from utils.blockchain_utils import (
+    audit_blockchain, audit_blockchain_parallel, verify_balance_ledger)
+from .maintainer_main import maintainer_blockchain_group
+# endregion
+
+# region audit
+
+
+@maintainer_blockchain_group.command(
+    name="audit",
+    description=f"Verify the entire {g.blockchain_name}")
+@app_commands.describe(parallel=(
+    "Verify the chain in parallel worker processes"))
+async def audit(interaction: Interaction, parallel: bool = False) -> None:
+    """
+    Command to run a full audit of the blockchain.
+    With parallel, the chain is split into ranges that are verified in
+    worker processes, and the progress is shown as the ranges complete.
+    Only the bot maintainer can use this command.
+    """
+    invoker_id: int = interaction.user.id
+    if invoker_id != g.bot_maintainer_id:
+        message_content: str = "Only the bot maintainer can audit the chain."
+        await interaction.response.send_message(message_content,
+                                                ephemeral=True)
+        del message_content
+        return
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    chain_validity: bool
+    first_invalid_index: int | None = None
+    if parallel:
+        last_progress_time: float = 0.0
+
+        async def report_progress(ranges_done: int, ranges_total: int) -> None:
+            nonlocal last_progress_time
+            # Limit the edits to stay clear of the rate limit
+            if (ranges_done < ranges_total and
+                    monotonic() - last_progress_time < 2):
+                return
+            last_progress_time = monotonic()
+            await interaction.edit_original_response(
+                content=(f"Auditing the {g.blockchain_name}... "
+                         f"{ranges_done}/{ranges_total} ranges verified."))
+
+        chain_validity, first_invalid_index = (
+            await audit_blockchain_parallel(report_progress))
+    else:
+        chain_validity = await audit_blockchain()
+    message_content: str
+    if chain_validity:
+        message_content = f"The {g.blockchain_name} is valid."
+    elif first_invalid_index is not None:
+        message_content = (f"The {g.blockchain_name} is invalid. "
+                           f"The first invalid block is "
+                           f"{first_invalid_index}. "
+                           "See the console for details.")
+    else:
+        message_content = (f"The {g.blockchain_name} is invalid. "
+                           "See the console for details.")
+    await interaction.followup.send(message_content, ephemeral=True)
+    del message_content
+# endregion
+
+# region check_balances
+
+
+@maintainer_blockchain_group.command(
+    name="check_balances",
+    description="Compare the balance ledger against the "
+    f"{g.blockchain_name}")
+async def check_balances(interaction: Interaction) -> None:
+    """
+    Command to compare the in-memory balance ledger against a full replay of
+    the blockchain.
+    Only the bot maintainer can use this command.
+    """
+    invoker_id: int = interaction.user.id
+    if invoker_id != g.bot_maintainer_id:
+        message_content: str = ("Only the bot maintainer can check "
+                                "the balance ledger.")
+        await interaction.response.send_message(message_content,
+                                                ephemeral=True)
+        del message_content
+        return
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    ledger_consistent: bool = await verify_balance_ledger()
+    message_content: str
+    if ledger_consistent:
+        message_content = ("The balance ledger matches "
+                           f"the {g.blockchain_name}.")
+    else:
+        message_content = ("The balance ledger does not match "
+                           f"the {g.blockchain_name}. "
+                           "See the console for details.")
+    await interaction.followup.send(message_content, ephemeral=True)
+    del message_content
+# endregion
+
+# region archive
+
+
+@maintainer_blockchain_group.command(
+    name="archive",
+    description=f"Archive the {g.blockchain_name} up to the latest "
+    "balance snapshot")
+async def archive(interaction: Interaction) -> None:
+    """
+    Command to archive the part of the blockchain that is covered by the
+    latest verified balance snapshot to a compressed file, so that it can be
+    moved to cold storage.
+    Only the bot maintainer can use this command.
+    """
+    assert isinstance(g.balance_snapshot_store, BalanceSnapshotStore), (
+        "g.balance_snapshot_store has not been initialized.")
+    invoker_id: int = interaction.user.id
+    if invoker_id != g.bot_maintainer_id:
+        message_content: str = ("Only the bot maintainer can archive "
+                                "the chain.")
+        await interaction.response.send_message(message_content,
+                                                ephemeral=True)
+        del message_content
+        return
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    snapshot: BalanceSnapshot | None = await asyncio.to_thread(
+        g.balance_snapshot_store.load_latest_verified)
+    message_content: str
+    if snapshot is None:
+        message_content = ("There is no verified balance snapshot "
+                           "to archive up to.")
+    else:
+        archive_path: str | None = await asyncio.to_thread(
+            g.balance_snapshot_store.archive_chain_segment, snapshot)
+        if archive_path is None:
+            message_content = ("The chain is already archived up to "
+                               f"block {snapshot['block_index']}.")
+        else:
+            message_content = (f"The chain up to block "
+                               f"{snapshot['block_index']} has been archived "
+                               f"to `{archive_path}`.")
+    await interaction.followup.send(message_content, ephemeral=True)
+    del message_content
+# endregion
@@ -12,6 +12,10 @@ aml_group = app_commands.Group(
     name="aml", description="Use an Anti-money laundering workstation",
     parent=maintainer_group)
 
+maintainer_blockchain_group = app_commands.Group(
+    name="blockchain", description="Blockchain maintenance commands",
+    parent=maintainer_group)
+
 maintainer_donation_goal_group = app_commands.Group(
     name="donation_goal", description="Donation goal commands",
     parent=maintainer_group)
@@ -3,7 +3,6 @@
 import asyncio
 from datetime import datetime
 from time import time
-from hashlib import sha256
 from typing import Dict, List, cast
 
 # Third party
@@ -17,7 +16,6 @@ from discord.utils import time_snowflake
 # Local
 import core.global_state as g
 from schemas.typed import ReelSymbol,  ReelResults, SpinEmojis
-from core.terminate_bot import terminate_bot
 from models.slot_machine import SlotMachine
 from models.slot_machine_high_scores import SlotMachineHighScores
 from models.grifter_suppliers import GrifterSuppliers
@@ -25,9 +23,10 @@ from models.log import Log
 from models.user_save_data import UserSaveData
 from schemas.data_classes import (SlotEvent, SlotFeeDetail, SlotMessage,
                                   SlotReelSymbol, SlotResultSimple,
-                                  SlotsHighScoreEntry, UserSimple)
-from utils.blockchain_utils import (add_block_transaction,
-                                    get_last_block_timestamp)
+                                  SlotsHighScoreEntry, TransactionReceipt,
+                                  UserSimple)
+from utils.blockchain_utils import (add_block_transaction, get_balance,
+                                    lock_account)
 from utils.formatting import format_coin_label
 from views.starting_bonus_view import StartingBonusView
 from views.slot_machine_buttons import SlotMachineView
@@ -161,8 +160,7 @@ async def insert_coins(interaction: Interaction,
     starting_bonus_available: bool | float = save_data.starting_bonus_available
 
     # Check balance
-    user_id_hash: str = sha256(str(user_id).encode()).hexdigest()
-    user_balance: int | None = g.blockchain.get_balance(user=user_id_hash)
+    user_balance: int | None = get_balance(user_id)
     if user_balance is None:
         user_balance = 0
 
@@ -284,15 +282,14 @@ async def insert_coins(interaction: Interaction,
             del coin_label_b
             await interaction.response.send_message(
                 content=message_content, ephemeral=should_use_ephemeral)
-            await add_block_transaction(blockchain=g.blockchain,
-                                        sender=g.casino_house_id,
-                                        receiver=user,
-                                        amount=bonus_amount,
-                                        method="starting_bonus")
-            last_block_timestamp: float | None = get_last_block_timestamp()
-            if last_block_timestamp is None:
-                print("ERROR: Could not get last block timestamp.")
-                await terminate_bot()
+            receipt: TransactionReceipt = await add_block_transaction(
+                blockchain=g.blockchain,
+                sender=g.casino_house_id,
+                receiver=user,
+                amount=bonus_amount,
+                method="starting_bonus")
+            last_block_timestamp: float = receipt.timestamp
+            del receipt
             g.log.log(
                 line=(f"{user} ({user_id}) received "
                       f"{bonus_amount} {g.coins} as a special bonus."),
@@ -650,40 +647,46 @@ async def insert_coins(interaction: Interaction,
         del slots_message_outcome
 
     # Transfer and log
-    last_block_error = False
-    if net_return != 0:
-        sender: User | Member | int
-        receiver: User | Member | int
-        log_timestamp: float = 0.0
-        transfer_amount: int
-        if net_return > 0:
-            transfer_amount = net_return
-            sender = g.casino_house_id
-            receiver = user
-        else:
-            sender = user
-            receiver = g.casino_house_id
-            # flip to positive value (transferring a negative amount would mean
-            # reducing the receiver's balance)
-            transfer_amount = -net_return
-        await add_block_transaction(blockchain=g.blockchain,
-                                    sender=sender,
-                                    receiver=receiver,
-                                    amount=transfer_amount,
-                                    method="slot_machine")
-        del sender
-        del receiver
+    log_timestamp: float
+    receipt: TransactionReceipt
+    if net_return > 0:
+        receipt = await add_block_transaction(
+            blockchain=g.blockchain,
+            sender=g.casino_house_id,
+            receiver=user,
+            amount=net_return,
+            method="slot_machine")
+        log_timestamp = receipt.timestamp
+        del receipt
+    elif net_return < 0:
+        # flip to positive value (transferring a negative amount would mean
+        # reducing the receiver's balance)
+        transfer_amount: int = -net_return
+        # Hold the account only while the balance is checked and the loss
+        # is debited, so that transfers are not held up by the spin
+        async with lock_account(user_id):
+            # Check the balance again, since the player may have spent coins
+            # during the spin
+            balance_before_debit: int = get_balance(user_id) or 0
+            if balance_before_debit < transfer_amount:
+                print(f"WARNING: {user_name} ({user_id}) spent coins during "
+                      f"the spin and only has {balance_before_debit} "
+                      f"{g.coins} left to cover a loss of "
+                      f"{transfer_amount}.")
+                transfer_amount = max(balance_before_debit, 0)
+            del balance_before_debit
+            if transfer_amount > 0:
+                receipt = await add_block_transaction(
+                    blockchain=g.blockchain,
+                    sender=user,
+                    receiver=g.casino_house_id,
+                    amount=transfer_amount,
+                    method="slot_machine")
+                log_timestamp = receipt.timestamp
+                del receipt
+            else:
+                log_timestamp = time()
         del transfer_amount
-        last_block_timestamp: float | None = get_last_block_timestamp()
-        if last_block_timestamp is None:
-            print("ERROR: Could not get last block timestamp.")
-            log_timestamp = time()
-            log_line += ("(COULD NOT GET LAST BLOCK TIMESTAMP; "
-                         "USING CURRENT TIME; WILL NOT RESET JACKPOT)")
-            last_block_error = True
-        else:
-            log_timestamp = last_block_timestamp
-        del last_block_timestamp
     else:
         log_timestamp = time()
     g.log.log(line=log_line, timestamp=log_timestamp)
@@ -844,18 +847,6 @@ async def insert_coins(interaction: Interaction,
     if user_id in g.active_slot_machine_players:
         await remove_from_active_players(interaction, user_id)
 
-    if last_block_error:
-        bot_maintainer_mention: str = ""
-        if g.bot_maintainer_id != 0:
-            bot_maintainer: User = (
-                await g.bot.fetch_user(g.bot_maintainer_id))
-            bot_maintainer_mention = bot_maintainer.mention
-        await interaction.followup.send(
-            "An error occurred. "
-            f"{bot_maintainer_mention} pls fix.")
-        await terminate_bot()
-    del last_block_error
-
     if event.name == "jackpot":
         # Reset the jackpot
         combo_events: Dict[str, ReelSymbol] = (
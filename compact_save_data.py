@@ -0,0 +1,38 @@
+"""
+Upgrades the save data files of all users to the current schema, and moves
+their mined messages to compact storage.
+
+Only run this while the bot is offline. The bot caches save data and mined
+message IDs, so it would write its copies back over the compacted files.
+
+Run from the repository root:
+    python compact_save_data.py
+"""
+# region Imports
+# Standard library
+from typing import List
+
+# Local
+import core.global_state as g
+from models.save_data_compactor import compact_all_save_data
+from schemas.typed import SaveDataCompactionResult
+# endregion
+
+# region Main
+
+
+def main() -> None:
+    if g.USER_SAVE_DATA_BACKEND == "sqlite":
+        print("The save data is stored in the database. "
+              "There are no save data files to compact.")
+        return
+    results: List[SaveDataCompactionResult] = compact_all_save_data()
+    print(f"Keys added: {sum(result['keys_added'] for result in results)}")
+    print(f"Values fixed: {sum(result['values_fixed'] for result in results)}")
+    print("Mined message IDs moved: "
+          f"{sum(result['message_ids_moved'] for result in results)}")
+
+
+if __name__ == "__main__":
+    main()
+# endregion
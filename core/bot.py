@@ -12,23 +12,58 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 # Local
 import core.global_state as g
 from bot_configuration import invoke_bot_configuration
+from models.balance_ledger import BalanceLedger
+from models.balance_snapshots import BalanceSnapshotStore
+from models.blockchain_writer import BlockchainWriter
+from models.chain_validator import IncrementalChainValidator
+from models.checkpoints import flush_all_checkpoints
 from models.grifter_suppliers import GrifterSuppliers
 from models.log import Log
+from models.mention_preferences import MentionPreferenceIndex
 from models.message_mining_registry import MessageMiningRegistryManager
+from models.mined_messages import MinedMessagesStore
 from models.slot_machine import SlotMachine
 from models.slot_machine_high_scores import SlotMachineHighScores
+from models.transaction_index import TransactionIndex
 from models.transfers_waiting_approval import TransfersWaitingApproval
+from models.user_identity import UserIdentityIndex
+from models.user_save_data_cache import UserSaveDataCache
+from models.user_save_data_store import SQLiteUserSaveDataStore
+from schemas.typed import BalanceSnapshot
+from utils.blockchain_utils import AccountLockManager
 from utils.decrypt_transactions import DecryptedTransactionsSpreadsheet
+from utils.reaction_dispatcher import ReactionDispatcher
 # FIXME blockchain gets defined both here and in the waitress thread
 from sponsorblockchain.sponsorblockchain_main import blockchain
 # endregion
 
 # region Bot setup
+
+
+class CasinoBot(Bot):
+    """
+    The bot. On a graceful shutdown, such as Ctrl+C, the reactions that are
+    waiting for their coalescing window are processed before the bot
+    disconnects from Discord. Catch-up only rescans messages newer than the
+    checkpoints, so reactions dropped on shutdown would never be paid out.
+    """
+
+    async def close(self) -> None:
+        # Never pay out more when shutting down because of an error, such
+        # as an invalid blockchain
+        if (g.reaction_dispatcher is not None and
+                not g.terminating_on_error):
+            print("Processing queued reactions...")
+            await g.reaction_dispatcher.join()
+            print("Queued reactions processed.")
+        await super().close()
+
+
 print("Starting bot...")
 intents: Intents = Intents.default()
 intents.message_content = True
 intents.members = True
-g.bot = commands.Bot(command_prefix="!", intents=intents)
+g.bot = CasinoBot(command_prefix="!", intents=intents)
 g.client = Client(intents=intents)
 # endregion
 
@@ -50,7 +85,56 @@ def setup_bot_environment() -> None:
 
     print("Starting class instances...")
     g.log = Log(time_zone=g.time_zone)
+    g.user_identity_index = UserIdentityIndex(
+        flush_interval=g.user_save_data_flush_interval)
+    g.user_identity_index.start()
+    user_save_data_store: SQLiteUserSaveDataStore | None = None
+    if g.USER_SAVE_DATA_BACKEND == "sqlite":
+        user_save_data_store = SQLiteUserSaveDataStore()
+        user_save_data_store.migrate_from_json()
+    elif g.USER_SAVE_DATA_BACKEND != "json":
+        print(f"WARNING: Unknown USER_SAVE_DATA_BACKEND "
+              f"'{g.USER_SAVE_DATA_BACKEND}'. Using the JSON backend.")
+    g.user_save_data_cache = UserSaveDataCache(
+        flush_interval=g.user_save_data_flush_interval,
+        store=user_save_data_store,
+        max_records=g.user_save_data_cache_size)
+    g.mined_messages_store = MinedMessagesStore(
+        database=user_save_data_store,
+        max_users=g.user_save_data_cache_size)
+    del user_save_data_store
+    g.user_save_data_cache.start()
+    g.chain_validator = IncrementalChainValidator()
+    g.balance_snapshot_store = BalanceSnapshotStore(
+        signing_key=g.SNAPSHOT_SIGNING_KEY,
+        interval=g.balance_snapshot_interval)
+    g.balance_ledger = BalanceLedger(
+        snapshot_store=g.balance_snapshot_store,
+        update_interval=g.balance_ledger_update_interval)
+    g.balance_ledger.start()
+    snapshot: BalanceSnapshot | None = (
+        g.balance_snapshot_store.last_loaded_snapshot)
+    if snapshot is not None:
+        # The blocks before the snapshot are verified by the scheduled audit
+        g.chain_validator.trust_block(block_index=snapshot["block_index"],
+                                      block_hash=snapshot["block_hash"],
+                                      offset=snapshot["offset"])
+    del snapshot
+    assert g.blockchain is not None, (
+        "blockchain must be initialized before the blockchain writer.")
+    g.transaction_index = TransactionIndex()
+    g.blockchain_writer = BlockchainWriter(
+        blockchain=g.blockchain,
+        balance_ledger=g.balance_ledger,
+        group_commit_window=g.block_group_commit_window,
+        transaction_index=g.transaction_index)
+    g.blockchain_writer.start()
+    g.account_lock_manager = AccountLockManager()
+    g.reaction_dispatcher = ReactionDispatcher(
+        coalescing_window=g.reaction_coalescing_window)
     g.message_mining_registry = MessageMiningRegistryManager()
+    g.mention_preference_index = MentionPreferenceIndex(
+        max_users=g.user_save_data_cache_size)
     g.slot_machine = SlotMachine()
     g.transfers_waiting_approval = TransfersWaitingApproval()
     g.grifter_suppliers = GrifterSuppliers()
@@ -73,6 +157,18 @@ def run_bot() -> None:
     if DISCORD_TOKEN is not None:
         print("Discord token found.")
         g.bot.run(DISCORD_TOKEN)
+        # The bot was stopped without terminate_bot (e.g. Ctrl+C)
+        flush_all_checkpoints()
+        if g.blockchain_writer is not None:
+            # The writer thread is a daemon, so the queued transactions
+            # would be lost on exit
+            g.blockchain_writer.stop()
+        if g.balance_ledger is not None:
+            g.balance_ledger.stop()
+        if g.user_save_data_cache is not None:
+            g.user_save_data_cache.stop()
+        if g.user_identity_index is not None:
+            g.user_identity_index.stop()
     else:
         error_message: str = ("ERROR: DISCORD_TOKEN is not set "
                               "in the environment variables.")
@@ -1,5 +1,6 @@
 # region Imports
 # Standard library
+from asyncio import Task
 from typing import Dict, TYPE_CHECKING
 from os import getenv
 
@@ -18,15 +19,26 @@ if TYPE_CHECKING:
 
     # Local
     from bot_configuration import BotConfiguration
-    from models.checkpoints import ChannelCheckpoints
+    from models.balance_ledger import BalanceLedger
+    from models.balance_snapshots import BalanceSnapshotStore
+    from models.blockchain_writer import BlockchainWriter
+    from models.chain_validator import IncrementalChainValidator
+    from models.checkpoints import ChannelCheckpoints, CheckpointStore
     from models.grifter_suppliers import GrifterSuppliers
     from models.log import Log
     from models.slot_machine import SlotMachine
     from models.slot_machine_high_scores import SlotMachineHighScores
+    from models.transaction_index import TransactionIndex
     from models.transfers_waiting_approval import TransfersWaitingApproval
+    from models.user_identity import UserIdentityIndex
+    from models.user_save_data_cache import UserSaveDataCache
+    from models.mention_preferences import MentionPreferenceIndex
     from models.message_mining_registry import MessageMiningRegistryManager
+    from models.mined_messages import MinedMessagesStore
     from schemas.data_classes import DonationGoal
+    from utils.blockchain_utils import AccountLockManager
     from utils.decrypt_transactions import DecryptedTransactionsSpreadsheet
+    from utils.reaction_dispatcher import ReactionDispatcher
     from sponsorblockchain.models.blockchain import Blockchain
 # endregion
 
@@ -34,20 +46,61 @@ if TYPE_CHECKING:
 load_dotenv()
 
 DISCORD_TOKEN: str | None = getenv('DISCORD_TOKEN')
+SNAPSHOT_SIGNING_KEY: str | None = getenv('SNAPSHOT_SIGNING_KEY')
+# Where user save data is stored: "json" (one file per user) or "sqlite"
+USER_SAVE_DATA_BACKEND: str = getenv('USER_SAVE_DATA_BACKEND', 'json')
 # endregion
 
 # region Global variables
 
 # Number of messages to keep track of in each channel
 per_channel_checkpoint_limit: int = 3
+# Seconds between writes of changed channel checkpoints
+checkpoint_flush_interval: int = 30
+# Channels to process missed messages from at the same time
+missed_messages_concurrency: int = 4
 active_slot_machine_players: Dict[int, float] = {}
 starting_bonus_timeout: int = 30
 time_zone: str = "Canada/Central"
+# Seconds between full audits of the blockchain
+chain_audit_interval: int = 6 * 60 * 60
+# Worker processes for parallel audits (None means one per CPU)
+chain_audit_workers: int | None = None
+# Blocks between balance snapshots
+balance_snapshot_interval: int = 1000
+# Seconds between checks for blocks appended by the blockchain server
+balance_ledger_update_interval: float = 1.0
+# Seconds to wait for more transactions before writing a block
+block_group_commit_window: float = 0.05
+# Seconds to wait for more reactions to a message before processing them
+reaction_coalescing_window: float = 2.0
+# Seconds between writes of changed user save data
+user_save_data_flush_interval: float = 5.0
+# Users to keep the save data, mined message IDs, and mention preferences
+# of in memory
+user_save_data_cache_size: int = 10_000
 
+# Whether terminate_bot() is shutting the bot down because of an error
+terminating_on_error: bool = False
 waitress_process: "Popen[str] | None" = None
 log: "Log | None" = None
 configuration: "BotConfiguration | None" = None
 blockchain: "Blockchain | None" = None
+chain_validator: "IncrementalChainValidator | None" = None
+balance_snapshot_store: "BalanceSnapshotStore | None" = None
+balance_ledger: "BalanceLedger | None" = None
+blockchain_writer: "BlockchainWriter | None" = None
+user_identity_index: "UserIdentityIndex | None" = None
+user_save_data_cache: "UserSaveDataCache | None" = None
+mined_messages_store: "MinedMessagesStore | None" = None
+mention_preference_index: "MentionPreferenceIndex | None" = None
+account_lock_manager: "AccountLockManager | None" = None
+reaction_dispatcher: "ReactionDispatcher | None" = None
+transaction_index: "TransactionIndex | None" = None
+chain_audit_task: "Task[None] | None" = None
+checkpoint_flush_task: "Task[None] | None" = None
+checkpoint_store: "CheckpointStore | None" = None
+missed_messages_task: "Task[None] | None" = None
 slot_machine: "SlotMachine | None" = None
 grifter_suppliers: "GrifterSuppliers | None" = None
 transfers_waiting_approval: "TransfersWaitingApproval | None" = None
@@ -16,6 +16,7 @@ with lazyimports.lazy_imports(
 
 # Local
 import core.global_state as g
+from models.checkpoints import flush_all_checkpoints
 with lazyimports.lazy_imports(
       "sponsorblockchain.start_sponsorblockchain:waitress_process"):
     from sponsorblockchain.start_sponsorblockchain import waitress_process
@@ -27,6 +28,8 @@ with lazyimports.lazy_imports(
 async def terminate_bot() -> NoReturn:
     """
     Closes the bot, shuts down the blockchain server, and exits the script.
+    Called when the bot cannot continue, for example because the blockchain
+    is invalid.
 
     Returns:
         NoReturn: This function does not return any value.
@@ -35,9 +38,24 @@ async def terminate_bot() -> NoReturn:
         "bot is not initialized")
     assert isinstance(waitress_process, Popen), (
         "waitress_process is not initialized")
+    # The queued reactions are not processed, since this may be called from
+    # a reaction worker, and the bot must not pay out more after an error
+    g.terminating_on_error = True
     print("Closing bot...")
     await g.bot.close()
     print("Bot closed.")
+    flush_all_checkpoints()
+    if g.blockchain_writer is not None:
+        # Write the transactions that are still queued
+        await asyncio.to_thread(g.blockchain_writer.stop)
+    if g.balance_ledger is not None:
+        await asyncio.to_thread(g.balance_ledger.stop)
+    if g.user_save_data_cache is not None:
+        # Write the save data that has changed since the last flush
+        await asyncio.to_thread(g.user_save_data_cache.stop)
+    if g.user_identity_index is not None:
+        # Write the users recorded since the last flush
+        await asyncio.to_thread(g.user_identity_index.stop)
     print("Shutting down the blockchain app...")
     waitress_process.send_signal(signal.SIGTERM)
     waitress_process.wait()
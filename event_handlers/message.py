@@ -10,7 +10,6 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
-from models.checkpoints import ChannelCheckpoints
 from models.grifter_suppliers import GrifterSuppliers
 # endregion
 
@@ -25,8 +24,8 @@ async def on_message(message: Message) -> None:
     If the channel ID of the incoming message is already in the global
     `all_channel_checkpoints` dictionary, it saves the message ID to the
     corresponding checkpoint. If the channel ID is not in the dictionary,
-    it creates a new `ChannelCheckpoints` instance for the channel and adds
-    it to the dictionary.
+    it adds the channel to the checkpoint store, which also adds it to
+    the dictionary.
     Args:
         message (Message): The incoming message object.
     Returns:
@@ -45,8 +44,8 @@ async def on_message(message: Message) -> None:
     else:
         # If a channel is created while the bot is running, we will likely end
         # up here.
-        # Add a new instance of ChannelCheckpoints to
-        # the all_channel_checkpoints dictionary for this new channel.
+        # Add the new channel to the checkpoint store, which adds it to
+        # the all_channel_checkpoints dictionary.
         guild: Guild | None = message.guild
         if guild is None:
             # TODO Ensure checkpoints work threads
@@ -60,10 +59,12 @@ async def on_message(message: Message) -> None:
         guild_name: str = guild.name
         guild_id: int = guild.id
         channel = message.channel
-        if ((isinstance(channel, TextChannel)) or
-                isinstance(channel, VoiceChannel)):
+        if (((isinstance(channel, TextChannel)) or
+                isinstance(channel, VoiceChannel)) and
+                g.checkpoint_store is not None):
             channel_name: str = channel.name
-            g.all_channel_checkpoints[channel_id] = ChannelCheckpoints(
+            # This also adds the channel to all_channel_checkpoints
+            g.checkpoint_store.get_or_add_channel(
                 guild_name=guild_name,
                 guild_id=guild_id,
                 channel_name=channel_name,
@@ -10,8 +10,9 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
-from models.checkpoints import start_checkpoints
-from utils.missed_messages import process_missed_messages
+from models.checkpoints import start_checkpoint_flusher, start_checkpoints
+from utils.blockchain_utils import start_scheduled_chain_audits
+from utils.missed_messages import start_missed_messages_processing
 # endregion
 
 # region On ready
@@ -25,16 +26,21 @@ async def on_ready() -> None:
     Event handler that is called when the bot is ready.
     This function performs the following actions:
     - Prints a message indicating that the bot has started.
-    - Initializes global checkpoints for all channels.
+    - Starts the scheduled blockchain audits.
+    - Initializes global checkpoints for all channels, and starts writing
+      them to disk periodically.
+    - Starts processing missed messages in the background.
     - Attempts to sync the bot's commands with Discord and prints the result.
     If an error occurs during the command sync process, it catches the
     exception and prints an error message.
     """
     assert isinstance(g.bot, Bot), "g.bot has not been initialized."
     print("Bot started.")
+    start_scheduled_chain_audits()
     g.all_channel_checkpoints = (
         await start_checkpoints(limit=g.per_channel_checkpoint_limit))
-    await process_missed_messages(limit=50)
+    start_checkpoint_flusher()
+    start_missed_messages_processing()
 
     # global guild_ids
     # guild_ids = load_guild_ids()
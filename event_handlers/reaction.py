@@ -10,7 +10,7 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
-from utils.process_reaction import process_reaction
+from utils.reaction_dispatcher import ReactionDispatcher
 # endregion
 
 # region Reaction
@@ -22,8 +22,10 @@ assert isinstance(g.bot, Bot), "bot has not been initialized."
 async def on_raw_reaction_add(payload: RawReactionActionEvent) -> None:
     """
     Handles the event when a reaction is added to a message.
-    The process_reaction_function is called, which adds a transaction if the
-    reaction is the coin emoji set in the configuration.
+    If the reaction is the coin emoji set in the configuration, it is
+    dispatched to the queue of its message, where process_reaction is
+    called, which adds a transaction. Other reactions are ignored, so they
+    do not start a worker that waits for the coalescing window.
 
     Args:
         payload: An instance of the RawReactionActionEvent
@@ -31,10 +33,15 @@ async def on_raw_reaction_add(payload: RawReactionActionEvent) -> None:
             the reaction event.
     """
     timestamp: float = time()
+    assert isinstance(g.reaction_dispatcher, ReactionDispatcher), (
+        "g.reaction_dispatcher has not been initialized.")
 
     if payload.event_type == "REACTION_ADD":
         if payload.message_author_id is None:
             return
+        # Custom emojis have an ID, and standard emojis do not
+        if payload.emoji.id != g.coin_emoji_id:
+            return
 
         sender: Member | None = payload.member
         if sender is None:
@@ -43,12 +50,17 @@ async def on_raw_reaction_add(payload: RawReactionActionEvent) -> None:
         receiver_user_id: int = payload.message_author_id
         message_id: int = payload.message_id
         channel_id: int = payload.channel_id
-        await process_reaction(message_id=message_id,
-                               emoji=payload.emoji,
-                               reacter=sender,
-                               message_author_id=receiver_user_id,
-                               timestamp=timestamp,
-                               channel_id=channel_id)
+        g.reaction_dispatcher.dispatch({
+            "message_id": message_id,
+            "emoji": payload.emoji,
+            "reacter": sender,
+            "channel_id": channel_id,
+            "reacter_message": None,
+            "channel": None,
+            "message_author": None,
+            "message_author_id": receiver_user_id,
+            "timestamp": timestamp,
+            "greet_new_players": True})
         del receiver_user_id
         del sender
         del message_id
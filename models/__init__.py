@@ -4,9 +4,24 @@ Contains classes and functions for handling user data, blockchain interactions,
 checkpoints, and other core functionality.
 """
 
+# Import from balance_ledger.py
+from .balance_ledger import BalanceLedger
+
+# Import from balance_snapshots.py
+from .balance_snapshots import BalanceSnapshotStore
+
+# Import from blockchain_writer.py
+from .blockchain_writer import BlockchainWriter
+
+# Import from chain_validator.py
+from .chain_validator import IncrementalChainValidator
+
 # Import from checkpoints.py
 from .checkpoints import (
     ChannelCheckpoints,
+    CheckpointStore,
+    flush_all_checkpoints,
+    start_checkpoint_flusher,
     start_checkpoints)
 
 # Import from grifter_suppliers.py
@@ -20,24 +35,60 @@ from .guild_list import load_guild_ids
 # Import from log.py
 from .log import Log
 
+# Import from mention_preferences.py
+from .mention_preferences import MentionPreferenceIndex
+
 # Import from message_mining_registry.py
 from .message_mining_registry import MessageMiningRegistryManager
 
+# Import from mined_messages.py
+from .mined_messages import MinedMessagesStore
+
+# Import from save_data_compactor.py
+from .save_data_compactor import compact_all_save_data
+
 # Import from slot_machine.py
 from .slot_machine import SlotMachine, reinitialize_slot_machine
 
+# Import from transaction_index.py
+from .transaction_index import TransactionIndex
+
 # Import from transfers_waiting_approval.py
 from .transfers_waiting_approval import (
     TransfersWaitingApproval,
     reinitialize_transfers_waiting_approval,
     get_aml_officer_role)
 
+# Import from user_identity.py
+from .user_identity import UserIdentityIndex, hash_user_id
+
 # Import from user_save_data.py
 from .user_save_data import UserSaveData
 
+# Import from user_save_data_cache.py
+from .user_save_data_cache import UserSaveDataCache
+
+# Import from user_save_data_store.py
+from .user_save_data_store import SQLiteUserSaveDataStore
+
 __all__: list[str] = [
+    # Balance ledger
+    'BalanceLedger',
+
+    # Balance snapshots
+    'BalanceSnapshotStore',
+
+    # Blockchain writer
+    'BlockchainWriter',
+
+    # Chain validator
+    'IncrementalChainValidator',
+
     # Checkpoints
     'ChannelCheckpoints',
+    'CheckpointStore',
+    'flush_all_checkpoints',
+    'start_checkpoint_flusher',
     'start_checkpoints',
     
     # Grifter suppliers
@@ -50,16 +101,38 @@ __all__: list[str] = [
     # Log
     'Log',
 
+    # Mention preferences
+    'MentionPreferenceIndex',
+
     # Message mining registry
     'MessageMiningRegistryManager',
 
+    # Mined messages
+    'MinedMessagesStore',
+
+    # Save data compactor
+    'compact_all_save_data',
+
     # Slot machine
     'SlotMachine',
     'reinitialize_slot_machine',
 
+    # User identity
+    'UserIdentityIndex',
+    'hash_user_id',
+
     # User save data
     'UserSaveData',
+
+    # User save data cache
+    'UserSaveDataCache',
+
+    # User save data store
+    'SQLiteUserSaveDataStore',
     
+    # Transaction index
+    'TransactionIndex',
+
     # Transfers waiting approval
     'TransfersWaitingApproval', 
     'reinitialize_transfers_waiting_approval',
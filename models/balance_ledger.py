@@ -0,0 +1,369 @@
+# region Imports
+# Standard library
+import json
+import threading
+from os import stat
+from os.path import exists
+from typing import Any, Dict, List, Tuple
+
+# Local
+from models.balance_snapshots import BalanceSnapshotStore
+from models.chain_file import iter_block_lines
+from schemas.typed import BalanceSnapshot
+# endregion
+
+# region Constants
+# Mined coins are created by the reaction, so the reacter is not charged
+MINING_METHODS: Tuple[str, ...] = ("reaction", "reaction_network")
+# endregion
+
+# region Replay
+
+
+def apply_block_line(balances: Dict[str, int],
+                     line: str) -> Tuple[int, str]:
+    """
+    Applies the transactions in a block to a dictionary of balances.
+
+    Args:
+        balances: The balances, keyed by hashed user ID.
+        line: The line from the blockchain file containing the block.
+
+    Returns:
+        A tuple of the block's index and hash.
+    """
+    block_dict: Dict[str, Any] = json.loads(line)
+    block_index: int = block_dict["index"]
+    block_hash: str = block_dict["hash"]
+    data: List[Dict[str, Any]] | Any = block_dict.get("data")
+    if not isinstance(data, list):
+        # The genesis block has no transactions
+        return block_index, block_hash
+    for entry in data:
+        if not isinstance(entry, dict) or "transaction" not in entry:
+            continue
+        transaction: Dict[str, Any] = entry["transaction"]
+        sender: str = transaction["sender"]
+        receiver: str = transaction["receiver"]
+        amount: int = int(transaction["amount"])
+        method: str = transaction["method"]
+        if method not in MINING_METHODS:
+            balances[sender] = balances.get(sender, 0) - amount
+        else:
+            balances.setdefault(sender, 0)
+        balances[receiver] = balances.get(receiver, 0) + amount
+    return block_index, block_hash
+
+
+def replay_balances(chain_file_name: str,
+                    offset: int = 0,
+                    balances: Dict[str, int] | None = None,
+                    end_offset: int | None = None
+                    ) -> Tuple[Dict[str, int], int]:
+    """
+    Replays the blockchain file from the given offset.
+
+    Args:
+        chain_file_name: The path to the blockchain file.
+        offset: The position in the file to start replaying from.
+            Defaults to 0.
+        balances: The balances to apply the transactions to. Defaults to
+            None, which starts from no balances.
+        end_offset: The position in the file to stop replaying at, or None
+            to replay to the end of the file. Defaults to None.
+
+    Returns:
+        A tuple of the balances, and the position in the file right after the
+        last replayed block.
+    """
+    if balances is None:
+        balances = {}
+    if not exists(chain_file_name):
+        return balances, offset
+    for line, line_end in iter_block_lines(chain_file_name, offset):
+        if end_offset is not None and line_end > end_offset:
+            break
+        apply_block_line(balances, line)
+        offset = line_end
+    return balances, offset
+# endregion
+
+# region Ledger
+
+
+class BalanceLedger:
+    """
+    An in-memory index of the balance of every account on the blockchain,
+    keyed by hashed user ID.
+
+    The ledger is built once by replaying the chain, and then kept up to date
+    by applying only the blocks appended since the last update, so balance
+    lookups do not depend on the length of the chain. The blockchain writer
+    thread updates the ledger after each block it adds, and an updater
+    thread picks up the blocks appended by the blockchain server process
+    every `update_interval` seconds. Balance lookups only read the balances
+    in memory; they never read the blockchain file or wait for the lock.
+
+    If a snapshot store is given, the ledger is built from the latest
+    verified balance snapshot and only the blocks after it are replayed.
+    New snapshots are taken by `take_snapshot_if_due()`, which the
+    blockchain writer thread calls after each block, so balance lookups
+    never wait for a snapshot to be written.
+
+    Methods:
+        rebuild():
+            Rebuilds the balances from the latest snapshot or from
+            the genesis block.
+        update():
+            Applies the blocks appended since the last update.
+        take_snapshot_if_due():
+            Saves a balance snapshot if one is due.
+        get_balance(user_id_hash):
+            Returns the balance of an account.
+        get_balances():
+            Returns a copy of the balances of all accounts.
+        start():
+            Starts the updater thread.
+        stop():
+            Stops the updater thread.
+        verify():
+            Compares the ledger against a full replay of the chain.
+    """
+
+    def __init__(self,
+                 chain_file_name: str = "data/blockchain.json",
+                 snapshot_store: BalanceSnapshotStore | None = None,
+                 update_interval: float = 1.0) -> None:
+        """
+        Initializes the ledger by replaying the blockchain. The updater
+        thread is not started until `start()` is called.
+
+        Args:
+            chain_file_name: The path to the blockchain file. Defaults to
+                "data/blockchain.json".
+            snapshot_store: The store to load and save balance snapshots
+                with. Defaults to None, which always replays the entire chain.
+            update_interval: How many seconds to wait between updates by
+                the updater thread. Defaults to 1.0.
+
+        Attributes:
+            chain_file_name: The path to the blockchain file.
+            snapshot_store: The store balance snapshots are loaded from and
+                saved to.
+            update_interval: How many seconds to wait between updates by
+                the updater thread.
+            balances: The balances, keyed by hashed user ID.
+            offset: The position in the blockchain file right after the last
+                applied block.
+            last_block_index: The index of the last applied block.
+            last_block_hash: The hash of the last applied block.
+        """
+        print("Building balance ledger...")
+        self.chain_file_name: str = chain_file_name
+        self.snapshot_store: BalanceSnapshotStore | None = snapshot_store
+        self.update_interval: float = update_interval
+        self.balances: Dict[str, int] = {}
+        self.offset: int = 0
+        self.last_block_index: int | None = None
+        self.last_block_hash: str | None = None
+        self._lock: threading.RLock = threading.RLock()
+        # Only one snapshot is written at a time
+        self._snapshot_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.rebuild()
+        print(f"Balance ledger built ({len(self.balances)} accounts).")
+        self.take_snapshot_if_due()
+
+    def _apply_from_offset(self) -> None:
+        """
+        Applies the blocks from the current offset to the end of
+        the blockchain file.
+        """
+        if not exists(self.chain_file_name):
+            return
+        for line, line_end in iter_block_lines(self.chain_file_name,
+                                               self.offset):
+            self.last_block_index, self.last_block_hash = (
+                apply_block_line(self.balances, line))
+            self.offset = line_end
+
+    def take_snapshot_if_due(self) -> None:
+        """
+        Saves a balance snapshot at the last applied block if one is due.
+        The balances are copied while holding the lock, and the snapshot is
+        signed and written after releasing it, so that balance lookups are
+        not held up by the write.
+
+        Call this from a worker thread, not the event loop.
+        """
+        if self.snapshot_store is None:
+            return
+        with self._snapshot_lock:
+            with self._lock:
+                if (self.last_block_index is None or
+                        self.last_block_hash is None or
+                        not self.snapshot_store.is_due(
+                            self.last_block_index)):
+                    return
+                block_index: int = self.last_block_index
+                block_hash: str = self.last_block_hash
+                offset: int = self.offset
+                balances: Dict[str, int] = dict(self.balances)
+            try:
+                self.snapshot_store.save(block_index=block_index,
+                                         block_hash=block_hash,
+                                         offset=offset,
+                                         balances=balances)
+            except Exception as e:
+                print(f"ERROR: Error saving balance snapshot: {e}")
+
+    def rebuild(self) -> None:
+        """
+        Rebuilds the balances from the latest verified snapshot, or from
+        the genesis block if there is none, and applies the blocks after it.
+        The balances are rebuilt in a new dictionary, which replaces the
+        current one once it is complete, so lookups never see a partly
+        rebuilt ledger.
+        """
+        with self._lock:
+            balances: Dict[str, int] = {}
+            offset: int = 0
+            last_block_index: int | None = None
+            last_block_hash: str | None = None
+            snapshot: BalanceSnapshot | None = None
+            if self.snapshot_store is not None:
+                snapshot = self.snapshot_store.load_latest_verified()
+            if snapshot is not None:
+                print("Replaying the blockchain from the balance snapshot "
+                      f"at block {snapshot['block_index']}...")
+                balances = dict(snapshot["balances"])
+                offset = snapshot["offset"]
+                last_block_index = snapshot["block_index"]
+                last_block_hash = snapshot["block_hash"]
+            if exists(self.chain_file_name):
+                for line, line_end in iter_block_lines(self.chain_file_name,
+                                                       offset):
+                    last_block_index, last_block_hash = (
+                        apply_block_line(balances, line))
+                    offset = line_end
+            self.balances = balances
+            self.offset = offset
+            self.last_block_index = last_block_index
+            self.last_block_hash = last_block_hash
+
+    def update(self) -> None:
+        """
+        Applies the blocks that have been appended to the blockchain since
+        the last update.
+        """
+        if not exists(self.chain_file_name):
+            return
+        with self._lock:
+            file_size: int = stat(self.chain_file_name).st_size
+            if file_size == self.offset:
+                return
+            if file_size < self.offset:
+                print("WARNING: The blockchain file is shorter than the "
+                      "replayed part of the chain. "
+                      "The balance ledger will be rebuilt.")
+                self.rebuild()
+                return
+            self._apply_from_offset()
+
+    def get_balance(self, user_id_hash: str) -> int | None:
+        """
+        Returns the balance of an account.
+
+        Args:
+            user_id_hash: The hashed user ID of the account.
+
+        Returns:
+            int | None: The balance, or None if the account has never been
+                part of a transaction.
+        """
+        return self.balances.get(user_id_hash)
+
+    def get_balances(self) -> Dict[str, int]:
+        """
+        Returns a copy of the balances of all accounts, keyed by hashed
+        user ID. Like `get_balance()`, it does not wait for the lock.
+
+        Returns:
+            Dict[str, int]: The balances.
+        """
+        return dict(self.balances)
+
+    def start(self) -> None:
+        """
+        Starts the updater thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="balance-ledger-updater",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the updater thread. This method blocks until the thread
+        has finished.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        """
+        Applies the blocks appended by the blockchain server, and takes
+        the snapshots that are due, every `update_interval` seconds until
+        the updater is stopped.
+        """
+        while not self._stop_event.wait(self.update_interval):
+            try:
+                self.update()
+                self.take_snapshot_if_due()
+            except Exception as e:
+                print(f"ERROR: Error updating balance ledger: {e}")
+
+    def verify(self) -> bool:
+        """
+        Compares the ledger against a full replay of the blockchain from
+        the genesis block.
+
+        The replay runs without holding the ledger's lock, so that balance
+        lookups and the blockchain writer are not held up by it. The lock is
+        only taken to bring the ledger and the replay up to the same block
+        and compare them.
+
+        Returns:
+            bool: True if every balance matches, otherwise False.
+        """
+        replayed_balances: Dict[str, int]
+        replayed_offset: int
+        replayed_balances, replayed_offset = replay_balances(
+            self.chain_file_name)
+        with self._lock:
+            # Compare the same part of the chain, including any blocks
+            # appended during the replay
+            self.update()
+            if replayed_offset < self.offset:
+                replayed_balances, replayed_offset = replay_balances(
+                    self.chain_file_name, replayed_offset, replayed_balances,
+                    end_offset=self.offset)
+            consistent: bool = True
+            accounts: set[str] = (
+                set(self.balances) | set(replayed_balances))
+            for account in accounts:
+                ledger_balance: int | None = self.balances.get(account)
+                replayed_balance: int | None = replayed_balances.get(account)
+                if ledger_balance != replayed_balance:
+                    print(f"ERROR: Balance mismatch for {account}: "
+                          f"ledger {ledger_balance}, "
+                          f"replay {replayed_balance}.")
+                    consistent = False
+        return consistent
+# endregion
@@ -0,0 +1,301 @@
+# region Imports
+# Standard library
+import gzip
+import hashlib
+import hmac
+import json
+from os import listdir, makedirs, remove, replace
+from os.path import exists, join
+from time import time
+from typing import Any, Dict, List
+
+# Local
+from models.chain_file import read_block_line_ending_at
+from schemas.typed import BalanceSnapshot
+# endregion
+
+# region Snapshot store
+
+
+class BalanceSnapshotStore:
+    """
+    Stores signed snapshots of the balances of all accounts, taken every N
+    blocks, next to the blockchain.
+
+    A snapshot records the balances after a specific block, together with
+    the block's index, hash, and position in the blockchain file. The balance
+    ledger can then be rebuilt by loading the latest snapshot and replaying
+    only the blocks after it, instead of the entire chain.
+
+    Snapshots are signed with an HMAC of the signing key, so that a snapshot
+    that has been tampered with is not trusted. A snapshot is only used if
+    its signature is valid and the block it was taken at is still in the
+    blockchain file at the same position. Without a signing key, no
+    snapshots are taken or used.
+
+    Methods:
+        is_due(block_index):
+            Checks if a snapshot should be taken at a block.
+        save(block_index, block_hash, offset, balances):
+            Saves a snapshot.
+        load_latest_verified():
+            Returns the latest snapshot that can be trusted.
+        archive_chain_segment(snapshot):
+            Archives the part of the chain up to a snapshot.
+    """
+
+    def __init__(self,
+                 signing_key: str | None,
+                 chain_file_name: str = "data/blockchain.json",
+                 snapshot_dir_path: str = "data/balance_snapshots",
+                 archive_dir_path: str = "data/blockchain_archive",
+                 interval: int = 1000,
+                 snapshots_to_keep: int = 3) -> None:
+        """
+        Initializes the snapshot store.
+
+        Args:
+            signing_key: The key to sign and verify snapshots with.
+            chain_file_name: The path to the blockchain file. Defaults to
+                "data/blockchain.json".
+            snapshot_dir_path: The directory to store snapshots in.
+                Defaults to "data/balance_snapshots".
+            archive_dir_path: The directory to archive chain segments to.
+                Defaults to "data/blockchain_archive".
+            interval: The number of blocks between snapshots.
+                Defaults to 1000.
+            snapshots_to_keep: The number of snapshots to keep.
+                Defaults to 3.
+
+        Attributes:
+            chain_file_name: The path to the blockchain file.
+            snapshot_dir_path: The directory snapshots are stored in.
+            archive_dir_path: The directory chain segments are archived to.
+            interval: The number of blocks between snapshots.
+            snapshots_to_keep: The number of snapshots to keep.
+            last_snapshot_index: The block index of the latest snapshot,
+                or None if no snapshot has been loaded or taken.
+            last_loaded_snapshot: The snapshot returned by the last call to
+                `load_latest_verified()`.
+        """
+        self._signing_key: bytes | None = (
+            signing_key.encode() if signing_key else None)
+        self.chain_file_name: str = chain_file_name
+        self.snapshot_dir_path: str = snapshot_dir_path
+        self.archive_dir_path: str = archive_dir_path
+        self.interval: int = interval
+        self.snapshots_to_keep: int = snapshots_to_keep
+        self.last_snapshot_index: int | None = None
+        self.last_loaded_snapshot: BalanceSnapshot | None = None
+        if self._signing_key is None:
+            print("WARNING: SNAPSHOT_SIGNING_KEY is not set. "
+                  "Balance snapshots are disabled, and the entire "
+                  "blockchain will be replayed at startup.")
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Indicates if snapshots can be taken and used.
+        """
+        return self._signing_key is not None
+
+    def _sign(self, snapshot: BalanceSnapshot | Dict[str, Any]) -> str:
+        """
+        Calculates the signature of a snapshot, excluding its signature.
+        """
+        assert self._signing_key is not None, "Signing key is not set."
+        payload: Dict[str, Any] = {
+            key: value for key, value in snapshot.items()
+            if key != "signature"}
+        payload_bytes: bytes = json.dumps(
+            payload, sort_keys=True, separators=(",", ":")).encode()
+        return hmac.new(
+            self._signing_key, payload_bytes, hashlib.sha256).hexdigest()
+
+    def _list_snapshot_indexes(self) -> List[int]:
+        """
+        Lists the block indexes of the stored snapshots, newest first.
+        """
+        if not exists(self.snapshot_dir_path):
+            return []
+        indexes: List[int] = []
+        for file_name in listdir(self.snapshot_dir_path):
+            if (file_name.startswith("snapshot_") and
+                    file_name.endswith(".json")):
+                index_str: str = file_name[len("snapshot_"):-len(".json")]
+                if index_str.isdigit():
+                    indexes.append(int(index_str))
+        indexes.sort(reverse=True)
+        return indexes
+
+    def _snapshot_path(self, block_index: int) -> str:
+        return join(self.snapshot_dir_path, f"snapshot_{block_index}.json")
+
+    def is_due(self, block_index: int | None) -> bool:
+        """
+        Checks if a snapshot should be taken at a block.
+
+        Args:
+            block_index: The index of the last applied block.
+
+        Returns:
+            bool: True if at least `interval` blocks have been added since
+                the latest snapshot, otherwise False.
+        """
+        if not self.enabled or block_index is None:
+            return False
+        if self.last_snapshot_index is None:
+            return block_index >= self.interval
+        return block_index - self.last_snapshot_index >= self.interval
+
+    def save(self,
+             block_index: int,
+             block_hash: str,
+             offset: int,
+             balances: Dict[str, int]) -> None:
+        """
+        Saves a signed snapshot of the balances after a block, and removes
+        the oldest snapshots.
+
+        Args:
+            block_index: The index of the last block included in the balances.
+            block_hash: The hash of that block.
+            offset: The position in the blockchain file right after
+                that block.
+            balances: The balances, keyed by hashed user ID.
+        """
+        if not self.enabled:
+            return
+        snapshot: BalanceSnapshot = {
+            "block_index": block_index,
+            "block_hash": block_hash,
+            "offset": offset,
+            "created_at": time(),
+            "balances": balances,
+            "signature": ""
+        }
+        snapshot["signature"] = self._sign(snapshot)
+        makedirs(self.snapshot_dir_path, exist_ok=True)
+        snapshot_path: str = self._snapshot_path(block_index)
+        # Write to a temporary file first so that a crash cannot leave
+        # a partially written snapshot behind
+        temporary_path: str = f"{snapshot_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file)
+        replace(temporary_path, snapshot_path)
+        self.last_snapshot_index = block_index
+        print(f"Balance snapshot saved at block {block_index}.")
+        for old_index in (
+                self._list_snapshot_indexes()[self.snapshots_to_keep:]):
+            remove(self._snapshot_path(old_index))
+
+    def verify(self, snapshot: BalanceSnapshot) -> bool:
+        """
+        Verifies the signature of a snapshot, and that the block it was taken
+        at is still in the blockchain file at the same position.
+
+        Args:
+            snapshot: The snapshot to verify.
+
+        Returns:
+            bool: True if the snapshot can be trusted, otherwise False.
+        """
+        if not self.enabled:
+            return False
+        if not hmac.compare_digest(self._sign(snapshot),
+                                   snapshot.get("signature", "")):
+            print(f"ERROR: Balance snapshot at block "
+                  f"{snapshot['block_index']} has an invalid signature.")
+            return False
+        if not exists(self.chain_file_name):
+            return False
+        line: str | None = read_block_line_ending_at(
+            self.chain_file_name, snapshot["offset"])
+        if line is None:
+            print(f"WARNING: Balance snapshot at block "
+                  f"{snapshot['block_index']} does not match "
+                  "the blockchain file.")
+            return False
+        block_dict: Dict[str, Any] = json.loads(line)
+        if (block_dict.get("index") != snapshot["block_index"] or
+                block_dict.get("hash") != snapshot["block_hash"]):
+            print(f"WARNING: Balance snapshot at block "
+                  f"{snapshot['block_index']} does not match "
+                  "the blockchain file.")
+            return False
+        return True
+
+    def load_latest_verified(self) -> BalanceSnapshot | None:
+        """
+        Returns the latest snapshot that passes verification.
+
+        Returns:
+            BalanceSnapshot | None: The snapshot, or None if there is no
+                snapshot that can be trusted.
+        """
+        if not self.enabled:
+            return None
+        for block_index in self._list_snapshot_indexes():
+            try:
+                with open(self._snapshot_path(block_index), "r",
+                          encoding="utf-8") as file:
+                    snapshot: BalanceSnapshot = json.load(file)
+            except Exception as e:
+                print(f"ERROR: Error reading balance snapshot "
+                      f"at block {block_index}: {e}")
+                continue
+            if self.verify(snapshot):
+                self.last_snapshot_index = snapshot["block_index"]
+                self.last_loaded_snapshot = snapshot
+                return snapshot
+        self.last_loaded_snapshot = None
+        return None
+
+    def archive_chain_segment(self, snapshot: BalanceSnapshot) -> str | None:
+        """
+        Archives the part of the blockchain file up to a snapshot to
+        a compressed file in the archive directory, continuing from the end
+        of the previous archived segment.
+
+        The blockchain file itself is not modified, since it is owned by
+        the blockchain server. Once a segment has been archived, it can be
+        moved to cold storage.
+
+        Args:
+            snapshot: The snapshot that marks the end of the segment.
+
+        Returns:
+            str | None: The path to the archived segment, or None if there was
+                nothing new to archive.
+        """
+        makedirs(self.archive_dir_path, exist_ok=True)
+        # Segments are named after the byte range they contain
+        segment_start: int = 0
+        for file_name in listdir(self.archive_dir_path):
+            if (file_name.startswith("blockchain_") and
+                    file_name.endswith(".json.gz")):
+                byte_range: List[str] = (
+                    file_name[len("blockchain_"):-len(".json.gz")].split("-"))
+                if len(byte_range) == 2 and byte_range[1].isdigit():
+                    segment_start = max(segment_start, int(byte_range[1]))
+        segment_end: int = snapshot["offset"]
+        if segment_end <= segment_start:
+            return None
+        archive_path: str = join(
+            self.archive_dir_path,
+            f"blockchain_{segment_start}-{segment_end}.json.gz")
+        temporary_path: str = f"{archive_path}.tmp"
+        with open(self.chain_file_name, "rb") as chain_file:
+            chain_file.seek(segment_start)
+            with gzip.open(temporary_path, "wb") as archive_file:
+                bytes_left: int = segment_end - segment_start
+                while bytes_left > 0:
+                    chunk: bytes = chain_file.read(min(bytes_left, 1 << 20))
+                    if not chunk:
+                        break
+                    archive_file.write(chunk)
+                    bytes_left -= len(chunk)
+        replace(temporary_path, archive_path)
+        print(f"Blockchain segment archived to {archive_path}.")
+        return archive_path
+# endregion
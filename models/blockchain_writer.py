@@ -0,0 +1,277 @@
+# region Imports
+# Standard library
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from os import stat
+from os.path import exists
+from time import monotonic
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+
+# Local
+from models.balance_ledger import BalanceLedger
+from models.chain_file import iter_block_lines
+from models.transaction_index import TransactionIndex
+from schemas.data_classes import TransactionReceipt
+from sponsorblockchain.models.blockchain import Blockchain
+if TYPE_CHECKING:
+    from sponsorblockchain.sponsorblockchain_types import (
+        BlockData, Transaction)
+# endregion
+
+# region Types
+# The transactions of one submission, and the future to resolve with
+# the receipt of the block they have been written to
+WriteRequest = Tuple[List["Transaction"], "Future[TransactionReceipt]"]
+# endregion
+
+# region Receipt
+
+
+def add_block_with_receipt(blockchain: Blockchain,
+                           data: "BlockData",
+                           chain_file_name: str = "data/blockchain.json"
+                           ) -> TransactionReceipt:
+    """
+    Adds a block to the blockchain and creates a receipt for it.
+
+    The blockchain server process also appends blocks to the chain, so the
+    last block after adding is not necessarily the one that was added.
+    Instead, the receipt is created from the first block after the end of
+    the file as it was before adding, whose data matches the added data.
+
+    Args:
+        blockchain: The blockchain to add the block to.
+        data: The data of the block.
+        chain_file_name: The path to the blockchain file. Defaults to
+            "data/blockchain.json".
+
+    Returns:
+        TransactionReceipt: The index, hash, and timestamp of the added block.
+
+    Raises:
+        ValueError: If the added block cannot be found in the blockchain file.
+    """
+    offset: int = (
+        stat(chain_file_name).st_size if exists(chain_file_name) else 0)
+    blockchain.add_block(data=data, difficulty=0)
+    # Compare the data the way it is read back from the file
+    added_data: Any = json.loads(json.dumps(data))
+    for line, _ in iter_block_lines(chain_file_name, offset):
+        try:
+            block_dict: Dict[str, Any] = json.loads(line)
+        except ValueError:
+            # The offset was in the middle of a block that was being
+            # written by another process
+            continue
+        if block_dict.get("data") == added_data:
+            return TransactionReceipt(block_index=block_dict["index"],
+                                      block_hash=block_dict["hash"],
+                                      timestamp=block_dict["timestamp"])
+    raise ValueError("The added block was not found in the blockchain file.")
+# endregion
+
+# region Writer
+
+
+class BlockchainWriter:
+    """
+    Writes transactions to the blockchain from a dedicated thread.
+
+    Adding a block hashes the block and appends it to the blockchain file,
+    which would block the event loop if done in a coroutine. Instead,
+    callers submit their transactions to the writer and await the returned
+    future. The writer thread is the only writer of the chain in the bot
+    process.
+
+    Submissions that arrive within the group commit window of each other are
+    written together as a single block, so bursts of reactions and spins
+    cost one block write rather than one per submission.
+
+    Methods:
+        start():
+            Starts the writer thread.
+        submit(transactions):
+            Queues transactions to be written.
+        stop():
+            Writes the queued transactions and stops the writer thread.
+    """
+
+    def __init__(self,
+                 blockchain: Blockchain,
+                 balance_ledger: BalanceLedger | None = None,
+                 group_commit_window: float = 0.05,
+                 max_group_size: int = 100,
+                 chain_file_name: str = "data/blockchain.json",
+                 transaction_index: TransactionIndex | None = None) -> None:
+        """
+        Initializes the writer. The writer thread is not started until
+        `start()` is called.
+
+        Args:
+            blockchain: The blockchain to write to.
+            balance_ledger: The balance ledger to update after each block.
+                Defaults to None.
+            group_commit_window: How many seconds to wait for more
+                submissions after the first one before writing the block.
+                Defaults to 0.05.
+            max_group_size: The maximum number of submissions to write
+                as a single block. Defaults to 100.
+            chain_file_name: The path to the blockchain file. Defaults to
+                "data/blockchain.json".
+            transaction_index: The transaction index to update after each
+                block. Defaults to None.
+
+        Attributes:
+            blockchain: The blockchain to write to.
+            balance_ledger: The balance ledger to update after each block.
+            group_commit_window: The group commit window in seconds.
+            max_group_size: The maximum number of submissions per block.
+            chain_file_name: The path to the blockchain file.
+            transaction_index: The transaction index to update after each
+                block.
+        """
+        self.blockchain: Blockchain = blockchain
+        self.balance_ledger: BalanceLedger | None = balance_ledger
+        self.group_commit_window: float = group_commit_window
+        self.max_group_size: int = max_group_size
+        self.chain_file_name: str = chain_file_name
+        self.transaction_index: TransactionIndex | None = transaction_index
+        self._queue: "queue.Queue[WriteRequest | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._stopped: bool = False
+        # Keeps submissions from being queued after the stop signal
+        self._stop_lock: threading.Lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Starts the writer thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._stop_lock:
+            self._stopped = False
+        self._thread = threading.Thread(target=self._run,
+                                        name="blockchain-writer",
+                                        daemon=True)
+        self._thread.start()
+        print("Blockchain writer started.")
+
+    def submit(self,
+               transactions: List["Transaction"]
+               ) -> "Future[TransactionReceipt]":
+        """
+        Queues transactions to be written to the blockchain. The transactions
+        of one submission are always written to the same block.
+
+        Args:
+            transactions: The transactions to write.
+
+        Returns:
+            Future[TransactionReceipt]: A future that is resolved with the
+                receipt of the block when the transactions have been written,
+                or set to the exception that prevented it. If the writer has
+                been stopped, the future is set to a RuntimeError right away.
+        """
+        future: Future[TransactionReceipt] = Future()
+        with self._stop_lock:
+            if self._stopped:
+                future.set_exception(RuntimeError(
+                    "The blockchain writer has been stopped."))
+                return future
+            self._queue.put((transactions, future))
+        return future
+
+    def stop(self) -> None:
+        """
+        Writes the queued transactions and stops the writer thread.
+        Transactions submitted after this has been called are not written.
+        This method blocks until the writer thread has stopped.
+        """
+        if self._thread is None:
+            return
+        print("Stopping blockchain writer...")
+        with self._stop_lock:
+            self._stopped = True
+            self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        print("Blockchain writer stopped.")
+
+    def _collect_group(self,
+                       first_request: WriteRequest) -> Tuple[
+                           List[WriteRequest], bool]:
+        """
+        Collects the submissions that arrive within the group commit window
+        of the first one.
+
+        Returns:
+            A tuple of the collected submissions, and whether the writer has
+            been asked to stop.
+        """
+        group: List[WriteRequest] = [first_request]
+        deadline: float = monotonic() + self.group_commit_window
+        while len(group) < self.max_group_size:
+            remaining: float = deadline - monotonic()
+            try:
+                if remaining > 0:
+                    request: WriteRequest | None = self._queue.get(
+                        timeout=remaining)
+                else:
+                    # Take what is already waiting without waiting for more
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return group, True
+            group.append(request)
+        return group, False
+
+    def _write_group(self, group: List[WriteRequest]) -> None:
+        """
+        Writes a group of submissions as a single block and resolves
+        their futures.
+        """
+        data: BlockData = []
+        for transactions, _ in group:
+            for transaction in transactions:
+                data.append({"transaction": transaction})
+        try:
+            receipt: TransactionReceipt = add_block_with_receipt(
+                self.blockchain, data, self.chain_file_name)
+        except Exception as e:
+            for _, future in group:
+                future.set_exception(e)
+            return
+        if self.balance_ledger is not None:
+            try:
+                self.balance_ledger.update()
+            except Exception as e:
+                print(f"ERROR: Error updating balance ledger: {e}")
+        for _, future in group:
+            future.set_result(receipt)
+        # After resolving the futures, so that the callers do not wait
+        # for the indexing, snapshots, or saves
+        if self.transaction_index is not None:
+            try:
+                self.transaction_index.update()
+                self.transaction_index.save_if_due()
+            except Exception as e:
+                print(f"ERROR: Error updating transaction index: {e}")
+        if self.balance_ledger is not None:
+            self.balance_ledger.take_snapshot_if_due()
+
+    def _run(self) -> None:
+        """
+        Writes queued submissions until the writer is stopped.
+        """
+        stopping: bool = False
+        while not stopping:
+            first_request: WriteRequest | None = self._queue.get()
+            if first_request is None:
+                break
+            group: List[WriteRequest]
+            group, stopping = self._collect_group(first_request)
+            self._write_group(group)
+# endregion
@@ -0,0 +1,82 @@
+# region Imports
+# Standard library
+from typing import Iterator, Tuple
+# endregion
+
+# region Constants
+# How many bytes to read at a time when searching backwards for a line
+READ_BACK_CHUNK_SIZE: int = 64 * 1024
+# endregion
+
+# region Read blocks
+
+
+def iter_block_lines(chain_file_name: str,
+                     offset: int = 0) -> Iterator[Tuple[str, int]]:
+    """
+    Iterates the blocks in the blockchain file, starting at the given offset.
+
+    The blockchain file has one JSON-encoded block per line. A trailing line
+    without a newline is a block that is still being written, so iteration
+    stops before it.
+
+    Args:
+        chain_file_name: The path to the blockchain file.
+        offset: The position in the file to start reading from. Defaults to 0.
+
+    Yields:
+        A tuple of the line containing the block, and the position in the
+        file right after the line.
+    """
+    with open(chain_file_name, "rb") as file:
+        file.seek(offset)
+        for line_bytes in file:
+            if not line_bytes.endswith(b"\n"):
+                break
+            offset += len(line_bytes)
+            line: str = line_bytes.decode("utf-8").strip()
+            if line == "":
+                continue
+            yield line, offset
+
+
+def read_block_line_ending_at(chain_file_name: str,
+                              offset: int) -> str | None:
+    """
+    Reads the block whose line ends right before the given offset.
+
+    Args:
+        chain_file_name: The path to the blockchain file.
+        offset: The position in the file right after the line.
+
+    Returns:
+        str | None: The line containing the block, or None if there is no
+            complete line ending at the offset.
+    """
+    if offset <= 0:
+        return None
+    with open(chain_file_name, "rb") as file:
+        file.seek(0, 2)
+        if file.tell() < offset:
+            return None
+        file.seek(offset - 1)
+        if file.read(1) != b"\n":
+            return None
+        # Search backwards for the newline that ends the previous line
+        chunk_end: int = offset - 1
+        tail: bytes = b""
+        while chunk_end > 0:
+            chunk_start: int = max(0, chunk_end - READ_BACK_CHUNK_SIZE)
+            file.seek(chunk_start)
+            chunk: bytes = file.read(chunk_end - chunk_start)
+            newline_position: int = chunk.rfind(b"\n")
+            if newline_position != -1:
+                tail = chunk[newline_position + 1:] + tail
+                break
+            tail = chunk + tail
+            chunk_end = chunk_start
+        line: str = tail.decode("utf-8").strip()
+    if line == "":
+        return None
+    return line
+# endregion
@@ -0,0 +1,378 @@
+# region Imports
+# Standard library
+import json
+import threading
+from os import stat
+from os.path import exists
+from typing import Any, Dict, List, Tuple
+
+# Local
+from models.chain_file import iter_block_lines
+from schemas.typed import ChainRangeResult
+from sponsorblockchain.models.block import Block
+# endregion
+
+# region Block verification
+
+
+def verify_block_line(line: str,
+                      previous_index: int | None,
+                      previous_hash: str | None) -> Tuple[int, str]:
+    """
+    Verifies a single block, read from a line in the blockchain file, against
+    the block that precedes it.
+
+    The checks are the same as those of `Blockchain.is_chain_valid()`: the
+    stored hash must match the recalculated hash, and the block must link
+    to the hash of the previous block.
+
+    Args:
+        line: The line from the blockchain file containing the block.
+        previous_index: The index of the previous block, or None if the block
+            is the genesis block.
+        previous_hash: The hash of the previous block, or None if the block
+            is the genesis block.
+
+    Returns:
+        A tuple of the block's index and hash.
+
+    Raises:
+        ValueError: If the block is invalid.
+    """
+    block_dict: Dict[str, Any] = json.loads(line)
+    block = Block(
+        index=block_dict["index"],
+        timestamp=block_dict["timestamp"],
+        data=block_dict["data"],
+        previous_block_hash=block_dict["previous_block_hash"],
+        nonce=block_dict.get("nonce", 0))
+    block_index: int = block_dict["index"]
+    block_hash: str = block_dict["hash"]
+    if block_hash != block.calculate_hash():
+        raise ValueError(f"Block {block_index} has an invalid hash.")
+    if previous_hash is not None:
+        if block_dict["previous_block_hash"] != previous_hash:
+            raise ValueError(f"Block {block_index} does not link to "
+                             "the previous block.")
+        if previous_index is not None and block_index != previous_index + 1:
+            raise ValueError(f"Block {block_index} does not follow "
+                             f"block {previous_index}.")
+    return block_index, block_hash
+# endregion
+
+# region Parallel audit
+
+
+def split_chain_file(chain_file_name: str,
+                     range_count: int) -> List[Tuple[int, int]]:
+    """
+    Splits the blockchain file into byte ranges of about the same size.
+    The ranges do not have to fall on line boundaries, since
+    `verify_chain_range()` assigns each block to the range its line starts in.
+
+    Args:
+        chain_file_name: The path to the blockchain file.
+        range_count: The number of ranges.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end offsets of each range.
+    """
+    file_size: int = stat(chain_file_name).st_size
+    range_count = max(1, min(range_count, file_size))
+    range_size: int = -(-file_size // range_count)
+    return [(start, min(start + range_size, file_size))
+            for start in range(0, file_size, range_size)]
+
+
+def verify_chain_range(chain_file_name: str,
+                       start_offset: int,
+                       end_offset: int) -> ChainRangeResult:
+    """
+    Verifies the blocks whose lines start within a byte range of the
+    blockchain file, and the links between them. The link of the first block
+    to the block before the range is checked when the ranges are stitched
+    together.
+
+    This function runs in a worker process.
+
+    Args:
+        chain_file_name: The path to the blockchain file.
+        start_offset: The start of the range.
+        end_offset: The end of the range.
+
+    Returns:
+        ChainRangeResult: The first and last block of the range, and the
+            first invalid block in it, if any.
+    """
+    result: ChainRangeResult = {
+        "start_offset": start_offset,
+        "end_offset": start_offset,
+        "block_count": 0,
+        "first_index": None,
+        "first_previous_hash": None,
+        "last_index": None,
+        "last_hash": None,
+        "error_index": None,
+        "error": None
+    }
+    with open(chain_file_name, "rb") as file:
+        position: int = start_offset
+        if start_offset > 0:
+            # Skip the rest of the line that started in the previous range
+            file.seek(start_offset - 1)
+            position = start_offset - 1 + len(file.readline())
+        while position < end_offset:
+            line_bytes: bytes = file.readline()
+            if not line_bytes.endswith(b"\n"):
+                # The block is still being written
+                break
+            position += len(line_bytes)
+            line: str = line_bytes.decode("utf-8").strip()
+            if line == "":
+                continue
+            try:
+                if result["first_index"] is None:
+                    block_dict: Dict[str, Any] = json.loads(line)
+                    result["first_previous_hash"] = (
+                        block_dict["previous_block_hash"])
+                    result["first_index"] = block_dict["index"]
+                result["last_index"], result["last_hash"] = (
+                    verify_block_line(line,
+                                      result["last_index"],
+                                      result["last_hash"]))
+            except Exception as e:
+                result["error_index"] = (
+                    0 if result["last_index"] is None
+                    else result["last_index"] + 1)
+                try:
+                    result["error_index"] = json.loads(line)["index"]
+                except Exception:
+                    pass
+                result["error"] = str(e)
+                break
+            result["block_count"] += 1
+        result["end_offset"] = position
+    return result
+
+
+def stitch_chain_ranges(results: List[ChainRangeResult]) -> Tuple[
+        int | None, str | None, int | None, str | None, int]:
+    """
+    Stitches the results of `verify_chain_range()` together in file order,
+    checking that the first block of each range links to the last block of
+    the range before it.
+
+    Args:
+        results: The results of all ranges, in any order.
+
+    Returns:
+        A tuple of the index of the first invalid block (or None if the chain
+        is valid), a description of the error, and the index, hash, and end
+        offset of the last block before the first range with an error.
+    """
+    last_index: int | None = None
+    last_hash: str | None = None
+    last_offset: int = 0
+    for result in sorted(results, key=lambda r: r["start_offset"]):
+        if result["block_count"] == 0 and result["error_index"] is None:
+            continue
+        if last_hash is not None and result["first_index"] is not None:
+            if result["first_previous_hash"] != last_hash:
+                return (result["first_index"],
+                        f"Block {result['first_index']} does not link to "
+                        "the previous block.",
+                        last_index, last_hash, last_offset)
+            if (last_index is not None and
+                    result["first_index"] != last_index + 1):
+                return (result["first_index"],
+                        f"Block {result['first_index']} does not follow "
+                        f"block {last_index}.",
+                        last_index, last_hash, last_offset)
+        if result["error_index"] is not None:
+            return (result["error_index"], result["error"],
+                    last_index, last_hash, last_offset)
+        last_index = result["last_index"]
+        last_hash = result["last_hash"]
+        last_offset = result["end_offset"]
+    return None, None, last_index, last_hash, last_offset
+# endregion
+
+# region Validator
+
+
+class IncrementalChainValidator:
+    """
+    Validates the blockchain incrementally.
+
+    The validator remembers the index, hash, and file offset of the last block
+    it has verified, so that each validation only has to verify the blocks
+    that have been appended since the previous validation. This keeps the
+    cost of a validation independent of the length of the chain.
+
+    A full audit verifies the entire chain from the genesis block. It is meant
+    to be run on a schedule or from a maintainer command, not after every
+    transaction.
+
+    Methods:
+        validate_new_blocks():
+            Verifies the blocks appended since the last verified block.
+        full_audit():
+            Verifies the entire chain and resets the verified position.
+        trust_block(block_index, block_hash, offset):
+            Starts incremental validation after a trusted block.
+    """
+
+    def __init__(self,
+                 chain_file_name: str = "data/blockchain.json") -> None:
+        """
+        Initializes the validator. Nothing is verified until
+        `full_audit()` or `trust_block()` seeds the verified position.
+        While a full audit is running, `validate_new_blocks()` leaves the
+        unseeded chain to the audit instead of verifying it a second time.
+
+        Args:
+            chain_file_name: The path to the blockchain file. Defaults to
+                "data/blockchain.json".
+
+        Attributes:
+            chain_file_name: The path to the blockchain file.
+            last_verified_index: The index of the last verified block.
+            last_verified_hash: The hash of the last verified block.
+            last_verified_offset: The position in the blockchain file right
+                after the last verified block.
+        """
+        self.chain_file_name: str = chain_file_name
+        self.last_verified_index: int | None = None
+        self.last_verified_hash: str | None = None
+        self.last_verified_offset: int = 0
+        self._audits_running: int = 0
+        # Audits can run in a worker thread
+        self._lock: threading.Lock = threading.Lock()
+
+    def trust_block(self,
+                    block_index: int,
+                    block_hash: str,
+                    offset: int) -> None:
+        """
+        Starts incremental validation after a trusted block, such as the
+        block of a verified balance snapshot, instead of the genesis block.
+        The blocks before it are still verified by full audits.
+
+        Args:
+            block_index: The index of the trusted block.
+            block_hash: The hash of the trusted block.
+            offset: The position in the blockchain file right after
+                the trusted block.
+        """
+        with self._lock:
+            if offset > self.last_verified_offset:
+                self.last_verified_index = block_index
+                self.last_verified_hash = block_hash
+                self.last_verified_offset = offset
+
+    def _verify_from(self,
+                     offset: int,
+                     previous_index: int | None,
+                     previous_hash: str | None) -> Tuple[int | None,
+                                                         str | None,
+                                                         int]:
+        """
+        Verifies all complete blocks in the blockchain file from the given
+        offset to the end of the file.
+
+        Returns:
+            A tuple of the index and hash of the last verified block, and the
+            offset right after it.
+
+        Raises:
+            ValueError: If a block is invalid.
+        """
+        for line, line_end in iter_block_lines(self.chain_file_name, offset):
+            previous_index, previous_hash = verify_block_line(
+                line, previous_index, previous_hash)
+            offset = line_end
+        return previous_index, previous_hash, offset
+
+    def validate_new_blocks(self) -> bool:
+        """
+        Verifies the blocks that have been appended to the blockchain since
+        the last verified block.
+
+        If nothing has been verified yet and a full audit is running,
+        the blocks are left to the audit, which verifies the chain up to
+        the end of the file. Blocks appended after the audit has read past
+        them are verified by the next call once the audit has finished.
+
+        Returns:
+            bool: True if the new blocks are valid, or if they will be
+                verified by the running audit, otherwise False.
+        """
+        if not exists(self.chain_file_name):
+            print(f"ERROR: Blockchain file '{self.chain_file_name}' "
+                  "not found.")
+            return False
+        with self._lock:
+            if (self.last_verified_hash is None and
+                    self._audits_running > 0):
+                return True
+            file_size: int = stat(self.chain_file_name).st_size
+            if file_size < self.last_verified_offset:
+                # The chain is append-only, so a shorter file means that
+                # the chain has been replaced
+                print("WARNING: The blockchain file is shorter than the "
+                      "verified part of the chain. "
+                      "The entire chain will be verified.")
+                self.last_verified_index = None
+                self.last_verified_hash = None
+                self.last_verified_offset = 0
+            try:
+                index, block_hash, offset = self._verify_from(
+                    self.last_verified_offset,
+                    self.last_verified_index,
+                    self.last_verified_hash)
+            except Exception as e:
+                print(f"ERROR: Blockchain is invalid: {e}")
+                return False
+            self.last_verified_index = index
+            self.last_verified_hash = block_hash
+            self.last_verified_offset = offset
+        return True
+
+    def full_audit(self) -> bool:
+        """
+        Verifies the entire blockchain from the genesis block.
+        If the chain is valid, the verified position is moved to the end of
+        the chain.
+
+        This method does not touch the event loop and can be run in
+        a worker thread.
+
+        Returns:
+            bool: True if the chain is valid, otherwise False.
+        """
+        if not exists(self.chain_file_name):
+            print(f"ERROR: Blockchain file '{self.chain_file_name}' "
+                  "not found.")
+            return False
+        print("Auditing the blockchain...")
+        with self._lock:
+            self._audits_running += 1
+        try:
+            index, block_hash, offset = self._verify_from(0, None, None)
+        except Exception as e:
+            with self._lock:
+                self._audits_running -= 1
+            print(f"ERROR: Blockchain audit failed: {e}")
+            return False
+        with self._lock:
+            # Seed the validator in the same step, so that no validation
+            # sees the audit finished before it has been seeded
+            self._audits_running -= 1
+            # Blocks may have been verified incrementally during the audit
+            if offset >= self.last_verified_offset:
+                self.last_verified_index = index
+                self.last_verified_hash = block_hash
+                self.last_verified_offset = offset
+        print(f"Blockchain audit passed. Last block: {index}.")
+        return True
+# endregion
@@ -1,9 +1,11 @@
 # region Imports
 # Standard library
+import asyncio
 import json
-from os import makedirs
-from os.path import exists
-from typing import Dict, List
+from collections import deque
+from os import makedirs, replace, scandir
+from os.path import dirname, exists
+from typing import Any, Deque, Dict, Iterable, List
 
 # Third party
 from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
@@ -20,25 +22,32 @@ class ChannelCheckpoints:
     channel in a guild. It allows for saving, loading, and managing
     message IDs as checkpoints.
 
+    The checkpoints are kept in memory and written to disk by
+    the `CheckpointStore` that the channel belongs to.
+
+    Separately from the checkpoints, the channel has a catch-up cursor: the
+    last message processed by an unfinished run of catch-up after a restart
+    (see `utils.missed_messages`). It lets the next run resume where that
+    run stopped, even if new checkpoints have been saved since.
+
     Methods:
         __init__(self,
             guild_name,
             guild_id,
             channel_name,
             channel_id,
-            max_checkpoints):
+            max_checkpoints,
+            message_ids,
+            catch_up_cursor):
             Initializes checkpoints for a channel in a guild.
-        count_lines(self):
-        create(self):
-            Creates a checkpoint file for the channel, including necessary
-            directories and metadata files.
         save(self, message_id):
-            Saves the given message ID as a checkpoint in the file.
+            Saves the given message ID as a checkpoint in memory.
             If the number of checkpoints exceeds the maximum allowed, the
             oldest checkpoint is removed.
-        remove_first_line(self):
         load(self):
-            Loads the checkpoints from the file specified by self.file_name.
+            Returns the checkpoints.
+        set_catch_up_cursor(self, message_id):
+            Moves or clears the catch-up cursor.
         """
 
     def __init__(self,
@@ -46,7 +55,9 @@ class ChannelCheckpoints:
                  guild_id: int,
                  channel_name: str,
                  channel_id: int,
-                 max_checkpoints: int = 10) -> None:
+                 max_checkpoints: int = 10,
+                 message_ids: Iterable[int] = (),
+                 catch_up_cursor: int | None = None) -> None:
         """
         Initialize checkpoints for a channel in a guild.
 
@@ -56,6 +67,8 @@ class ChannelCheckpoints:
             channel_name: The name of the channel
             channel_id: The ID of the channel
             max_checkpoints: The maximum number of checkpoints
+            message_ids: The stored checkpoints, oldest first
+            catch_up_cursor: The stored catch-up cursor
 
         Attributes:
             max_checkpoints: The maximum number of checkpoints
@@ -63,138 +76,297 @@ class ChannelCheckpoints:
             guild_id: The ID of the guild
             channel_name: The name of the channel
             channel_id: The ID of the channel
-            directory: The directory path for storing checkpoints
-            file_name: The file name for storing channel checkpoints
-            entry_count: The count of entries in the checkpoints file
-            last_message_ids: The last message IDs in the channel
+            checkpoints: The last message IDs in the channel, oldest first
+            catch_up_cursor: The last message processed by unfinished
+                catch-up, or None if catch-up has finished
+            dirty: Whether the checkpoints have changed since they were
+                last written to disk
         """
         self.max_checkpoints: int = max_checkpoints
         self.guild_name: str = guild_name
         self.guild_id: int = guild_id
         self.channel_name: str = channel_name
         self.channel_id: int = channel_id
-        self.directory: str = (f"data/checkpoints/guilds/{self.guild_id}"
-                               f"/channels/{self.channel_id}")
-        self.file_name: str = f"{self.directory}/channel_checkpoints.json"
-        self.entry_count: int = self.count_lines()
-        self.last_message_ids: List[Dict[str, int]] | None = self.load()
+        self.checkpoints: Deque[int] = deque(message_ids,
+                                             maxlen=max_checkpoints)
+        self.catch_up_cursor: int | None = catch_up_cursor
+        self.dirty: bool = False
 
-    def count_lines(self) -> int:
+    def save(self, message_id: int) -> None:
         """
-        Counts the number of lines in the file specified by self.file_name.
-        Returns:
-            int: The number of lines in the file. Returns 0 if the file
-                does not exist.
+        Saves the given message ID as a checkpoint. The checkpoint is only
+        kept in memory until the checkpoints are flushed. If the number of
+        checkpoints exceeds the maximum allowed, the oldest checkpoint
+        is removed.
+        Args:
+            message_id: The ID of the message to save as a checkpoint.
         """
-        if not exists(self.file_name):
-            return 0
+        # print(f"Saving checkpoint: {message_id}")
+        self.checkpoints.append(message_id)
+        self.dirty = True
 
-        with open(self.file_name, "r") as file:
-            count: int = sum(1 for _ in file)
-            return count
-
-    def create(self) -> None:
-        """
-        Creates an checkpoint file for the channel.
-
-        This method performs the following tasks:
-        1. Creates any missing directories in the path specified
-            by `self.file_name`.
-        2. Writes the guild name to a JSON file named `guild_name.json` in
-            the directory corresponding to the guild ID.
-        3. Writes the channel name to a JSON file named `channel_name.json` in
-            the directory corresponding to the channel ID.
-        4. Creates an empty checkpoints file at the path specified
-            by `self.file_name`.
-
-        The directory structure is created based on the path specified
-        in `self.file_name`.
-        The guild and channel names are written to files in directories named
-        after their IDs, allowing bot maintainers to identify guilds and
-        channels by their names.
-        """
-        # Create missing directories
-        directories: str = self.file_name[:self.file_name.rfind("/")]
-        for i, directory in enumerate(directories.split("/")):
-            path: str = "/".join(directories.split("/")[:i+1])
-            if not exists(directory):
-                makedirs(path, exist_ok=True)
-            # Write the guild name and channel name to files in the id
-            # directories, so that bot maintainers can identify the guilds and
-            # channels
-            # Channel names can change, but the IDs will not
-            if directory.isdigit() and int(directory) == self.guild_id:
-                name_file_name: str = f"{path}/guild_name.json"
-                with open(name_file_name, "w") as file:
-                    file.write(json.dumps({"guild_name": self.guild_name}))
-                    pass
-            elif directory.isdigit() and int(directory) == self.channel_id:
-                name_file_name: str = f"{path}/channel_name.json"
-                with open(name_file_name, "w") as file:
-                    file.write(json.dumps({"channel_name": self.channel_name}))
-                    pass
-
-        print(f"Creating checkpoints file: '{self.file_name}'")
-        with open(self.file_name, "w"):
-            pass
+    def load(self) -> List[Dict[str, int]] | None:
+        """
+        Returns the checkpoints.
+        Returns:
+            A list of dictionaries containing checkpoint data, oldest first,
+                or None if the channel has no checkpoints.
+        """
+        if len(self.checkpoints) == 0:
+            return None
+        return [{"last_message_id": message_id}
+                for message_id in self.checkpoints]
 
-    def save(self, message_id: int) -> None:
+    def set_catch_up_cursor(self, message_id: int | None) -> None:
         """
-        Saves the given message ID as a checkpoint in the file.
-        If the file does not exist, it creates a new one. The message ID is
-        appended to the file in JSON format. If the number of checkpoints
-        exceeds the maximum allowed, the oldest checkpoint is removed.
+        Moves the catch-up cursor to a message, or clears it when catch-up
+        has finished. Like the checkpoints, the cursor is only kept in
+        memory until the checkpoints are flushed.
         Args:
-            message_id: The ID of the message to save as a checkpoint.
+            message_id: The ID of the last processed message, or None.
         """
-        if not exists(self.file_name):
-            self.create()
+        if message_id != self.catch_up_cursor:
+            self.catch_up_cursor = message_id
+            self.dirty = True
+# endregion
 
-        # print(f"Saving checkpoint: {message_id}")
-        self.entry_count = self.count_lines()
-        with open(self.file_name, "a") as file:
-            if self.entry_count == 0:
-                file.write(json.dumps({"last_message_id": message_id}))
-            else:
-                file.write("\n" + json.dumps({"last_message_id": message_id}))
-        self.entry_count += 1
+# region CP store
 
-        while self.entry_count > self.max_checkpoints:
-            self.remove_first_line()
-            self.entry_count -= 1
 
-    def remove_first_line(self) -> None:
+class CheckpointStore:
+    """
+    Stores the checkpoints of all channels, and the names of their guilds
+    and channels, in a single JSON file that is read once at startup.
+
+    Checkpoints are saved in memory by `ChannelCheckpoints`, and the whole
+    store is written to the file when it is flushed.
+
+    Methods:
+        get_or_add_channel(guild_name, guild_id, channel_name, channel_id):
+            Returns the checkpoints of a channel, adding the channel if it
+            is new.
+        take_snapshot():
+            Returns the contents of the file if anything has changed since
+            the last flush.
+        write(snapshot):
+            Writes a snapshot to the file.
+        flush():
+            Writes the store to the file if anything has changed.
+    """
+
+    def __init__(self,
+                 file_name: str = "data/checkpoints/checkpoints.json",
+                 legacy_dir_path: str = "data/checkpoints/guilds",
+                 max_checkpoints: int = 10) -> None:
+        """
+        Loads the store from the file. If there is no file yet, the
+        checkpoints are imported from the per-channel files of earlier
+        versions, which are left in place.
+
+        Args:
+            file_name: The path to the checkpoints file. Defaults to
+                "data/checkpoints/checkpoints.json".
+            legacy_dir_path: The directory of the per-channel checkpoint
+                files. Defaults to "data/checkpoints/guilds".
+            max_checkpoints: The maximum number of checkpoints per channel.
+                Defaults to 10.
+
+        Attributes:
+            file_name: The path to the checkpoints file.
+            legacy_dir_path: The directory of the per-channel
+                checkpoint files.
+            max_checkpoints: The maximum number of checkpoints per channel.
+            guild_names: The name of each guild, keyed by guild ID.
+            channels: The checkpoints of each channel, keyed by channel ID.
+            names_dirty: Whether a guild or channel has been added or renamed
+                since the last flush.
         """
-        Removes the first line from the file specified by self.file_name.
+        self.file_name: str = file_name
+        self.legacy_dir_path: str = legacy_dir_path
+        self.max_checkpoints: int = max_checkpoints
+        self.guild_names: Dict[int, str] = {}
+        self.channels: Dict[int, ChannelCheckpoints] = {}
+        self.names_dirty: bool = False
+        if exists(self.file_name):
+            self._load()
+        elif exists(self.legacy_dir_path):
+            self._import_legacy()
+            self.flush()
+
+    def _add_channel(self,
+                     guild_id: int,
+                     channel_id: int,
+                     channel_name: str,
+                     message_ids: Iterable[int],
+                     catch_up_cursor: int | None = None) -> None:
+        self.channels[channel_id] = ChannelCheckpoints(
+            guild_name=self.guild_names.get(guild_id, ""),
+            guild_id=guild_id,
+            channel_name=channel_name,
+            channel_id=channel_id,
+            max_checkpoints=self.max_checkpoints,
+            message_ids=message_ids,
+            catch_up_cursor=catch_up_cursor)
 
-        This method reads all lines from the file, then writes all lines except
-        the first one
-        back to the file, effectively removing the first line.
+    def _load(self) -> None:
+        """
+        Loads the store from the checkpoints file.
         """
         with open(self.file_name, "r") as file:
-            lines: List[str] = file.readlines()
-        with open(self.file_name, "w") as file:
-            file.writelines(lines[1:])
+            contents: Dict[str, Any] = json.load(file)
+        for guild_id, guild in contents.get("guilds", {}).items():
+            self.guild_names[int(guild_id)] = guild["guild_name"]
+        for channel_id, channel in contents.get("channels", {}).items():
+            self._add_channel(guild_id=channel["guild_id"],
+                              channel_id=int(channel_id),
+                              channel_name=channel["channel_name"],
+                              message_ids=channel["last_message_ids"],
+                              catch_up_cursor=channel.get("catch_up_cursor"))
 
-    def load(self) -> List[Dict[str, int]] | None:
+    def _read_name(self, file_name: str, key: str) -> str:
+        if not exists(file_name):
+            return ""
+        with open(file_name, "r") as file:
+            return json.load(file).get(key, "")
+
+    def _import_legacy(self) -> None:
+        """
+        Imports the checkpoints and names from the per-channel files.
         """
-        Loads checkpoints from a file.
+        print("Importing channel checkpoints from per-channel files...")
+        for guild_entry in scandir(self.legacy_dir_path):
+            if not guild_entry.is_dir() or not guild_entry.name.isdigit():
+                continue
+            guild_id: int = int(guild_entry.name)
+            self.guild_names[guild_id] = self._read_name(
+                f"{guild_entry.path}/guild_name.json", "guild_name")
+            channels_path: str = f"{guild_entry.path}/channels"
+            if not exists(channels_path):
+                continue
+            for channel_entry in scandir(channels_path):
+                if (not channel_entry.is_dir() or
+                        not channel_entry.name.isdigit()):
+                    continue
+                message_ids: List[int] = []
+                checkpoints_file_name: str = (
+                    f"{channel_entry.path}/channel_checkpoints.json")
+                try:
+                    if exists(checkpoints_file_name):
+                        with open(checkpoints_file_name, "r") as file:
+                            for line in file:
+                                if line.strip() != "":
+                                    message_ids.append(
+                                        int(json.loads(line)
+                                            ["last_message_id"]))
+                except Exception as e:
+                    print(f"ERROR: Error reading checkpoints "
+                          f"'{checkpoints_file_name}': {e}")
+                self._add_channel(
+                    guild_id=guild_id,
+                    channel_id=int(channel_entry.name),
+                    channel_name=self._read_name(
+                        f"{channel_entry.path}/channel_name.json",
+                        "channel_name"),
+                    message_ids=message_ids)
+        self.names_dirty = True
+        print(f"Checkpoints of {len(self.channels)} channels imported.")
+
+    def get_or_add_channel(self,
+                           guild_name: str,
+                           guild_id: int,
+                           channel_name: str,
+                           channel_id: int) -> ChannelCheckpoints:
+        """
+        Returns the checkpoints of a channel, adding the channel if it is
+        new. The stored guild and channel names are updated if they have
+        changed.
+
+        Args:
+            guild_name: The name of the guild.
+            guild_id: The ID of the guild.
+            channel_name: The name of the channel.
+            channel_id: The ID of the channel.
+
+        Returns:
+            ChannelCheckpoints: The checkpoints of the channel.
+        """
+        if self.guild_names.get(guild_id) != guild_name:
+            self.guild_names[guild_id] = guild_name
+            self.names_dirty = True
+        channel_checkpoints: ChannelCheckpoints | None = (
+            self.channels.get(channel_id))
+        if channel_checkpoints is None:
+            self._add_channel(guild_id=guild_id,
+                              channel_id=channel_id,
+                              channel_name=channel_name,
+                              message_ids=())
+            self.names_dirty = True
+            return self.channels[channel_id]
+        if (channel_checkpoints.channel_name != channel_name or
+                channel_checkpoints.guild_name != guild_name or
+                channel_checkpoints.guild_id != guild_id):
+            channel_checkpoints.channel_name = channel_name
+            channel_checkpoints.guild_name = guild_name
+            channel_checkpoints.guild_id = guild_id
+            self.names_dirty = True
+        return channel_checkpoints
+
+    def take_snapshot(self) -> Dict[str, Any] | None:
+        """
+        Returns the contents of the checkpoints file if anything has changed
+        since the last flush, and marks everything as flushed. Call this on
+        the event loop, and pass the result to `write()`, which can run in
+        a worker thread.
+
         Returns:
-            A list of dictionaries containing checkpoint data if the file
-                exists, otherwise None.
+            The contents of the checkpoints file, or None if nothing
+                has changed.
         """
-        if not exists(self.file_name):
+        dirty: bool = self.names_dirty
+        for channel_checkpoints in self.channels.values():
+            dirty = dirty or channel_checkpoints.dirty
+            channel_checkpoints.dirty = False
+        self.names_dirty = False
+        if not dirty:
             return None
+        return {
+            "guilds": {
+                str(guild_id): {"guild_name": guild_name}
+                for guild_id, guild_name in self.guild_names.items()},
+            "channels": {
+                str(channel_id): {
+                    "guild_id": channel_checkpoints.guild_id,
+                    "channel_name": channel_checkpoints.channel_name,
+                    "last_message_ids": list(channel_checkpoints.checkpoints),
+                    "catch_up_cursor": channel_checkpoints.catch_up_cursor}
+                for channel_id, channel_checkpoints in self.channels.items()}
+        }
 
-        with open(self.file_name, "r") as file:
-            checkpoints: List[Dict[str, int]] | None = []
-            # print("Loading checkpoints...")
-            for line in file:
-                checkpoint: Dict[str, int] = (
-                    {k: int(v) for k, v in json.loads(line).items()})
-                # print(f"checkpoint: {checkpoint}")
-                checkpoints.append(checkpoint)
-                return checkpoints
+    def write(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Writes a snapshot from `take_snapshot()` to the checkpoints file.
+
+        Args:
+            snapshot: The snapshot to write.
+        """
+        directory: str = dirname(self.file_name)
+        if directory != "":
+            makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so that a crash cannot leave
+        # a partially written checkpoints file behind
+        temporary_file_name: str = f"{self.file_name}.tmp"
+        with open(temporary_file_name, "w") as file:
+            json.dump(snapshot, file)
+        replace(temporary_file_name, self.file_name)
+
+    def flush(self) -> None:
+        """
+        Writes the store to the checkpoints file if anything has changed
+        since the last flush.
+        """
+        snapshot: Dict[str, Any] | None = self.take_snapshot()
+        if snapshot is not None:
+            self.write(snapshot)
 # endregion
 
 # region CP start
@@ -203,11 +375,16 @@ class ChannelCheckpoints:
 
 async def start_checkpoints(limit: int = 10) -> Dict[int, ChannelCheckpoints]:
     """
-    Initializes checkpoints for all text channels in all guilds the bot is a
-    member of; creates instances of ChannelCheckpoints for each channel.
+    Loads the checkpoint store, and makes sure it has checkpoints for all
+    text channels in all guilds the bot is a member of.
+
+    The store is only loaded the first time. Discord calls `on_ready` again
+    after a reconnect that cannot be resumed; the store is then kept, so
+    checkpoints and catch-up cursors that have not been written yet are not
+    lost, and only the new channels are added.
 
     Args:
-        limit: The maximum number of checkpoints to create for each channel.
+        limit: The maximum number of checkpoints to keep for each channel.
         Defaults to 10.
 
     Returns:
@@ -215,8 +392,12 @@ async def start_checkpoints(limit: int = 10) -> Dict[int, ChannelCheckpoints]:
         ChannelCheckpoints objects.
     """
     assert isinstance(g.bot, Bot), "bot has not been initialized."
-    all_checkpoints: dict[int, ChannelCheckpoints] = {}
     print("Starting checkpoints...")
+    if g.checkpoint_store is None:
+        # The store is read (or imported from the per-channel files)
+        # in one go
+        g.checkpoint_store = await asyncio.to_thread(
+            CheckpointStore, max_checkpoints=limit)
     channel_id: int = 0
     channel_name: str = ""
     for guild in g.bot.guilds:
@@ -227,13 +408,68 @@ async def start_checkpoints(limit: int = 10) -> Dict[int, ChannelCheckpoints]:
             channel_id = channel.id
             channel_name = channel.name
             print(f"Channel: {channel_name} ({channel_id})")
-            all_checkpoints[channel_id] = ChannelCheckpoints(
+            g.checkpoint_store.get_or_add_channel(
                 guild_name=guild_name,
                 guild_id=guild_id,
                 channel_name=channel_name,
-                channel_id=channel_id,
-                max_checkpoints=limit
-            )
+                channel_id=channel_id)
     print("Checkpoints started.")
-    return all_checkpoints
+    return g.checkpoint_store.channels
+# endregion
+
+# region CP flush
+
+
+def flush_all_checkpoints() -> None:
+    """
+    Writes the checkpoint store if it has changed since the last flush.
+    This blocks, so it is meant for shutdown, when the event loop is no
+    longer handling messages.
+    """
+    if g.checkpoint_store is None:
+        return
+    try:
+        g.checkpoint_store.flush()
+    except Exception as e:
+        print(f"ERROR: Error writing checkpoints: {e}")
+
+
+async def flush_checkpoints() -> None:
+    """
+    Writes the checkpoint store if it has changed since the last flush,
+    in a worker thread.
+    """
+    if g.checkpoint_store is None:
+        return
+    checkpoint_store: CheckpointStore = g.checkpoint_store
+    snapshot: Dict[str, Any] | None = checkpoint_store.take_snapshot()
+    if snapshot is None:
+        return
+    try:
+        await asyncio.to_thread(checkpoint_store.write, snapshot)
+    except Exception as e:
+        print(f"ERROR: Error writing checkpoints: {e}")
+        # Try again at the next flush
+        checkpoint_store.names_dirty = True
+
+
+async def run_checkpoint_flusher() -> None:
+    """
+    Writes the changed checkpoints every `g.checkpoint_flush_interval`
+    seconds.
+    """
+    while True:
+        await asyncio.sleep(g.checkpoint_flush_interval)
+        await flush_checkpoints()
+
+
+def start_checkpoint_flusher() -> None:
+    """
+    Starts writing the changed checkpoints periodically, unless it has
+    already been started.
+    """
+    if (g.checkpoint_flush_task is not None and
+            not g.checkpoint_flush_task.done()):
+        return
+    g.checkpoint_flush_task = asyncio.create_task(run_checkpoint_flusher())
 # endregion
@@ -0,0 +1,89 @@
+# region Imports
+# Standard library
+from collections import OrderedDict
+from typing import Tuple
+
+# Local
+from models.user_save_data import UserSaveData
+# endregion
+
+# region Mention preferences
+
+
+class MentionPreferenceIndex:
+    """
+    An in-memory index of whether users want to be mentioned in the mining
+    updates and highlights channels.
+
+    A user's preferences are read from their save data the first time they
+    are looked up, and kept until they are invalidated, so building the
+    participants table of a mining update does not load the save data of
+    every participant. `UserSaveData` invalidates a user's entry when their
+    preferences are set. The preferences of at most `max_users` users are
+    kept; the least recently used ones are evicted.
+
+    Methods:
+        get(user_id, user_name):
+            Returns the mention preferences of a user.
+        invalidate(user_id):
+            Forgets the preferences of a user.
+    """
+
+    def __init__(self, max_users: int = 10_000) -> None:
+        """
+        Initializes an empty index.
+
+        Args:
+            max_users: How many users to keep the preferences of before
+                evicting the least recently used ones. Defaults to 10,000.
+
+        Attributes:
+            max_users: How many users to keep the preferences of before
+                evicting the least recently used ones.
+            preferences: Whether each user wants to be mentioned in the
+                mining updates channel and in the highlights channel, keyed
+                by user ID, from the least to the most recently used.
+        """
+        self.max_users: int = max_users
+        self.preferences: "OrderedDict[int, Tuple[bool, bool]]" = (
+            OrderedDict())
+
+    def get(self, user_id: int, user_name: str) -> Tuple[bool, bool]:
+        """
+        Returns the mention preferences of a user, reading them from the
+        user's save data if they are not in the index.
+
+        Args:
+            user_id: The ID of the user.
+            user_name: The name of the user, used to create save data for
+                the user if they have none.
+
+        Returns:
+            Tuple[bool, bool]: Whether the user wants to be mentioned in the
+                mining updates channel, and in the highlights channel.
+        """
+        user_preferences: Tuple[bool, bool] | None = (
+            self.preferences.get(user_id))
+        if user_preferences is None:
+            save_data: UserSaveData = UserSaveData(user_id=user_id,
+                                                   user_name=user_name)
+            user_preferences = (
+                save_data.network_mining_mentions_enabled,
+                save_data.network_mining_highlights_mentions_enabled)
+            self.preferences[user_id] = user_preferences
+            if len(self.preferences) > self.max_users:
+                self.preferences.popitem(last=False)
+        else:
+            self.preferences.move_to_end(user_id)
+        return user_preferences
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Forgets the preferences of a user, so that they are read from the
+        user's save data the next time they are looked up.
+
+        Args:
+            user_id: The ID of the user.
+        """
+        self.preferences.pop(user_id, None)
+# endregion
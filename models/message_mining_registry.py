@@ -6,7 +6,7 @@ from os.path import exists
 from os import stat, stat_result
 from time import time
 from dataclasses import asdict
-from typing import TypeGuard, Any, Dict, List, cast
+from typing import TypeGuard, Any, Dict, List, Literal, cast
 
 # Local
 from schemas.typed import (MessageMiningTimeline,
@@ -178,14 +178,59 @@ class MessageMiningRegistryManager:
                     "created_at": message_timestamp,
                     "reactions": [reaction]
                 }
-            with open(self.registry_path, "w", encoding="utf-8") as file:
-                message_registry: (
-                    Dict[str, Dict[str, MessageMiningTimeline]]) = (
-                        {"messages": self.messages})
-                file.write(
-                    json.dumps(
-                        message_registry, indent=4, cls=DataclassJsonEncoder))
-                file.close()
+            self.save_messages()
+
+    def save_messages(self) -> None:
+        """
+        Save the messages mined for to the JSON file.
+        """
+        with open(self.registry_path, "w", encoding="utf-8") as file:
+            message_registry: (
+                Dict[str, Dict[str, MessageMiningTimeline]]) = (
+                    {"messages": self.messages})
+            file.write(
+                json.dumps(
+                    message_registry, indent=4, cls=DataclassJsonEncoder))
+            file.close()
+
+    def get_update_message_id(
+            self,
+            message_id: int,
+            key: Literal["mining_update_message_id",
+                         "highlights_message_id"]) -> int | None:
+        """
+        Get the ID of the message that announces the mining of a message in
+        the mining updates or highlights channel.
+
+        :param message_id: The ID of the mined message.
+        :param key: Which update message to get.
+        :return: The ID of the update message, or None if none has been sent.
+        """
+        message_id_str: str = str(message_id)
+        if message_id_str not in self.messages.keys():
+            return None
+        return self.messages[message_id_str].get(key)
+
+    def set_update_message_id(
+            self,
+            message_id: int,
+            key: Literal["mining_update_message_id",
+                         "highlights_message_id"],
+            update_message_id: int) -> None:
+        """
+        Set the ID of the message that announces the mining of a message in
+        the mining updates or highlights channel, so that it can be edited
+        when more miners arrive.
+
+        :param message_id: The ID of the mined message.
+        :param key: Which update message to set.
+        :param update_message_id: The ID of the update message.
+        """
+        message_id_str: str = str(message_id)
+        if message_id_str not in self.messages.keys():
+            raise KeyError(f"Message {message_id} is not in the registry.")
+        self.messages[message_id_str][key] = update_message_id
+        self.save_messages()
 
     def get_reactions(self,
                       message_id: int,
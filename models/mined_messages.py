@@ -0,0 +1,267 @@
+# region Imports
+# Standard library
+import threading
+from array import array
+from collections import OrderedDict
+from os import makedirs, stat, truncate
+from os.path import dirname, exists
+from typing import Iterable, List, Set
+
+# Local
+from models.user_save_data_store import SQLiteUserSaveDataStore
+# endregion
+
+# region Constants
+# Mined message IDs are stored as unsigned 64-bit integers
+ID_TYPECODE: str = "Q"
+ID_SIZE: int = array(ID_TYPECODE).itemsize
+# endregion
+
+# region Mined messages store
+
+
+class MinedMessagesStore:
+    """
+    Stores the IDs of the messages each user has mined, so that a user can
+    only mine a message once.
+
+    With the JSON backend, the IDs of each user are stored in an append-only
+    binary file of 64-bit integers next to the user's save data file, so
+    registering a mined message appends 8 bytes instead of rewriting a list
+    in the save data. With the SQLite backend, they are stored in the
+    `mined_messages` table of the database.
+
+    The IDs of a user are loaded into a set the first time the user mines or
+    is checked, which makes membership checks O(1). Counts are served from
+    a cache and, for users whose IDs have not been loaded, from the size of
+    the binary file. The IDs and counts of at most `max_users` users are
+    kept; the least recently used ones are evicted and loaded again when
+    they are needed. Every ID is written to disk when it is added, so
+    evicting never loses data.
+
+    Methods:
+        contains(user_id, message_id):
+            Checks if a user has mined a message.
+        get_miners(message_id, user_ids):
+            Returns which of the given users have mined a message.
+        add(user_id, message_id):
+            Registers a message as mined by a user.
+        count(user_id):
+            Returns the number of messages a user has mined.
+        import_legacy(user_id, message_ids):
+            Imports IDs from the `messages_mined` list of the save data.
+    """
+
+    def __init__(self,
+                 save_data_dir_path: str = "data/save_data",
+                 database: SQLiteUserSaveDataStore | None = None,
+                 max_users: int = 10_000) -> None:
+        """
+        Initializes the store. No IDs are loaded until they are needed.
+
+        Args:
+            save_data_dir_path: The path to the save data directory.
+                Defaults to "data/save_data".
+            database: The save data database to store the IDs in, or None
+                to store them in binary files. Defaults to None.
+            max_users: How many users to keep the IDs and counts of before
+                evicting the least recently used ones. Defaults to 10,000.
+
+        Attributes:
+            save_data_dir_path: The path to the save data directory.
+            database: The save data database, if any.
+            max_users: How many users to keep the IDs and counts of before
+                evicting the least recently used ones.
+            message_ids: The loaded IDs, keyed by user ID, from the least
+                to the most recently used.
+            counts: The cached number of mined messages, keyed by user ID,
+                from the least to the most recently used.
+        """
+        self.save_data_dir_path: str = save_data_dir_path
+        self.database: SQLiteUserSaveDataStore | None = database
+        self.max_users: int = max_users
+        self.message_ids: "OrderedDict[int, Set[int]]" = OrderedDict()
+        self.counts: "OrderedDict[int, int]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def _file_path(self, user_id: int) -> str:
+        return f"{self.save_data_dir_path}/{user_id}/messages_mined.bin"
+
+    def _read_file(self, user_id: int) -> "array[int]":
+        """
+        Reads the binary file of a user. A partially written ID at the end
+        of the file, left by a crash, is removed.
+        """
+        message_ids: "array[int]" = array(ID_TYPECODE)
+        file_path: str = self._file_path(user_id)
+        if not exists(file_path):
+            return message_ids
+        file_size: int = stat(file_path).st_size
+        complete_size: int = file_size - file_size % ID_SIZE
+        if complete_size != file_size:
+            print(f"WARNING: Removing a partially written message ID "
+                  f"from '{file_path}'.")
+            truncate(file_path, complete_size)
+        with open(file_path, "rb") as file:
+            message_ids.fromfile(file, complete_size // ID_SIZE)
+        return message_ids
+
+    def _append_to_file(self, user_id: int, message_ids: List[int]) -> None:
+        """
+        Appends IDs to the binary file of a user.
+        """
+        file_path: str = self._file_path(user_id)
+        makedirs(dirname(file_path), exist_ok=True)
+        with open(file_path, "ab") as file:
+            array(ID_TYPECODE, message_ids).tofile(file)
+
+    def _load(self, user_id: int) -> Set[int]:
+        """
+        Returns the set of IDs of a user, loading it if necessary.
+        Must be called with the lock held.
+        """
+        message_ids: Set[int] | None = self.message_ids.get(user_id)
+        if message_ids is None:
+            if self.database is not None:
+                message_ids = set(self.database.load_mined_messages(user_id))
+            else:
+                message_ids = set(self._read_file(user_id))
+            self.message_ids[user_id] = message_ids
+            if len(self.message_ids) > self.max_users:
+                self.message_ids.popitem(last=False)
+        else:
+            self.message_ids.move_to_end(user_id)
+        self._set_count(user_id, len(message_ids))
+        return message_ids
+
+    def _set_count(self, user_id: int, user_count: int) -> None:
+        """
+        Caches the number of messages a user has mined, evicting the least
+        recently used count if there are too many.
+        Must be called with the lock held.
+        """
+        self.counts[user_id] = user_count
+        self.counts.move_to_end(user_id)
+        if len(self.counts) > self.max_users:
+            self.counts.popitem(last=False)
+
+    def contains(self, user_id: int, message_id: int) -> bool:
+        """
+        Checks if a user has mined a message.
+
+        Args:
+            user_id: The ID of the user.
+            message_id: The ID of the message.
+
+        Returns:
+            bool: True if the user has mined the message, otherwise False.
+        """
+        with self._lock:
+            return message_id in self._load(user_id)
+
+    def get_miners(self,
+                   message_id: int,
+                   user_ids: Iterable[int]) -> Set[int]:
+        """
+        Returns which of the given users have mined a message, holding the
+        lock once for all of them. With the SQLite backend, the users whose
+        IDs have not been loaded are looked up in a single query instead of
+        loading all of their IDs.
+
+        Args:
+            message_id: The ID of the message.
+            user_ids: The IDs of the users.
+
+        Returns:
+            Set[int]: The IDs of the users who have mined the message.
+        """
+        miners: Set[int] = set()
+        unloaded_user_ids: List[int] = []
+        with self._lock:
+            for user_id in user_ids:
+                message_ids: Set[int] | None = self.message_ids.get(user_id)
+                if message_ids is None and self.database is not None:
+                    unloaded_user_ids.append(user_id)
+                    continue
+                if message_id in self._load(user_id):
+                    miners.add(user_id)
+            if self.database is not None and len(unloaded_user_ids) > 0:
+                miners.update(self.database.get_miners(message_id,
+                                                       unloaded_user_ids))
+        return miners
+
+    def add(self, user_id: int, message_id: int) -> bool:
+        """
+        Registers a message as mined by a user. The ID is written to disk
+        before this method returns.
+
+        Args:
+            user_id: The ID of the user.
+            message_id: The ID of the message.
+
+        Returns:
+            bool: True if the message was registered, or False if the user
+                had already mined it.
+        """
+        with self._lock:
+            message_ids: Set[int] = self._load(user_id)
+            if message_id in message_ids:
+                return False
+            if self.database is not None:
+                self.database.add_mined_messages(user_id, [message_id])
+            else:
+                self._append_to_file(user_id, [message_id])
+            message_ids.add(message_id)
+            self._set_count(user_id, len(message_ids))
+            return True
+
+    def count(self, user_id: int) -> int:
+        """
+        Returns the number of messages a user has mined, without loading
+        the user's IDs.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            int: The number of messages the user has mined.
+        """
+        with self._lock:
+            cached_count: int | None = self.counts.get(user_id)
+            if cached_count is not None:
+                self.counts.move_to_end(user_id)
+                return cached_count
+            user_count: int
+            if self.database is not None:
+                user_count = self.database.count_mined_messages(user_id)
+            else:
+                file_path: str = self._file_path(user_id)
+                user_count = (stat(file_path).st_size // ID_SIZE
+                              if exists(file_path) else 0)
+            self._set_count(user_id, user_count)
+            return user_count
+
+    def import_legacy(self, user_id: int, message_ids: Iterable[int]) -> None:
+        """
+        Imports the IDs of a user from the `messages_mined` list of the save
+        data, skipping those that are already stored.
+
+        Args:
+            user_id: The ID of the user.
+            message_ids: The IDs from the save data.
+        """
+        with self._lock:
+            stored_ids: Set[int] = self._load(user_id)
+            new_ids: List[int] = []
+            for message_id in message_ids:
+                if message_id not in stored_ids:
+                    stored_ids.add(message_id)
+                    new_ids.append(message_id)
+            if len(new_ids) == 0:
+                return
+            if self.database is not None:
+                self.database.add_mined_messages(user_id, new_ids)
+            else:
+                self._append_to_file(user_id, new_ids)
+            self._set_count(user_id, len(stored_ids))
+# endregion
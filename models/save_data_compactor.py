@@ -0,0 +1,211 @@
+# region Imports
+# Standard library
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, replace, scandir, stat
+from os.path import basename, dirname, exists
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Local
+from models.mined_messages import MinedMessagesStore
+from schemas.typed import SaveDataCompactionResult
+# endregion
+
+# region Schema
+# The expected types and defaults of the current save data schema, as
+# applied by `UserSaveData._load_all_properties()`
+SAVE_DATA_SCHEMA: Dict[str, Tuple[type | Tuple[type, ...], Any]] = {
+    "user_name": (str, ""),
+    "has_visited_casino": (bool, False),
+    "starting_bonus_available": ((bool, float), True),
+    "when_last_bonus_received": ((float, type(None)), None),
+    "starting_bonus_level": (int, 1),
+    "reaction_message_received": (bool, False),
+    "mining_messages_enabled": (bool, True),
+    "network_mining_mentions_enabled": (bool, False),
+    "network_mining_highlights_mentions_enabled": (bool, False),
+    "blocked_from_receiving_coins": (bool, False),
+    "blocked_from_receiving_coins_reason": ((str, type(None)), None),
+    "messages_mined": (list, [])
+}
+# endregion
+
+# region Compaction
+
+
+def upgrade_save_data(save_data: Dict[str, Any],
+                      user_id: int) -> Tuple[int, int]:
+    """
+    Upgrades save data to the current schema in place. Missing keys are
+    added with their defaults, and values of the wrong type are replaced
+    the same way `UserSaveData` would replace them when loading. Booleans
+    stored as "true" or "false" are converted, but only for keys whose
+    values are booleans. Keys that are not in the schema are kept.
+
+    Args:
+        save_data: The save data to upgrade.
+        user_id: The ID of the user the save data belongs to.
+
+    Returns:
+        Tuple[int, int]: The number of keys added and values fixed.
+    """
+    keys_added: int = 0
+    values_fixed: int = 0
+    if "user_id" not in save_data:
+        keys_added += 1
+    elif save_data["user_id"] != user_id:
+        values_fixed += 1
+    save_data["user_id"] = user_id
+    for key, (expected_type, default) in SAVE_DATA_SCHEMA.items():
+        if key not in save_data:
+            save_data[key] = (
+                list(default) if isinstance(default, list) else default)
+            keys_added += 1
+            continue
+        value: Any = save_data[key]
+        expected_types: Tuple[type, ...] = (
+            expected_type if isinstance(expected_type, tuple)
+            else (expected_type,))
+        if (bool in expected_types and str not in expected_types and
+                isinstance(value, str) and
+                value.lower() in ("true", "false")):
+            # Booleans stored as strings are read as booleans by
+            # `UserSaveData.load()`. Strings are kept for keys that can be
+            # strings, such as user names
+            value = value.lower() == "true"
+        if (float in expected_types and isinstance(value, int) and
+                not isinstance(value, bool)):
+            # Keep whole-number timestamps instead of discarding them
+            value = float(value)
+        if not isinstance(value, expected_type):
+            value = list(default) if isinstance(default, list) else default
+        if value is not save_data[key]:
+            save_data[key] = value
+            values_fixed += 1
+    return keys_added, values_fixed
+
+
+def compact_user_save_data(user_dir_path: str) -> SaveDataCompactionResult:
+    """
+    Upgrades the save data file of a user to the current schema, and moves
+    their mined messages to the binary file of `MinedMessagesStore`.
+    The save data file is replaced atomically, and only if it has changed.
+
+    This function runs in a worker process.
+
+    Args:
+        user_dir_path: The path to the user's save data directory.
+
+    Returns:
+        SaveDataCompactionResult: The sizes of the user's files before and
+            after, and what was changed.
+    """
+    user_id: int = int(basename(user_dir_path))
+    save_data_path: str = f"{user_dir_path}/save_data.json"
+    mined_messages_path: str = f"{user_dir_path}/messages_mined.bin"
+    result: SaveDataCompactionResult = {
+        "user_id": user_id,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "keys_added": 0,
+        "values_fixed": 0,
+        "message_ids_moved": 0,
+        "error": None
+    }
+
+    def get_size() -> int:
+        return sum(stat(path).st_size
+                   for path in (save_data_path, mined_messages_path)
+                   if exists(path))
+
+    try:
+        result["bytes_before"] = get_size()
+        with open(save_data_path, "r") as file:
+            save_data: Dict[str, Any] = json.load(file)
+        if not isinstance(save_data, dict):
+            raise ValueError("The save data is not a JSON object.")
+        message_ids: Any = save_data.get("messages_mined")
+        result["keys_added"], result["values_fixed"] = upgrade_save_data(
+            save_data, user_id)
+        if isinstance(message_ids, list) and len(message_ids) > 0:
+            # Append the IDs before emptying the list, so that an
+            # interrupted run can be repeated without losing any
+            mined_messages_store = MinedMessagesStore(
+                save_data_dir_path=dirname(user_dir_path))
+            mined_messages_store.import_legacy(
+                user_id,
+                [message_id for message_id in message_ids
+                 if isinstance(message_id, int)])
+            save_data["messages_mined"] = []
+            result["message_ids_moved"] = len(message_ids)
+        if (result["keys_added"] + result["values_fixed"] +
+                result["message_ids_moved"] > 0):
+            temporary_path: str = f"{save_data_path}.tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(save_data, file)
+            replace(temporary_path, save_data_path)
+        result["bytes_after"] = get_size()
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _iter_user_dir_paths(save_data_dir_path: str) -> Iterator[str]:
+    """
+    Yields the save data directories of all users.
+    """
+    for entry in scandir(save_data_dir_path):
+        if (entry.is_dir() and entry.name.isdigit() and
+                exists(f"{entry.path}/save_data.json")):
+            yield entry.path
+
+
+def compact_all_save_data(
+        save_data_dir_path: str = "data/save_data",
+        workers: int | None = None) -> List[SaveDataCompactionResult]:
+    """
+    Compacts the save data of all users in a pool of worker processes.
+    See `compact_user_save_data()`.
+
+    Only run this while the bot is offline. The bot caches save data and
+    mined message IDs, so it would write its copies back over the compacted
+    files, and import mined message IDs a second time.
+
+    This function blocks until all users have been compacted.
+
+    Args:
+        save_data_dir_path: The path to the save data directory.
+            Defaults to "data/save_data".
+        workers: The number of worker processes. Defaults to the number of
+            CPUs.
+
+    Returns:
+        List[SaveDataCompactionResult]: The result for each user.
+    """
+    if not exists(save_data_dir_path):
+        return []
+    worker_count: int = workers or cpu_count() or 1
+    print(f"Compacting save data with {worker_count} worker processes...")
+    results: List[SaveDataCompactionResult] = []
+    # Spawn the workers rather than forking the bot, which runs
+    # several threads
+    with ProcessPoolExecutor(
+            max_workers=worker_count,
+            mp_context=multiprocessing.get_context("spawn")) as pool:
+        for result in pool.map(
+                compact_user_save_data,
+                _iter_user_dir_paths(save_data_dir_path),
+                chunksize=64):
+            if result["error"] is not None:
+                print(f"ERROR: Error compacting save data of "
+                      f"{result['user_id']}: {result['error']}")
+            results.append(result)
+    bytes_before: int = sum(result["bytes_before"] for result in results)
+    bytes_after: int = sum(result["bytes_after"] for result in results)
+    errors: int = sum(result["error"] is not None for result in results)
+    print(f"Save data of {len(results) - errors} users compacted "
+          f"({errors} errors): "
+          f"{bytes_before:,} bytes -> {bytes_after:,} bytes.")
+    return results
+# endregion
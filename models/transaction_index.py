@@ -0,0 +1,300 @@
+# region Imports
+# Standard library
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from os import makedirs, replace, stat
+from os.path import dirname, exists
+from typing import Any, Dict, List, Sequence, Set
+
+# Local
+from schemas.typed import TransactionRow
+# endregion
+
+# region Transaction index
+
+
+class TransactionIndex:
+    """
+    An on-disk index of the transactions spreadsheet.
+
+    The spreadsheet is a TSV file with one transaction per row, which is
+    appended to whenever a block is added. The index maps senders,
+    receivers, methods, and times to the byte offsets of the rows, so that
+    a query only has to read the matching rows instead of parsing the whole
+    spreadsheet.
+
+    The blockchain writer thread updates the index after each block it adds,
+    by indexing only the rows appended since the last update. Queries also
+    update the index first, to pick up rows appended by the blockchain
+    server, but never save it. The writer thread saves the index next to the
+    spreadsheet after every `save_interval_rows` new rows; rows appended
+    after the last save are indexed again at the next startup.
+
+    Methods:
+        update():
+            Indexes the rows appended since the last update.
+        save_if_due():
+            Saves the index if enough rows have been indexed since
+            the last save.
+        query(sender, receiver, party, methods, start_time, end_time):
+            Returns the rows that match all of the given filters.
+    """
+
+    def __init__(self,
+                 spreadsheet_path: str = "data/transactions.tsv",
+                 index_path: str = "data/transactions_index.json",
+                 save_interval_rows: int = 1000) -> None:
+        """
+        Initializes the index from the index file, and indexes the rows that
+        have been appended since it was saved.
+
+        Args:
+            spreadsheet_path: The path to the transactions spreadsheet.
+                Defaults to "data/transactions.tsv".
+            index_path: The path to the index file. Defaults to
+                "data/transactions_index.json".
+            save_interval_rows: The number of new rows to index before
+                the index is saved again. Defaults to 1000.
+
+        Attributes:
+            spreadsheet_path: The path to the transactions spreadsheet.
+            index_path: The path to the index file.
+            columns: The column names of the spreadsheet.
+            indexed_offset: The position in the spreadsheet right after the
+                last indexed row.
+            senders: The offsets of the rows of each sender.
+            receivers: The offsets of the rows of each receiver.
+            methods: The offsets of the rows of each method.
+            times: The times of all rows, in ascending order.
+            time_offsets: The offsets of all rows, in the order of `times`.
+            save_interval_rows: The number of new rows to index before
+                the index is saved again.
+        """
+        print("Loading transaction index...")
+        self.spreadsheet_path: str = spreadsheet_path
+        self.index_path: str = index_path
+        self.columns: List[str] = []
+        self.indexed_offset: int = 0
+        self.senders: Dict[str, List[int]] = {}
+        self.receivers: Dict[str, List[int]] = {}
+        self.methods: Dict[str, List[int]] = {}
+        self.times: List[float] = []
+        self.time_offsets: List[int] = []
+        self.save_interval_rows: int = save_interval_rows
+        self._rows_since_save: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        # Only one save writes at a time
+        self._save_lock: threading.Lock = threading.Lock()
+        if exists(self.index_path):
+            try:
+                self._load()
+            except Exception as e:
+                print(f"ERROR: Error loading transaction index: {e}")
+                self._reset()
+        self.update()
+        if self._rows_since_save > 0:
+            self._save()
+        print(f"Transaction index loaded ({len(self.times)} transactions).")
+
+    def _reset(self) -> None:
+        """
+        Empties the index.
+        """
+        self.columns = []
+        self.indexed_offset = 0
+        self.senders = {}
+        self.receivers = {}
+        self.methods = {}
+        self.times = []
+        self.time_offsets = []
+
+    def _load(self) -> None:
+        """
+        Loads the index from the index file.
+        """
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            index: Dict[str, Any] = json.load(file)
+        self.columns = index["columns"]
+        self.indexed_offset = index["indexed_offset"]
+        self.senders = index["senders"]
+        self.receivers = index["receivers"]
+        self.methods = index["methods"]
+        self.times = index["times"]
+        self.time_offsets = index["time_offsets"]
+
+    def _save(self) -> None:
+        """
+        Writes the index to the index file. The index is serialized while
+        holding the lock, and written after releasing it.
+        """
+        with self._save_lock:
+            with self._lock:
+                index: Dict[str, Any] = {
+                    "columns": self.columns,
+                    "indexed_offset": self.indexed_offset,
+                    "senders": self.senders,
+                    "receivers": self.receivers,
+                    "methods": self.methods,
+                    "times": self.times,
+                    "time_offsets": self.time_offsets
+                }
+                contents: str = json.dumps(index)
+                self._rows_since_save = 0
+            directory: str = dirname(self.index_path)
+            if directory != "":
+                makedirs(directory, exist_ok=True)
+            # Write to a temporary file first so that a crash cannot leave
+            # a partially written index behind
+            temporary_path: str = f"{self.index_path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(contents)
+            replace(temporary_path, self.index_path)
+
+    def save_if_due(self) -> None:
+        """
+        Saves the index if at least `save_interval_rows` rows have been
+        indexed since the last save.
+
+        Call this from a worker thread, not the event loop.
+        """
+        if self._rows_since_save < self.save_interval_rows:
+            return
+        try:
+            self._save()
+        except Exception as e:
+            print(f"ERROR: Error saving transaction index: {e}")
+
+    def _parse_line(self, line: str) -> TransactionRow:
+        """
+        Parses a row of the spreadsheet.
+        """
+        values: Dict[str, str] = dict(
+            zip(self.columns, line.rstrip("\r\n").split("\t")))
+        row: TransactionRow = {
+            "Time": float(values["Time"]),
+            "Sender": values["Sender"],
+            "Receiver": values["Receiver"],
+            "Amount": int(values["Amount"]),
+            "Method": values["Method"]
+        }
+        return row
+
+    def _add_row(self, row: TransactionRow, offset: int) -> None:
+        """
+        Adds a row to the index.
+        """
+        self.senders.setdefault(row["Sender"], []).append(offset)
+        self.receivers.setdefault(row["Receiver"], []).append(offset)
+        self.methods.setdefault(row["Method"], []).append(offset)
+        row_time: float = row["Time"]
+        if len(self.times) == 0 or row_time >= self.times[-1]:
+            self.times.append(row_time)
+            self.time_offsets.append(offset)
+        else:
+            position: int = bisect_right(self.times, row_time)
+            self.times.insert(position, row_time)
+            self.time_offsets.insert(position, offset)
+
+    def update(self) -> None:
+        """
+        Indexes the rows that have been appended to the spreadsheet since the
+        last update.
+        """
+        if not exists(self.spreadsheet_path):
+            return
+        with self._lock:
+            file_size: int = stat(self.spreadsheet_path).st_size
+            if file_size == self.indexed_offset:
+                return
+            if file_size < self.indexed_offset:
+                print("WARNING: The transactions spreadsheet is shorter than "
+                      "the indexed part. The index will be rebuilt.")
+                self._reset()
+            with open(self.spreadsheet_path, "rb") as file:
+                file.seek(self.indexed_offset)
+                for line_bytes in file:
+                    if not line_bytes.endswith(b"\n"):
+                        # The row is still being written
+                        break
+                    offset: int = self.indexed_offset
+                    self.indexed_offset += len(line_bytes)
+                    line: str = line_bytes.decode("utf-8")
+                    if line.strip() == "":
+                        continue
+                    if offset == 0:
+                        self.columns = line.rstrip("\r\n").split("\t")
+                        continue
+                    try:
+                        self._add_row(self._parse_line(line), offset)
+                    except Exception as e:
+                        print(f"ERROR: Could not index transaction "
+                              f"at offset {offset}: {e}")
+                        continue
+                    self._rows_since_save += 1
+
+    def _read_rows(self, offsets: Sequence[int]) -> List[TransactionRow]:
+        """
+        Reads the rows at the given offsets.
+        """
+        rows: List[TransactionRow] = []
+        with open(self.spreadsheet_path, "rb") as file:
+            for offset in offsets:
+                file.seek(offset)
+                line: str = file.readline().decode("utf-8")
+                rows.append(self._parse_line(line))
+        return rows
+
+    def query(self,
+              sender: str | None = None,
+              receiver: str | None = None,
+              party: str | None = None,
+              methods: Sequence[str] | None = None,
+              start_time: float | None = None,
+              end_time: float | None = None) -> List[TransactionRow]:
+        """
+        Returns the transactions that match all of the given filters,
+        in the order they were added.
+
+        Args:
+            sender: The hashed user ID of the sender. Defaults to None.
+            receiver: The hashed user ID of the receiver. Defaults to None.
+            party: A hashed user ID that must be either the sender or
+                the receiver. Defaults to None.
+            methods: The transaction methods to include. Defaults to None.
+            start_time: The earliest time to include. Defaults to None.
+            end_time: The latest time to include. Defaults to None.
+
+        Returns:
+            List[TransactionRow]: The matching transactions.
+        """
+        self.update()
+        with self._lock:
+            candidate_sets: List[Set[int]] = []
+            if sender is not None:
+                candidate_sets.append(set(self.senders.get(sender, [])))
+            if receiver is not None:
+                candidate_sets.append(set(self.receivers.get(receiver, [])))
+            if party is not None:
+                candidate_sets.append(
+                    set(self.senders.get(party, [])) |
+                    set(self.receivers.get(party, [])))
+            if methods is not None:
+                method_offsets: Set[int] = set()
+                for method in methods:
+                    method_offsets.update(self.methods.get(method, []))
+                candidate_sets.append(method_offsets)
+            if start_time is not None or end_time is not None:
+                first: int = (0 if start_time is None
+                              else bisect_left(self.times, start_time))
+                last: int = (len(self.times) if end_time is None
+                             else bisect_right(self.times, end_time))
+                candidate_sets.append(set(self.time_offsets[first:last]))
+            offsets: Set[int]
+            if len(candidate_sets) == 0:
+                offsets = set(self.time_offsets)
+            else:
+                candidate_sets.sort(key=len)
+                offsets = candidate_sets[0].intersection(*candidate_sets[1:])
+            return self._read_rows(sorted(offsets))
+# endregion
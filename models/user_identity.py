@@ -0,0 +1,260 @@
+# region Imports
+# Standard library
+import json
+import threading
+from functools import lru_cache
+from hashlib import sha256
+from os import makedirs, replace, scandir
+from os.path import exists, dirname
+from typing import Dict
+
+# Local
+from schemas.typed import SaveData, UserIdentity
+# endregion
+
+# region Hashing
+
+
+@lru_cache(maxsize=4096)
+def hash_user_id(user_id: int) -> str:
+    """
+    Hashes a user ID the way user IDs are stored on the blockchain.
+
+    The most recently hashed IDs are cached, since the same users tend to
+    transact over and over.
+
+    Args:
+        user_id: The ID of the user.
+
+    Returns:
+        str: The SHA-256 hex digest of the user ID.
+    """
+    return sha256(str(user_id).encode()).hexdigest()
+# endregion
+
+# region Identity index
+
+
+class UserIdentityIndex:
+    """
+    A persistent index from hashed user ID to user ID and user name.
+
+    The index is kept up to date by `UserSaveData` when a user's save data
+    is created or their name changes, so looking up who is behind a hash on
+    the blockchain never requires scanning the save data directory. The save
+    data directory is only scanned once, to build the index if the index file
+    does not exist yet.
+
+    Recording a user only marks the index dirty. A flusher thread writes
+    the index file every `flush_interval` seconds if it has changed, so
+    new users and renames do not rewrite the file on the event loop.
+
+    Methods:
+        record(user_id, user_name):
+            Adds or updates a user in the index.
+        flush():
+            Writes the index file if the index has changed.
+        start():
+            Starts the flusher thread.
+        stop():
+            Stops the flusher thread and writes the index file.
+        get(user_id_hash):
+            Returns the user ID and name behind a hash.
+        get_user_names():
+            Returns the user names of all users, keyed by hashed user ID.
+    """
+
+    def __init__(self,
+                 index_path: str = "data/user_identity_index.json",
+                 save_data_dir_path: str = "data/save_data",
+                 flush_interval: float = 5.0) -> None:
+        """
+        Initializes the index from the index file, or from the save data
+        directory if there is no index file. The flusher thread is not
+        started until `start()` is called.
+
+        Args:
+            index_path: The path to the index file. Defaults to
+                "data/user_identity_index.json".
+            save_data_dir_path: The path to the save data directory.
+                Defaults to "data/save_data".
+            flush_interval: How many seconds to wait between flushes.
+                Defaults to 5.0.
+
+        Attributes:
+            index_path: The path to the index file.
+            save_data_dir_path: The path to the save data directory.
+            flush_interval: How many seconds to wait between flushes.
+            users: The user ID and name of each user, keyed by hashed
+                user ID.
+            dirty: Whether the index has changed since it was last written.
+        """
+        print("Loading user identity index...")
+        self.index_path: str = index_path
+        self.save_data_dir_path: str = save_data_dir_path
+        self.flush_interval: float = flush_interval
+        self.users: Dict[str, UserIdentity] = {}
+        self.dirty: bool = False
+        self._lock: threading.Lock = threading.Lock()
+        # Only one flush writes at a time
+        self._flush_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+        if exists(self.index_path):
+            self.load()
+        else:
+            self.build()
+            self.save()
+        print(f"User identity index loaded ({len(self.users)} users).")
+
+    def load(self) -> None:
+        """
+        Loads the index from the index file.
+        """
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            self.users = json.load(file)
+
+    def build(self) -> None:
+        """
+        Builds the index by reading the save data of every user.
+        """
+        print("Building user identity index from save data...")
+        users: Dict[str, UserIdentity] = {}
+        if exists(self.save_data_dir_path):
+            for entry in scandir(self.save_data_dir_path):
+                if not entry.is_dir() or not entry.name.isdigit():
+                    continue
+                save_data_path: str = f"{entry.path}/save_data.json"
+                try:
+                    with open(save_data_path, "r", encoding="utf-8") as file:
+                        save_data: SaveData = json.load(file)
+                except Exception as e:
+                    print(f"ERROR: Error reading save data "
+                          f"'{save_data_path}': {e}")
+                    continue
+                user_id: int = int(entry.name)
+                users[hash_user_id(user_id)] = {
+                    "user_id": user_id,
+                    "user_name": save_data.get("user_name", "")}
+        self.users = users
+
+    def save(self, users: Dict[str, UserIdentity] | None = None) -> None:
+        """
+        Writes the index to the index file.
+
+        Args:
+            users: The users to write, or None to write the index as it is.
+                Defaults to None.
+        """
+        if users is None:
+            users = self.users
+        directory: str = dirname(self.index_path)
+        if directory != "":
+            makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so that a crash cannot leave
+        # a partially written index behind
+        temporary_path: str = f"{self.index_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(users, file)
+        replace(temporary_path, self.index_path)
+
+    def record(self, user_id: int, user_name: str) -> None:
+        """
+        Adds or updates a user in the index, and marks the index dirty if
+        something has changed.
+
+        Args:
+            user_id: The ID of the user.
+            user_name: The name of the user.
+        """
+        user_id_hash: str = hash_user_id(user_id)
+        with self._lock:
+            known_user: UserIdentity | None = self.users.get(user_id_hash)
+            if (known_user is not None and
+                    known_user["user_name"] == user_name):
+                return
+            self.users[user_id_hash] = {"user_id": user_id,
+                                        "user_name": user_name}
+            self.dirty = True
+
+    def flush(self) -> bool:
+        """
+        Writes the index file if the index has changed since it was
+        last written.
+
+        Returns:
+            bool: True if the index file was written, otherwise False.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self.dirty:
+                    return False
+                # Entries are replaced rather than changed, so a shallow
+                # copy is enough to write outside the lock
+                users: Dict[str, UserIdentity] = dict(self.users)
+                self.dirty = False
+            try:
+                self.save(users)
+            except Exception as e:
+                print(f"ERROR: Error writing user identity index: {e}")
+                with self._lock:
+                    # Try again at the next flush
+                    self.dirty = True
+                return False
+            return True
+
+    def start(self) -> None:
+        """
+        Starts the flusher thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="user-identity-flusher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the flusher thread and writes the index file if the index has
+        changed. This method blocks until the index has been written.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        """
+        Flushes the index every `flush_interval` seconds until the flusher
+        is stopped.
+        """
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def get(self, user_id_hash: str) -> UserIdentity | None:
+        """
+        Returns the user ID and name behind a hashed user ID.
+
+        Args:
+            user_id_hash: The hashed user ID.
+
+        Returns:
+            UserIdentity | None: The user ID and name, or None if the hash
+                is not in the index.
+        """
+        return self.users.get(user_id_hash)
+
+    def get_user_names(self) -> Dict[str, str]:
+        """
+        Returns the user names of all users in the index.
+
+        Returns:
+            Dict[str, str]: The user names, keyed by hashed user ID.
+        """
+        with self._lock:
+            return {user_id_hash: user["user_name"]
+                    for user_id_hash, user in self.users.items()}
+# endregion
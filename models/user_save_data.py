@@ -3,9 +3,10 @@
 import json
 from os import makedirs, stat
 from os.path import exists
-from typing import List, TypeVar, cast
+from typing import Any, List, TypeVar, cast
 
 # Local
+import core.global_state as g
 from schemas.typed import SaveData
 # endregion
 
@@ -57,15 +58,23 @@ class UserSaveData:
             Saves a key-value pair to a JSON file. If the file does not exist,
             it creates a new one.
         load(key):
-            Loads the value associated with the given key from a JSON file.
+            Loads the value associated with the given key from the save data.
             Returns the value associated with the key if it exists,
             otherwise None.
+        has_mined_message(message_id):
+            Checks if the user has mined a message.
+        add_mined_message(message_id):
+            Registers a message as mined by the user.
     """
 
     def __init__(self, user_id: int, user_name: str | None = None) -> None:
         # print("Initializing save data...")
         self.user_id: int = user_id
         self.file_name: str = f"data/save_data/{user_id}/save_data.json"
+        # The contents of the save data file, read once when the instance is
+        # created and kept in sync by `save()`. With the save data cache,
+        # this is the record shared by all instances for the user
+        self._record: SaveData = cast(SaveData, {})
         self._user_name: str
         self._starting_bonus_available: bool | float
         self._has_visited_casino: bool
@@ -77,12 +86,33 @@ class UserSaveData:
         self._network_mining_highlights_mentions_enabled: bool
         self._blocked_from_receiving_coins: bool
         self._blocked_from_receiving_coins_reason: str | None
-        file_exists: bool = exists(self.file_name)
+        # With a database store, the record is loaded from the database
+        cached_record: SaveData | None = (
+            g.user_save_data_cache.load(self.user_id)
+            if g.user_save_data_cache is not None else None)
+        file_exists: bool
         file_empty: bool | None = None
         file_size: int
-        if file_exists:
-            file_size = stat(self.file_name).st_size
-            file_empty = file_size == 0
+        if cached_record is not None:
+            # The record may not have been written to the file yet
+            self._record = cached_record
+            file_exists = True
+            file_empty = False
+        elif (g.user_save_data_cache is not None and
+                g.user_save_data_cache.store is not None):
+            # The user has no save data in the database
+            file_exists = False
+        else:
+            file_exists = exists(self.file_name)
+            if file_exists:
+                file_size = stat(self.file_name).st_size
+                file_empty = file_size == 0
+            if file_exists and not file_empty:
+                self._record = self._read_record()
+                if g.user_save_data_cache is not None:
+                    self._record = g.user_save_data_cache.add(
+                        self.user_id, self.file_name, self._record)
+        del cached_record
         if file_empty:
             print(f"ERROR: Save data file for {self.user_id} is empty.")
         if (not file_exists or file_empty) and (user_name is None):
@@ -107,12 +137,33 @@ class UserSaveData:
                 expected_type=str, default="")
             self._load_all_properties()
         else:
+            stored_user_name: str = self._load_value(
+                key="user_name",
+                expected_type=str, default="")
+            if user_name is not None and stored_user_name != user_name:
+                # The user has changed their name
+                self.save("user_name", user_name)
+                if g.user_identity_index is not None:
+                    g.user_identity_index.record(self.user_id, user_name)
+            del stored_user_name
             self._load_all_properties()
+        self._import_legacy_mined_messages()
         # print("Save data initialized.")
 
+    def _read_record(self) -> SaveData:
+        """
+        Reads and parses the save data file.
+        """
+        with open(self.file_name, "r") as file:
+            record: Any = json.load(file)
+        if not isinstance(record, dict):
+            raise ValueError(f"Save data file for {self.user_id} "
+                             "does not contain a JSON object.")
+        return cast(SaveData, record)
+
     def _load_all_properties(self) -> None:
         """
-        Load all properties from the disk.
+        Load all properties from the save data record.
         """
         self._has_visited_casino = self._load_value(
             key="has_visited_casino",
@@ -151,7 +202,7 @@ class UserSaveData:
                     default: T,
                     print_on_none: bool = True) -> T:
         """
-        Load a value from the disk.
+        Load a value from the save data record.
         """
 
         value: str | List[int] | bool | float | None = self.load(key)
@@ -180,6 +231,73 @@ class UserSaveData:
                       f"Returning default value {default}.")
             return default
 
+    def _import_legacy_mined_messages(self) -> None:
+        """
+        Moves the IDs in the `messages_mined` list of the save data to the
+        mined messages store, and empties the list.
+        """
+        if g.mined_messages_store is None:
+            return
+        legacy_message_ids: str | List[int] | bool | float | None = (
+            self._record.get("messages_mined"))
+        if (not isinstance(legacy_message_ids, list) or
+                len(legacy_message_ids) == 0):
+            return
+        g.mined_messages_store.import_legacy(self.user_id, legacy_message_ids)
+        self.save("messages_mined", [])
+
+    def has_mined_message(self, message_id: int) -> bool:
+        """
+        Checks if the user has mined a message.
+
+        Args:
+            message_id: The ID of the message.
+
+        Returns:
+            bool: True if the user has mined the message, otherwise False.
+        """
+        if g.mined_messages_store is not None:
+            return g.mined_messages_store.contains(self.user_id, message_id)
+        messages_mined: str | List[int] | bool | float | None = (
+            self.load("messages_mined"))
+        return isinstance(messages_mined, list) and (
+            message_id in messages_mined)
+
+    def add_mined_message(self, message_id: int) -> bool:
+        """
+        Registers a message as mined by the user.
+
+        Args:
+            message_id: The ID of the message.
+
+        Returns:
+            bool: True if the message was registered, or False if the user
+                had already mined it.
+        """
+        if g.mined_messages_store is not None:
+            return g.mined_messages_store.add(self.user_id, message_id)
+        messages_mined_data: str | List[int] | bool | float | None = (
+            self.load("messages_mined"))
+        messages_mined: List[int] = (
+            list(messages_mined_data)
+            if isinstance(messages_mined_data, list) else [])
+        if message_id in messages_mined:
+            return False
+        messages_mined.append(message_id)
+        self.save("messages_mined", messages_mined)
+        return True
+
+    @property
+    def messages_mined_count(self) -> int:
+        """
+        The number of messages the user has mined.
+        """
+        if g.mined_messages_store is not None:
+            return g.mined_messages_store.count(self.user_id)
+        messages_mined: str | List[int] | bool | float | None = (
+            self.load("messages_mined"))
+        return len(messages_mined) if isinstance(messages_mined, list) else 0
+
     @property
     def has_visited_casino(self) -> bool:
         """
@@ -284,6 +402,8 @@ class UserSaveData:
         """
         self._network_mining_mentions_enabled = value
         self.save("network_mining_mentions_enabled", value)
+        if g.mention_preference_index is not None:
+            g.mention_preference_index.invalidate(self.user_id)
 
     @property
     def network_mining_highlights_mentions_enabled(self) -> bool:
@@ -299,6 +419,8 @@ class UserSaveData:
         """
         self._network_mining_highlights_mentions_enabled = value
         self.save("network_mining_highlights_mentions_enabled", value)
+        if g.mention_preference_index is not None:
+            g.mention_preference_index.invalidate(self.user_id)
 
     @property
     def blocked_from_receiving_coins(self) -> bool:
@@ -346,65 +468,83 @@ class UserSaveData:
             free coins.
         """
         # Create missing directories and create save data file
+        # (the database store does not use the directories)
+        create_directories: bool = (
+            g.user_save_data_cache is None or
+            g.user_save_data_cache.store is None)
         directories: str = self.file_name[:self.file_name.rfind("/")]
         for i, directory in enumerate(directories.split("/")):
             path: str = "/".join(directories.split("/")[:i+1])
-            if not exists(directory):
+            if create_directories and not exists(directory):
                 makedirs(path, exist_ok=True)
             if directory.isdigit() and int(directory) == self.user_id:
-                with open(self.file_name, "w") as file:
-                    file_contents: SaveData = {
-                        "user_name": self._user_name,
-                        "user_id": self.user_id,
-                        "has_visited_casino": False,
-                        "starting_bonus_available": (
-                            self._starting_bonus_available),
-                        "when_last_bonus_received": None,
-                        "messages_mined": [],
-                        "reaction_message_received": False,
-                        "mining_messages_enabled": True,
-                        "blocked_from_receiving_coins": False,
-                        "blocked_from_receiving_coins_reason": None
-                    }
-                    file_contents_json: str = json.dumps(file_contents)
-                    file.write(file_contents_json)
+                file_contents: SaveData = {
+                    "user_name": self._user_name,
+                    "user_id": self.user_id,
+                    "has_visited_casino": False,
+                    "starting_bonus_available": (
+                        self._starting_bonus_available),
+                    "when_last_bonus_received": None,
+                    "messages_mined": [],
+                    "reaction_message_received": False,
+                    "mining_messages_enabled": True,
+                    "blocked_from_receiving_coins": False,
+                    "blocked_from_receiving_coins_reason": None
+                }
+                if g.user_save_data_cache is not None:
+                    # The record is written by the next flush
+                    self._record = g.user_save_data_cache.add(
+                        self.user_id, self.file_name, file_contents,
+                        dirty=True)
+                else:
+                    with open(self.file_name, "w") as file:
+                        file_contents_json: str = json.dumps(file_contents)
+                        file.write(file_contents_json)
+                    self._record = file_contents
+                if g.user_identity_index is not None:
+                    g.user_identity_index.record(self.user_id,
+                                                 self._user_name)
 
     def save(self, key: str, value: str | List[int] | float | None) -> None:
         """
         Saves a key-value pair to a JSON file. If the file does not exist,
         it creates a new one.
 
+        With the save data cache, the value is only saved to the cached
+        record, and the file is written by the next flush.
+
         Args:
             key: The key to be saved.
             value: The value to be saved.
         """
+        if g.user_save_data_cache is not None:
+            self._record = g.user_save_data_cache.set(
+                self.user_id, key, value, self._record, self.file_name)
+            return
 
-        # Read the existing data
-        save_data: SaveData
-        with open(self.file_name, "r") as file:
-            save_data = json.load(file)
+        # Read the existing data, since another instance for the same user
+        # may have saved other keys since this one was created
+        save_data: SaveData = self._read_record()
         # Update the data with the new key-value pair
         save_data[key] = value
 
         # Write the updated data back to the file
         with open(self.file_name, "w") as file:
             json.dump(save_data, file)
+        self._record = save_data
 
     def load(self, key: str) -> str | List[int] | bool | float | None:
         """
-        Loads the value associated with the given key from a JSON file.
+        Loads the value associated with the given key from the save data.
+        The save data file is not read again; the value comes from the record
+        read when the instance was created.
         Args:
             key: The key whose value needs to be retrieved.
         Returns:
             str | None: The value associated with the key if it exists,
                             otherwise None.
         """
-        if not exists(self.file_name):
-            return None
-        all_data: SaveData
-        with open(self.file_name, "r") as file:
-            all_data = json.load(file)
-        requested_value: str | List[int] | None = all_data.get(key)
+        requested_value: str | List[int] | None = self._record.get(key)
         if ((isinstance(requested_value, str)) and
                 (requested_value.lower() == "true")):
             return True
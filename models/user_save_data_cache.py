@@ -0,0 +1,333 @@
+# region Imports
+# Standard library
+import json
+import threading
+from collections import OrderedDict
+from os import makedirs, replace
+from os.path import dirname
+from typing import Dict, List, Set, Tuple
+
+# Local
+from models.user_save_data_store import SQLiteUserSaveDataStore
+from schemas.typed import SaveData
+# endregion
+
+# region Save data cache
+
+
+class UserSaveDataCache:
+    """
+    A process-wide write-back cache of user save data.
+
+    Every `UserSaveData` instance for the same user shares the user's cached
+    record, so the save data file is only read the first time the user is
+    seen. Saving a value updates the record and marks it dirty instead of
+    rewriting the file. A flusher thread writes the dirty records to disk
+    every `flush_interval` seconds, so several values saved for the same user
+    in quick succession cost a single write.
+
+    Values saved since the last flush are lost if the process is killed
+    without calling `stop()`.
+
+    At most `max_records` records are kept. When there are more, the least
+    recently used records that have no unsaved values are evicted, and are
+    read again the next time the user is seen.
+
+    With a SQLite store, records are read from and flushed to the database
+    instead of the save data files.
+
+    Methods:
+        get(user_id):
+            Returns the cached record of a user.
+        load(user_id):
+            Returns the record of a user from the cache or the store.
+        add(user_id, file_name, record, dirty):
+            Adds the record of a user to the cache.
+        set(user_id, key, value):
+            Updates a value in the record of a user and marks it dirty.
+        flush():
+            Writes the dirty records to disk.
+        start():
+            Starts the flusher thread.
+        stop():
+            Flushes the dirty records and stops the flusher thread.
+    """
+
+    def __init__(self,
+                 flush_interval: float = 5.0,
+                 store: SQLiteUserSaveDataStore | None = None,
+                 max_records: int = 10_000) -> None:
+        """
+        Initializes the cache. The flusher thread is not started until
+        `start()` is called.
+
+        Args:
+            flush_interval: How many seconds to wait between flushes.
+                Defaults to 5.0.
+            store: The database to store records in, or None to store them
+                in the save data files. Defaults to None.
+            max_records: How many records to keep before evicting the least
+                recently used ones. Defaults to 10,000.
+
+        Attributes:
+            flush_interval: How many seconds to wait between flushes.
+            store: The database records are stored in, if any.
+            max_records: How many records to keep before evicting the least
+                recently used ones.
+            records: The cached records, keyed by user ID, from the least
+                to the most recently used.
+            file_names: The save data file of each cached user.
+            dirty_keys: The keys saved since the last flush, keyed by
+                user ID.
+        """
+        self.flush_interval: float = flush_interval
+        self.store: SQLiteUserSaveDataStore | None = store
+        self.max_records: int = max_records
+        self.records: "OrderedDict[int, SaveData]" = OrderedDict()
+        self.file_names: Dict[int, str] = {}
+        self.dirty_keys: Dict[int, Set[str]] = {}
+        # Users whose records are being written by a flush, which cannot be
+        # evicted until the write has finished
+        self._writing: Set[int] = set()
+        self._lock: threading.Lock = threading.Lock()
+        # Only one flush writes at a time
+        self._flush_lock: threading.Lock = threading.Lock()
+        self._stop_event: threading.Event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def get(self, user_id: int) -> SaveData | None:
+        """
+        Returns the cached record of a user.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            SaveData | None: The record, or None if the user is not cached.
+        """
+        with self._lock:
+            record: SaveData | None = self.records.get(user_id)
+            if record is not None:
+                self.records.move_to_end(user_id)
+            return record
+
+    def load(self, user_id: int) -> SaveData | None:
+        """
+        Returns the record of a user from the cache, or from the store if
+        the user is not cached yet. Only used with a store; without one,
+        `UserSaveData` reads the save data file itself.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            SaveData | None: The record, or None if the user has no
+                save data.
+        """
+        cached_record: SaveData | None = self.get(user_id)
+        if cached_record is not None or self.store is None:
+            return cached_record
+        stored_record: SaveData | None = self.store.load(user_id)
+        if stored_record is None:
+            return None
+        # The file name is not used with a store
+        return self.add(user_id, "", stored_record)
+
+    def add(self,
+            user_id: int,
+            file_name: str,
+            record: SaveData,
+            dirty: bool = False) -> SaveData:
+        """
+        Adds the record of a user to the cache, unless the user is already
+        cached.
+
+        Args:
+            user_id: The ID of the user.
+            file_name: The path to the user's save data file.
+            record: The record, as read from the file or newly created.
+            dirty: Whether the record has not been written to the file yet.
+                Defaults to False.
+
+        Returns:
+            SaveData: The cached record, which is the already cached one if
+                another instance added the user first.
+        """
+        with self._lock:
+            cached_record: SaveData | None = self.records.get(user_id)
+            if cached_record is not None:
+                self.records.move_to_end(user_id)
+                return cached_record
+            self.records[user_id] = record
+            self.file_names[user_id] = file_name
+            if dirty:
+                self.dirty_keys.setdefault(user_id, set()).update(
+                    record.keys())
+            self._evict()
+            return record
+
+    def set(self,
+            user_id: int,
+            key: str,
+            value: str | List[int] | float | None,
+            record: SaveData,
+            file_name: str) -> SaveData:
+        """
+        Updates a value in the record of a user and marks it dirty. If the
+        user's record has been evicted, the given record is cached again
+        first.
+
+        Args:
+            user_id: The ID of the user.
+            key: The key to update.
+            value: The new value.
+            record: The record of the user, as held by the caller.
+            file_name: The path to the user's save data file.
+
+        Returns:
+            SaveData: The cached record, which now contains the value.
+        """
+        with self._lock:
+            cached_record: SaveData | None = self.records.get(user_id)
+            if cached_record is None:
+                # Evicted records have no unsaved values, so the caller's
+                # record is up to date
+                cached_record = record
+                self.records[user_id] = record
+                self.file_names[user_id] = file_name
+            else:
+                self.records.move_to_end(user_id)
+            cached_record[key] = value
+            self.dirty_keys.setdefault(user_id, set()).add(key)
+            self._evict()
+            return cached_record
+
+    def _evict(self) -> None:
+        """
+        Evicts the least recently used records that have no unsaved values,
+        until there are at most `max_records` records.
+        Must be called with the lock held.
+        """
+        excess: int = len(self.records) - self.max_records
+        if excess <= 0:
+            return
+        evicted_user_ids: List[int] = []
+        for user_id in self.records:
+            if len(evicted_user_ids) >= excess:
+                break
+            if (user_id not in self.dirty_keys and
+                    user_id not in self._writing):
+                evicted_user_ids.append(user_id)
+        for user_id in evicted_user_ids:
+            del self.records[user_id]
+            del self.file_names[user_id]
+
+    def flush(self) -> int:
+        """
+        Writes the records that have changed since the last flush to disk.
+        Each record is written once, no matter how many of its values
+        have changed.
+
+        Returns:
+            int: The number of records written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if len(self.dirty_keys) == 0:
+                    return 0
+                dirty_keys: Dict[int, Set[str]] = self.dirty_keys
+                # Serialize while holding the lock, so that a record is not
+                # written halfway through an update
+                pending: List[Tuple[int, str, str]] = [
+                    (user_id, self.file_names[user_id],
+                     json.dumps(self.records[user_id]))
+                    for user_id in dirty_keys]
+                self.dirty_keys = {}
+                self._writing = set(dirty_keys)
+            if self.store is not None:
+                return self._flush_to_store(pending, dirty_keys)
+            written: int = 0
+            for user_id, file_name, contents in pending:
+                try:
+                    makedirs(dirname(file_name), exist_ok=True)
+                    # Write to a temporary file first so that a crash cannot
+                    # leave a partially written save data file behind
+                    temporary_path: str = f"{file_name}.tmp"
+                    with open(temporary_path, "w") as file:
+                        file.write(contents)
+                    replace(temporary_path, file_name)
+                    written += 1
+                except Exception as e:
+                    print(f"ERROR: Error writing save data "
+                          f"for {user_id}: {e}")
+                    with self._lock:
+                        # Try again at the next flush
+                        self.dirty_keys.setdefault(user_id, set()).update(
+                            dirty_keys[user_id])
+            with self._lock:
+                # The written records can be evicted now
+                self._writing = set()
+                self._evict()
+            return written
+
+    def _flush_to_store(self,
+                        pending: List[Tuple[int, str, str]],
+                        dirty_keys: Dict[int, Set[str]]) -> int:
+        """
+        Writes serialized records to the store in a single transaction.
+        """
+        assert self.store is not None, "store is not set."
+        try:
+            self.store.save_many(
+                [(user_id, json.loads(contents), dirty_keys[user_id])
+                 for user_id, _, contents in pending])
+        except Exception as e:
+            print(f"ERROR: Error writing save data to the database: {e}")
+            with self._lock:
+                # Try again at the next flush
+                for user_id, keys in dirty_keys.items():
+                    self.dirty_keys.setdefault(user_id, set()).update(keys)
+                self._writing = set()
+            return 0
+        with self._lock:
+            # The written records can be evicted now
+            self._writing = set()
+            self._evict()
+        return len(pending)
+
+    def start(self) -> None:
+        """
+        Starts the flusher thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="save-data-flusher",
+                                        daemon=True)
+        self._thread.start()
+        print("Save data flusher started.")
+
+    def stop(self) -> None:
+        """
+        Stops the flusher thread and writes the remaining dirty records.
+        This method blocks until everything has been written.
+        """
+        print("Stopping save data flusher...")
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        written: int = self.flush()
+        if self.store is not None:
+            self.store.close()
+        print(f"Save data flusher stopped ({written} records written).")
+
+    def _run(self) -> None:
+        """
+        Flushes the dirty records every `flush_interval` seconds until
+        the flusher is stopped.
+        """
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+# endregion
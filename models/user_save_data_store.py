@@ -0,0 +1,358 @@
+# region Imports
+# Standard library
+import json
+import sqlite3
+import threading
+from array import array
+from os import makedirs, scandir
+from os.path import dirname, exists
+from typing import Any, Dict, List, Set, Tuple
+
+# Local
+from schemas.typed import SaveData
+# endregion
+
+# region Constants
+# The save data keys that are also stored in their own indexed columns
+HOT_COLUMNS: Tuple[str, ...] = (
+    "user_name",
+    "mining_messages_enabled",
+    "network_mining_mentions_enabled",
+    "network_mining_highlights_mentions_enabled",
+    "blocked_from_receiving_coins")
+# endregion
+
+# region SQLite store
+
+
+class SQLiteUserSaveDataStore:
+    """
+    Stores the save data of all users in a single SQLite database, as an
+    alternative to one JSON file per user.
+
+    Each user has one row in the `users` table. The full record is stored as
+    JSON, and the fields that are looked up often are also stored in indexed
+    columns. Mined messages are stored in the `mined_messages` table, with
+    one row per user and message, so adding a mined message does not rewrite
+    the whole list. They are read and added through `MinedMessagesStore`,
+    not as part of the record.
+
+    The database is opened in WAL mode, so reads are not blocked while
+    the save data cache flushes.
+
+    Methods:
+        load(user_id):
+            Returns the record of a user.
+        save_many(records):
+            Saves several records in a single transaction.
+        load_mined_messages(user_id):
+            Returns the IDs of the messages a user has mined.
+        add_mined_messages(user_id, message_ids):
+            Adds messages a user has mined.
+        count_mined_messages(user_id):
+            Returns the number of messages a user has mined.
+        get_miners(message_id, user_ids):
+            Returns which of the given users have mined a message.
+        migrate_from_json(save_data_dir_path):
+            Imports the save data files of the JSON backend, once.
+        close():
+            Closes the database.
+    """
+
+    def __init__(self,
+                 database_path: str = "data/save_data.sqlite3") -> None:
+        """
+        Opens the database, and creates the tables if they do not exist.
+
+        Args:
+            database_path: The path to the database file. Defaults to
+                "data/save_data.sqlite3".
+
+        Attributes:
+            database_path: The path to the database file.
+        """
+        print("Opening save data database...")
+        self.database_path: str = database_path
+        # How many IDs at the start of each user's `messages_mined` list
+        # have been inserted since the record was loaded. The list is only
+        # ever appended to, so each flush only inserts the IDs after these
+        self._inserted_message_counts: Dict[int, int] = {}
+        directory: str = dirname(self.database_path)
+        if directory != "":
+            makedirs(directory, exist_ok=True)
+        # The connection is shared by the event loop and the flusher thread
+        self._lock: threading.Lock = threading.Lock()
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            self.database_path, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+        print("Save data database opened.")
+
+    def _create_tables(self) -> None:
+        """
+        Creates the tables and indexes if they do not exist.
+        """
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id INTEGER PRIMARY KEY, "
+                "user_name TEXT NOT NULL, "
+                "mining_messages_enabled INTEGER NOT NULL, "
+                "network_mining_mentions_enabled INTEGER NOT NULL, "
+                "network_mining_highlights_mentions_enabled INTEGER NOT NULL, "
+                "blocked_from_receiving_coins INTEGER NOT NULL, "
+                "record TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS mined_messages ("
+                "user_id INTEGER NOT NULL, "
+                "message_id INTEGER NOT NULL, "
+                "PRIMARY KEY (user_id, message_id)) WITHOUT ROWID")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            for column in HOT_COLUMNS:
+                self._connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS users_{column} "
+                    f"ON users ({column})")
+
+    def load(self, user_id: int) -> SaveData | None:
+        """
+        Returns the record of a user.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            SaveData | None: The record, or None if the user has no
+                save data. The mined messages are not included.
+        """
+        with self._lock:
+            row: Tuple[str] | None = self._connection.execute(
+                "SELECT record FROM users WHERE user_id = ?",
+                (user_id,)).fetchone()
+        if row is None:
+            return None
+        record: SaveData = json.loads(row[0])
+        record["messages_mined"] = []
+        self._inserted_message_counts.pop(user_id, None)
+        return record
+
+    def load_mined_messages(self, user_id: int) -> List[int]:
+        """
+        Returns the IDs of the messages a user has mined.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            List[int]: The message IDs.
+        """
+        with self._lock:
+            message_rows: List[Tuple[int]] = self._connection.execute(
+                "SELECT message_id FROM mined_messages WHERE user_id = ?",
+                (user_id,)).fetchall()
+        return [message_id for (message_id,) in message_rows]
+
+    def add_mined_messages(self,
+                           user_id: int,
+                           message_ids: List[int]) -> None:
+        """
+        Adds messages a user has mined, in a single transaction.
+
+        Args:
+            user_id: The ID of the user.
+            message_ids: The IDs of the messages.
+        """
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO mined_messages "
+                    "(user_id, message_id) VALUES (?, ?)",
+                    [(user_id, message_id) for message_id in message_ids])
+
+    def count_mined_messages(self, user_id: int) -> int:
+        """
+        Returns the number of messages a user has mined.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            int: The number of messages.
+        """
+        with self._lock:
+            row: Tuple[int] = self._connection.execute(
+                "SELECT COUNT(*) FROM mined_messages WHERE user_id = ?",
+                (user_id,)).fetchone()
+        return row[0]
+
+    def get_miners(self, message_id: int, user_ids: List[int]) -> Set[int]:
+        """
+        Returns which of the given users have mined a message.
+
+        Args:
+            message_id: The ID of the message.
+            user_ids: The IDs of the users.
+
+        Returns:
+            Set[int]: The IDs of the users who have mined the message.
+        """
+        miners: Set[int] = set()
+        # Stay below the limit on the number of query parameters
+        chunk_size: int = 500
+        with self._lock:
+            for start in range(0, len(user_ids), chunk_size):
+                chunk: List[int] = user_ids[start:start + chunk_size]
+                placeholders: str = ", ".join("?" * len(chunk))
+                miner_rows: List[Tuple[int]] = self._connection.execute(
+                    "SELECT user_id FROM mined_messages "
+                    f"WHERE message_id = ? AND user_id IN ({placeholders})",
+                    (message_id, *chunk)).fetchall()
+                miners.update(user_id for (user_id,) in miner_rows)
+        return miners
+
+    def _write(self,
+               user_id: int,
+               record: SaveData,
+               dirty_keys: Set[str]) -> int | None:
+        """
+        Writes the record of a user. Must be called inside a transaction.
+
+        Returns:
+            int | None: How many IDs of the `messages_mined` list have been
+                inserted, or None if the list has not changed.
+        """
+        record_without_messages: Dict[str, Any] = {
+            key: value for key, value in record.items()
+            if key != "messages_mined"}
+        self._connection.execute(
+            "INSERT OR REPLACE INTO users (user_id, user_name, "
+            "mining_messages_enabled, network_mining_mentions_enabled, "
+            "network_mining_highlights_mentions_enabled, "
+            "blocked_from_receiving_coins, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id,
+             record_without_messages.get("user_name", ""),
+             bool(record_without_messages.get(
+                 "mining_messages_enabled", True)),
+             bool(record_without_messages.get(
+                 "network_mining_mentions_enabled", False)),
+             bool(record_without_messages.get(
+                 "network_mining_highlights_mentions_enabled", False)),
+             bool(record_without_messages.get(
+                 "blocked_from_receiving_coins", False)),
+             json.dumps(record_without_messages)))
+        if "messages_mined" not in dirty_keys:
+            return None
+        messages_mined: Any = record.get("messages_mined", [])
+        if not isinstance(messages_mined, list):
+            return None
+        inserted_count: int = self._inserted_message_counts.get(user_id, 0)
+        if inserted_count > len(messages_mined):
+            # The list has been replaced
+            inserted_count = 0
+        # Mined messages are only ever added
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO mined_messages (user_id, message_id) "
+            "VALUES (?, ?)",
+            [(user_id, message_id)
+             for message_id in messages_mined[inserted_count:]])
+        return len(messages_mined)
+
+    def save_many(self,
+                  records: List[Tuple[int, SaveData, Set[str]]]) -> None:
+        """
+        Saves several records in a single transaction.
+
+        Args:
+            records: The ID, record, and changed keys of each user.
+        """
+        with self._lock:
+            inserted_counts: Dict[int, int] = {}
+            with self._connection:
+                for user_id, record, dirty_keys in records:
+                    inserted_count: int | None = self._write(
+                        user_id, record, dirty_keys)
+                    if inserted_count is not None:
+                        inserted_counts[user_id] = inserted_count
+            # Only once the transaction has been committed
+            self._inserted_message_counts.update(inserted_counts)
+
+    def migrate_from_json(self,
+                          save_data_dir_path: str = "data/save_data") -> int:
+        """
+        Imports the save data files of the JSON backend into the database.
+        The migration only runs once; after that, the database is the only
+        source of save data and the files are left untouched.
+
+        Args:
+            save_data_dir_path: The path to the save data directory.
+                Defaults to "data/save_data".
+
+        Returns:
+            int: The number of users imported.
+        """
+        with self._lock:
+            migrated: Tuple[str] | None = self._connection.execute(
+                "SELECT value FROM metadata "
+                "WHERE key = 'migrated_from_json'").fetchone()
+        if migrated is not None:
+            return 0
+        print("Migrating save data files to the database...")
+        records: List[Tuple[int, SaveData, Set[str]]] = []
+        if exists(save_data_dir_path):
+            for entry in scandir(save_data_dir_path):
+                if not entry.is_dir() or not entry.name.isdigit():
+                    continue
+                save_data_path: str = f"{entry.path}/save_data.json"
+                if not exists(save_data_path):
+                    continue
+                try:
+                    with open(save_data_path, "r") as file:
+                        record: SaveData = json.load(file)
+                    # Mined messages may also be in a binary file
+                    # (see MinedMessagesStore)
+                    mined_messages_path: str = (
+                        f"{entry.path}/messages_mined.bin")
+                    if exists(mined_messages_path):
+                        message_ids: "array[int]" = array("Q")
+                        with open(mined_messages_path, "rb") as file:
+                            contents: bytes = file.read()
+                        # Skip an ID left partially written by a crash,
+                        # like MinedMessagesStore does when reading the file
+                        complete_size: int = (
+                            len(contents) -
+                            len(contents) % message_ids.itemsize)
+                        if complete_size != len(contents):
+                            print("WARNING: Skipping a partially written "
+                                  f"message ID in '{mined_messages_path}'.")
+                        message_ids.frombytes(contents[:complete_size])
+                        record["messages_mined"] = (
+                            list(record.get("messages_mined", [])) +
+                            message_ids.tolist())
+                except Exception as e:
+                    print(f"ERROR: Error reading save data "
+                          f"'{save_data_path}': {e}")
+                    continue
+                records.append((int(entry.name), record, {"messages_mined"}))
+        with self._lock:
+            with self._connection:
+                for user_id, record, dirty_keys in records:
+                    self._write(user_id, record, dirty_keys)
+                self._connection.execute(
+                    "INSERT INTO metadata (key, value) "
+                    "VALUES ('migrated_from_json', ?)",
+                    (str(len(records)),))
+        print(f"Save data of {len(records)} users migrated "
+              "to the database.")
+        return len(records)
+
+    def close(self) -> None:
+        """
+        Closes the database.
+        """
+        with self._lock:
+            self._connection.close()
+# endregion
@@ -21,6 +21,13 @@ class ReactionUser:
     mention: str
 
 
+@dataclass(frozen=True)
+class TransactionReceipt:
+    block_index: int
+    block_hash: str
+    timestamp: float
+
+
 class SlotMachineConfig(BaseModel):
     combo_events: dict[str, ReelSymbol]
     reels: Reels
@@ -3,14 +3,23 @@
 from typing import Dict, TypedDict, List, TYPE_CHECKING
 
 # Third party
-from discord import PartialEmoji
+from discord import Member, PartialEmoji, User
 
 # Local
 if TYPE_CHECKING:
+    from discord import (Emoji, Message, Permissions, TextChannel,
+                         VoiceChannel, CategoryChannel, ForumChannel,
+                         StageChannel, Thread)
+    from discord.abc import PrivateChannel
+    from models.user_save_data import UserSaveData
     from .data_classes import ReactionUser
 # endregion
 
 # region Types
+if TYPE_CHECKING:
+    # The kinds of channels a reacted message can be in
+    ReactionChannel = (VoiceChannel | StageChannel | ForumChannel |
+                       TextChannel | CategoryChannel | Thread | PrivateChannel)
 
 
 class BotConfig(TypedDict):
@@ -53,7 +62,12 @@ class CoinReaction(TypedDict):
     user: "ReactionUser | ReactionUserDict"
 
 
-class MessageMiningTimeline(TypedDict):
+class MessageMiningUpdates(TypedDict, total=False):
+    mining_update_message_id: int
+    highlights_message_id: int
+
+
+class MessageMiningTimeline(MessageMiningUpdates):
     author_id: int
     author_name: str
     channel_id: int
@@ -109,6 +123,57 @@ class SaveData(TypedDict):
     blocked_from_receiving_coins_reason: str | None
 
 
+class ChainRangeResult(TypedDict):
+    start_offset: int
+    end_offset: int
+    block_count: int
+    first_index: int | None
+    first_previous_hash: str | None
+    last_index: int | None
+    last_hash: str | None
+    error_index: int | None
+    error: str | None
+
+
+class BalanceSnapshot(TypedDict):
+    block_index: int
+    block_hash: str
+    offset: int
+    created_at: float
+    balances: Dict[str, int]
+    signature: str
+
+
+class SaveDataCompactionResult(TypedDict):
+    user_id: int
+    bytes_before: int
+    bytes_after: int
+    keys_added: int
+    values_fixed: int
+    message_ids_moved: int
+    error: str | None
+
+
+class TransactionRow(TypedDict):
+    Time: float
+    Sender: str
+    Receiver: str
+    Amount: int
+    Method: str
+
+
+class UserIdentity(TypedDict):
+    user_id: int
+    user_name: str
+
+
+class PendingTransaction(TypedDict):
+    sender: "Member | User | ReactionUser | int"
+    receiver: "Member | User | ReactionUser | int"
+    amount: int
+    method: str
+
+
 class TransactionRequest(TypedDict):
     sender_id: int
     receiver_id: int
@@ -117,4 +182,31 @@ class TransactionRequest(TypedDict):
     channel_id: int
     message_id: int
     purpose: str
+
+
+class ReactionEvent(TypedDict):
+    message_id: int
+    emoji: "PartialEmoji | Emoji | str"
+    reacter: "Member | User"
+    channel_id: int
+    reacter_message: "Message | None"
+    channel: "ReactionChannel | None"
+    message_author: "Member | User | None"
+    message_author_id: int | None
+    timestamp: float | None
+    greet_new_players: bool
+
+
+class PreparedReaction(TypedDict):
+    message_id: int
+    reacter: "Member | User"
+    reacter_save_data: "UserSaveData"
+    message_author: "Member | User"
+    message_author_id: int
+    channel_id: int
+    channel: "VoiceChannel | TextChannel | Thread"
+    reacter_message: "Message"
+    bot_channel_permissions: "Permissions | None"
+    timestamp: float | None
+    greet_new_players: bool
 # endregion
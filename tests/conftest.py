@@ -0,0 +1,8 @@
+# region Imports
+# Standard library
+import sys
+from os.path import abspath, dirname
+# endregion
+
+# Run the tests against the modules in this repository
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
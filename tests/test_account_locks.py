@@ -0,0 +1,198 @@
+# region Imports
+# Standard library
+import asyncio
+import json
+import random
+from hashlib import sha256
+from pathlib import Path
+from time import time
+from typing import Any, Dict, Iterator, List
+
+# Third party
+import pytest
+
+# Local
+import core.global_state as g
+from models.balance_ledger import BalanceLedger, apply_block_line
+from models.blockchain_writer import BlockchainWriter
+from models.chain_file import iter_block_lines
+from models.user_identity import hash_user_id
+from utils.blockchain_utils import (AccountLockManager, add_block_transaction,
+                                    get_balance, lock_account)
+# endregion
+
+# region Constants
+HOUSE_ID: int = 1
+PLAYER_IDS: List[int] = list(range(100, 110))
+STARTING_BALANCE: int = 100
+TRANSFERS: int = 400
+SPINS: int = 400
+# endregion
+
+# region Fake blockchain
+
+
+class FakeBlockchain:
+    """
+    Appends blocks to a chain file, one JSON-encoded block per line, like
+    the blockchain does, but without proof of work.
+    """
+
+    def __init__(self, chain_file_name: str) -> None:
+        self.chain_file_name: str = chain_file_name
+        self.last_index: int = -1
+        self.last_hash: str = "0"
+
+    def add_block(self,
+                  data: List[Dict[str, Any]],
+                  difficulty: int = 0) -> None:
+        index: int = self.last_index + 1
+        block: Dict[str, Any] = {"index": index,
+                                 "timestamp": time(),
+                                 "data": data,
+                                 "previous_block_hash": self.last_hash,
+                                 "nonce": 0}
+        block["hash"] = sha256(
+            json.dumps(block, sort_keys=True).encode()).hexdigest()
+        with open(self.chain_file_name, "a") as file:
+            file.write(json.dumps(block) + "\n")
+        self.last_index = index
+        self.last_hash = block["hash"]
+
+
+@pytest.fixture
+def chain(tmp_path: Path) -> Iterator[str]:
+    """
+    Sets up a fake blockchain, with a ledger, a writer, and a lock manager,
+    and funds every player. Yields the path to the chain file.
+    """
+    chain_file_name: str = str(tmp_path / "blockchain.json")
+    blockchain = FakeBlockchain(chain_file_name)
+    blockchain.add_block([
+        {"transaction": {"sender": hash_user_id(HOUSE_ID),
+                         "receiver": hash_user_id(player_id),
+                         "amount": STARTING_BALANCE,
+                         "method": "reaction"}}
+        for player_id in PLAYER_IDS])
+    saved_globals: Dict[str, Any] = {
+        name: getattr(g, name)
+        for name in ("blockchain", "balance_ledger", "blockchain_writer",
+                     "account_lock_manager")}
+    g.blockchain = blockchain  # type: ignore[assignment]
+    g.balance_ledger = BalanceLedger(chain_file_name=chain_file_name)
+    g.blockchain_writer = BlockchainWriter(
+        blockchain=blockchain,  # type: ignore[arg-type]
+        balance_ledger=g.balance_ledger,
+        group_commit_window=0.001,
+        chain_file_name=chain_file_name)
+    g.blockchain_writer.start()
+    g.account_lock_manager = AccountLockManager()
+    yield chain_file_name
+    g.blockchain_writer.stop()
+    for name, value in saved_globals.items():
+        setattr(g, name, value)
+# endregion
+
+# region Debits
+
+
+async def transfer(sender_id: int, receiver_id: int, amount: int) -> None:
+    """
+    Debits the sender like `transfer_coins()`: the balance check and
+    the debit happen under the sender's lock.
+    """
+    async with lock_account(sender_id):
+        balance: int = get_balance(sender_id) or 0
+        if balance < amount:
+            return
+        # Yield between the check and the debit, like the awaits
+        # in the transfer command
+        await asyncio.sleep(0)
+        await add_block_transaction(blockchain=g.blockchain,  # type: ignore
+                                    sender=sender_id,
+                                    receiver=receiver_id,
+                                    amount=amount,
+                                    method="transfer")
+
+
+async def spin(player_id: int, wager: int) -> None:
+    """
+    Debits a lost wager like `insert_coins()`: the balance is checked when
+    the spin starts, the reels spin without holding the lock, and the loss
+    is debited under the lock after checking the balance again.
+    """
+    if (get_balance(player_id) or 0) < wager:
+        return
+    await asyncio.sleep(random.random() / 1000)
+    async with lock_account(player_id):
+        balance: int = get_balance(player_id) or 0
+        loss: int = min(wager, balance)
+        if loss <= 0:
+            return
+        await asyncio.sleep(0)
+        await add_block_transaction(blockchain=g.blockchain,  # type: ignore
+                                    sender=player_id,
+                                    receiver=HOUSE_ID,
+                                    amount=loss,
+                                    method="slot_machine")
+# endregion
+
+# region Tests
+
+
+def test_concurrent_debits_never_overspend(chain: str) -> None:
+    random.seed(7)
+
+    async def run() -> None:
+        operations: List[Any] = []
+        for _ in range(TRANSFERS):
+            sender_id, receiver_id = random.sample(PLAYER_IDS, 2)
+            operations.append(
+                transfer(sender_id, receiver_id, random.randint(1, 40)))
+        for _ in range(SPINS):
+            operations.append(
+                spin(random.choice(PLAYER_IDS), random.randint(1, 40)))
+        random.shuffle(operations)
+        await asyncio.gather(*operations)
+
+    asyncio.run(run())
+    # No account may go below zero at any block
+    balances: Dict[str, int] = {}
+    player_hashes: List[str] = [
+        hash_user_id(player_id) for player_id in PLAYER_IDS]
+    block_count: int = 0
+    for line, _ in iter_block_lines(chain):
+        apply_block_line(balances, line)
+        block_count += 1
+        for player_hash in player_hashes:
+            assert balances.get(player_hash, 0) >= 0
+    assert block_count > 1
+    # Transfers and spins only move coins around
+    assert sum(balances.values()) == STARTING_BALANCE * len(PLAYER_IDS)
+    assert g.balance_ledger is not None
+    g.balance_ledger.update()
+    assert g.balance_ledger.balances == balances
+    # Every lock has been discarded
+    assert g.account_lock_manager is not None
+    assert g.account_lock_manager.locks == {}
+    assert g.account_lock_manager.users == {}
+
+
+def test_release_requires_the_holding_task() -> None:
+    manager = AccountLockManager()
+
+    async def release() -> None:
+        manager.release(HOUSE_ID)
+
+    async def run() -> None:
+        await manager.acquire(HOUSE_ID)
+        # Another task, such as a reboot command, cannot release the lock
+        with pytest.raises(RuntimeError):
+            await asyncio.create_task(release())
+        assert manager.is_locked(HOUSE_ID)
+        manager.release(HOUSE_ID)
+        assert not manager.is_locked(HOUSE_ID)
+        assert manager.locks == {}
+
+    asyncio.run(run())
+# endregion
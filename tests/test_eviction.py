@@ -0,0 +1,94 @@
+# region Imports
+# Standard library
+import json
+from pathlib import Path
+from typing import Dict, cast
+
+# Third party
+import pytest
+
+# Local
+import core.global_state as g
+from models.mention_preferences import MentionPreferenceIndex
+from models.mined_messages import MinedMessagesStore
+from models.user_save_data import UserSaveData
+from models.user_save_data_cache import UserSaveDataCache
+from schemas.typed import SaveData
+# endregion
+
+# region Tests
+
+
+def make_record(user_name: str) -> SaveData:
+    """
+    Returns a partial save data record with only a user name.
+    """
+    return cast(SaveData, {"user_name": user_name})
+
+
+def test_cache_evicts_only_clean_records(tmp_path: Path) -> None:
+    cache = UserSaveDataCache(max_records=2)
+    file_names: Dict[int, str] = {
+        user_id: str(tmp_path / f"{user_id}.json") for user_id in range(4)}
+    cache.add(0, file_names[0], make_record("zero"), dirty=True)
+    cache.add(1, file_names[1], make_record("one"))
+    cache.add(2, file_names[2], make_record("two"))
+    # User 0 has unsaved values, so user 1 is evicted instead
+    assert list(cache.records) == [0, 2]
+    # Reading a record makes it the most recently used
+    assert cache.get(0) is not None
+    cache.add(3, file_names[3], make_record("three"))
+    assert list(cache.records) == [0, 3]
+    assert cache.flush() == 1
+    with open(file_names[0]) as file:
+        assert json.load(file) == {"user_name": "zero"}
+
+
+def test_cache_readds_evicted_record_on_save(tmp_path: Path) -> None:
+    cache = UserSaveDataCache(max_records=1)
+    file_name: str = str(tmp_path / "0.json")
+    record: SaveData = make_record("zero")
+    cache.add(0, file_name, record)
+    cache.add(1, str(tmp_path / "1.json"), make_record("one"))
+    assert 0 not in cache.records
+    cached_record: SaveData = cache.set(0, "starting_bonus_level", 2,
+                                        record, file_name)
+    assert cached_record is record
+    assert cache.flush() == 1
+    with open(file_name) as file:
+        assert json.load(file) == {"user_name": "zero",
+                                   "starting_bonus_level": 2}
+
+
+def test_mined_messages_store_evicts_users(tmp_path: Path) -> None:
+    store = MinedMessagesStore(save_data_dir_path=str(tmp_path),
+                               max_users=2)
+    for user_id in range(3):
+        assert store.add(user_id, 100 + user_id)
+    assert list(store.message_ids) == [1, 2]
+    assert list(store.counts) == [1, 2]
+    # Evicted IDs are loaded again from disk
+    assert store.contains(0, 100)
+    assert not store.add(0, 100)
+    assert store.count(1) == 1
+    assert list(store.message_ids) == [2, 0]
+    assert list(store.counts) == [0, 1]
+
+
+def test_mention_preferences_are_evicted_and_invalidated(
+        tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    index = MentionPreferenceIndex(max_users=2)
+    for name, value in (("user_save_data_cache", None),
+                        ("mined_messages_store", None),
+                        ("user_identity_index", None),
+                        ("mention_preference_index", index)):
+        monkeypatch.setattr(g, name, value)
+    for user_id in range(3):
+        index.get(user_id, f"user{user_id}")
+    assert list(index.preferences) == [1, 2]
+    save_data = UserSaveData(user_id=1, user_name="user1")
+    save_data.network_mining_mentions_enabled = False
+    assert 1 not in index.preferences
+    assert index.get(1, "user1")[0] is False
+# endregion
@@ -0,0 +1,28 @@
+# region Imports
+# Standard library
+from typing import Any, Dict
+
+# Local
+from models.save_data_compactor import upgrade_save_data
+# endregion
+
+# region Tests
+
+
+def test_upgrade_keeps_boolean_like_strings() -> None:
+    save_data: Dict[str, Any] = {
+        "user_id": 1,
+        "user_name": "True",
+        "blocked_from_receiving_coins": "true",
+        "blocked_from_receiving_coins_reason": "false",
+        "mining_messages_enabled": "False"}
+    keys_added, values_fixed = upgrade_save_data(save_data, 1)
+    # Strings are kept for keys that can be strings
+    assert save_data["user_name"] == "True"
+    assert save_data["blocked_from_receiving_coins_reason"] == "false"
+    # and converted for keys that are booleans
+    assert save_data["blocked_from_receiving_coins"] is True
+    assert save_data["mining_messages_enabled"] is False
+    assert values_fixed == 2
+    assert keys_added == 8
+# endregion
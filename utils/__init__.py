@@ -1,12 +1,19 @@
 """
 Utility modules for SBCoin Nightclub Discord bot.
 """
-from .blockchain_utils import get_last_block_timestamp, add_block_transaction
+from .blockchain_utils import (get_last_block_timestamp,
+                               add_block_transaction,
+                               add_block_transactions,
+                               get_balance,
+                               validate_blockchain,
+                               audit_blockchain,
+                               audit_blockchain_parallel)
 from .coin_reaction import process_reaction
 from .decrypt_transactions import DecryptedTransactionsSpreadsheet
 from .formatting import format_coin_label
-from .missed_messages import process_missed_messages
-from .process_reaction import process_reaction
+from .missed_messages import (process_missed_messages,
+                              start_missed_messages_processing)
+from .process_reaction import process_reaction, process_reactions
 from .roles import (get_role,
                     get_slot_machine_technician_role,
                     get_cybersecurity_officer_role,
@@ -18,12 +25,19 @@ from .transfer_coins import transfer_coins
 __all__: list[str] = [
     'get_last_block_timestamp',
     'add_block_transaction',
+    'add_block_transactions',
+    'get_balance',
+    'validate_blockchain',
+    'audit_blockchain',
+    'audit_blockchain_parallel',
     'transfer_coins',
     'process_reaction',
     'DecryptedTransactionsSpreadsheet',
     'format_coin_label',
     'process_missed_messages',
+    'start_missed_messages_processing',
     'process_reaction',
+    'process_reactions',
     'get_role',
     'get_slot_machine_technician_role',
     'get_cybersecurity_officer_role',
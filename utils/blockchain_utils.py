@@ -3,8 +3,13 @@ Functions for interacting with the blockchain from the Discord bot.
 """
 # region Imports
 # Standard Library
-from hashlib import sha256
-from typing import TYPE_CHECKING
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, List,
+                    Tuple, TYPE_CHECKING)
 
 # Third party
 from discord import Member, User
@@ -14,7 +19,14 @@ if TYPE_CHECKING:
     from sponsorblockchain.sponsorblockchain_types import (
         BlockData)
 import core.global_state as g
-from schemas.data_classes import ReactionUser
+from schemas.data_classes import ReactionUser, TransactionReceipt
+from schemas.typed import ChainRangeResult, PendingTransaction
+from models.balance_ledger import BalanceLedger
+from models.blockchain_writer import BlockchainWriter, add_block_with_receipt
+from models.chain_validator import (
+    IncrementalChainValidator, split_chain_file, stitch_chain_ranges,
+    verify_chain_range)
+from models.user_identity import hash_user_id
 from core.terminate_bot import terminate_bot
 from sponsorblockchain.sponsorblockchain_types import Transaction
 from sponsorblockchain.models.blockchain import Blockchain
@@ -59,11 +71,93 @@ def get_last_block_timestamp() -> float | None:
 # region Add tx block
 
 
+def get_user_id(user: Member | User | ReactionUser | int) -> int:
+    """
+    Returns the ID of a user, who may already be given by their ID.
+    """
+    if isinstance(user, int):
+        return user
+    else:
+        return user.id
+
+
+async def add_block_transactions(
+        blockchain: Blockchain,
+        transactions: List[PendingTransaction]) -> TransactionReceipt:
+    """
+    Adds several transactions to the blockchain as a single block.
+
+    Use this for transactions that belong to the same event, such as all the
+    payouts of one coin reaction, so that the event costs one block write
+    instead of one per transaction.
+
+    The block is written by the blockchain writer thread, so the event loop
+    is not blocked while the block is hashed and saved. The writer may add
+    transactions from other events that arrive at the same time to the
+    same block.
+
+    Args:
+        blockchain: The blockchain instance to which the transactions will
+            be added.
+        transactions: The transactions to add. The sender and receiver of
+            each transaction can be a Member, User, ReactionUser,
+            or an integer User ID.
+
+    Returns:
+        TransactionReceipt: The index, hash, and timestamp of the block
+            the transactions were added to.
+
+    Raises:
+        ValueError: If there are no transactions to add.
+        Exception: If there is an error adding the transactions to
+            the blockchain.
+    """
+    if len(transactions) == 0:
+        raise ValueError("No transactions to add.")
+    print(f"Adding {len(transactions)} transactions to blockchain...")
+    try:
+        block_transactions: List[Transaction] = []
+        for pending_transaction in transactions:
+            sender_id: int = get_user_id(pending_transaction["sender"])
+            receiver_id: int = get_user_id(pending_transaction["receiver"])
+            sender_id_hash: str = hash_user_id(sender_id)
+            receiver_id_hash: str = hash_user_id(receiver_id)
+            del sender_id
+            del receiver_id
+            transaction = Transaction(
+                sender=sender_id_hash,
+                receiver=receiver_id_hash,
+                amount=pending_transaction["amount"],
+                method=pending_transaction["method"]
+            )
+            block_transactions.append(transaction)
+        receipt: TransactionReceipt
+        if (isinstance(g.blockchain_writer, BlockchainWriter) and
+                g.blockchain_writer.blockchain is blockchain):
+            receipt = await asyncio.wrap_future(
+                g.blockchain_writer.submit(block_transactions))
+        else:
+            data: BlockData = [
+                {"transaction": transaction}
+                for transaction in block_transactions]
+            receipt = await asyncio.to_thread(
+                add_block_with_receipt, blockchain, data)
+            if isinstance(g.balance_ledger, BalanceLedger):
+                await asyncio.to_thread(g.balance_ledger.update)
+                await asyncio.to_thread(
+                    g.balance_ledger.take_snapshot_if_due)
+    except Exception as e:
+        print(f"ERROR: Error adding transactions to blockchain: {e}")
+        await terminate_bot()
+    print(f"Transactions added to block {receipt.block_index}.")
+    return receipt
+
+
 async def add_block_transaction(blockchain: Blockchain,
                                 sender: Member | User | ReactionUser | int,
                                 receiver: Member | User | ReactionUser | int,
                                 amount: int,
-                                method: str) -> None:
+                                method: str) -> TransactionReceipt:
     """
     Adds a transaction to the blockchain.
 
@@ -78,43 +172,328 @@ async def add_block_transaction(blockchain: Blockchain,
         method: The method of the transaction; "reaction", "slot_machine",
             "transfer".
 
+    Returns:
+        TransactionReceipt: The index, hash, and timestamp of the block
+            the transaction was added to.
+
     Raises:
         Exception: If there is an error adding the transaction to
             the blockchain.
     """
-    sender_id: int
-    receiver_id: int
-    if isinstance(sender, int):
-        sender_id = sender
-    else:
-        sender_id = sender.id
-    if isinstance(receiver, int):
-        receiver_id = receiver
-    else:
-        receiver_id = receiver.id
-    sender_id_unhashed: int = sender_id
-    receiver_id_unhashed: int = receiver_id
-    sender_id_hash: str = (
-        sha256(str(sender_id_unhashed).encode()).hexdigest())
-    del sender_id
-    del sender_id_unhashed
-    receiver_id_hash: str = (
-        sha256(str(receiver_id_unhashed).encode()).hexdigest())
-    del receiver_id
-    del receiver_id_unhashed
-    print("Adding transaction to blockchain...")
+    return await add_block_transactions(
+        blockchain=blockchain,
+        transactions=[{"sender": sender,
+                       "receiver": receiver,
+                       "amount": amount,
+                       "method": method}])
+# endregion
+
+# region Get balance
+
+
+def get_balance(user_id: int) -> int | None:
+    """
+    Retrieves the balance of a user from the balance ledger.
+
+    Args:
+        user_id: The ID of the user.
+
+    Returns:
+        int | None: The balance of the user, or None if the user has never
+            been part of a transaction.
+    """
+    if not isinstance(g.balance_ledger, BalanceLedger):
+        raise ValueError("balance_ledger is not initialized.")
+    user_id_hash: str = hash_user_id(user_id)
+    balance: int | None = g.balance_ledger.get_balance(user_id_hash)
+    return balance
+
+
+async def verify_balance_ledger() -> bool:
+    """
+    Compares the balance ledger against a full replay of the blockchain in
+    a worker thread.
+
+    Returns:
+        bool: True if the ledger is consistent with the blockchain,
+            otherwise False.
+    """
+    if not isinstance(g.balance_ledger, BalanceLedger):
+        raise ValueError("balance_ledger is not initialized.")
+    ledger_consistent: bool = await asyncio.to_thread(
+        g.balance_ledger.verify)
+    return ledger_consistent
+# endregion
+
+# region Account locks
+
+
+class AccountLockManager:
+    """
+    Serializes the operations that debit the same account.
+
+    Debiting an account means checking the balance and then adding a block,
+    with `await` points in between. Without a lock, two operations debiting
+    the same account could both pass the balance check and overspend.
+    Each account has its own lock, keyed by hashed user ID, so operations on
+    different accounts still run concurrently. A lock is discarded when no
+    operation holds or waits for it.
+
+    Hold a lock only around the balance check and the debit, not while
+    waiting for a user, so that other operations on the account are not
+    held up. A lock can only be released by the task that acquired it.
+
+    Methods:
+        acquire(user_id):
+            Waits for and acquires the lock of an account.
+        release(user_id):
+            Releases the lock of an account held by the current task.
+        hold(user_id):
+            Holds the lock of an account for the duration of
+            an `async with` block.
+        is_locked(user_id):
+            Checks if the lock of an account is held.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the lock manager.
+
+        Attributes:
+            locks: The lock of each account that is in use, keyed by hashed
+                user ID.
+            users: The number of operations holding or waiting for the lock
+                of each account, keyed by hashed user ID.
+            owners: The task holding the lock of each locked account, keyed
+                by hashed user ID.
+        """
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.users: Dict[str, int] = {}
+        self.owners: Dict[str, "asyncio.Task[Any] | None"] = {}
+
+    def _forget(self, user_id_hash: str) -> None:
+        """
+        Stops counting an operation as a user of a lock, and discards the lock
+        if it has no users left.
+        """
+        self.users[user_id_hash] -= 1
+        if self.users[user_id_hash] == 0:
+            del self.users[user_id_hash]
+            del self.locks[user_id_hash]
+
+    async def acquire(self, user_id: int) -> None:
+        """
+        Waits for and acquires the lock of an account.
+
+        Args:
+            user_id: The ID of the account's user.
+        """
+        user_id_hash: str = hash_user_id(user_id)
+        lock: asyncio.Lock | None = self.locks.get(user_id_hash)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[user_id_hash] = lock
+        self.users[user_id_hash] = self.users.get(user_id_hash, 0) + 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            # Cancelled while waiting
+            self._forget(user_id_hash)
+            raise
+        self.owners[user_id_hash] = asyncio.current_task()
+
+    def release(self, user_id: int) -> None:
+        """
+        Releases the lock of an account held by the current task.
+
+        Args:
+            user_id: The ID of the account's user.
+
+        Raises:
+            RuntimeError: If the current task does not hold the lock.
+        """
+        user_id_hash: str = hash_user_id(user_id)
+        lock: asyncio.Lock | None = self.locks.get(user_id_hash)
+        if (lock is None or not lock.locked() or
+                self.owners.get(user_id_hash) is not asyncio.current_task()):
+            raise RuntimeError(f"The lock of account {user_id_hash} is not "
+                               "held by the current task.")
+        del self.owners[user_id_hash]
+        lock.release()
+        self._forget(user_id_hash)
+
+    @asynccontextmanager
+    async def hold(self, user_id: int) -> AsyncIterator[None]:
+        """
+        Holds the lock of an account for the duration of
+        an `async with` block.
+
+        Args:
+            user_id: The ID of the account's user.
+        """
+        await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def is_locked(self, user_id: int) -> bool:
+        """
+        Checks if the lock of an account is held.
+
+        Args:
+            user_id: The ID of the account's user.
+
+        Returns:
+            bool: True if the lock is held, otherwise False.
+        """
+        lock: asyncio.Lock | None = self.locks.get(hash_user_id(user_id))
+        return lock is not None and lock.locked()
+
+
+def lock_account(user_id: int) -> AbstractAsyncContextManager[None]:
+    """
+    Holds the lock of an account for the duration of an `async with` block.
+    Wrap the balance check and the debit of an account in this, so that
+    no other operation can debit the account in between.
+
+    Args:
+        user_id: The ID of the account's user.
+
+    Returns:
+        AbstractAsyncContextManager[None]: The context manager holding
+            the lock.
+    """
+    if not isinstance(g.account_lock_manager, AccountLockManager):
+        raise ValueError("account_lock_manager is not initialized.")
+    return g.account_lock_manager.hold(user_id)
+# endregion
+
+# region Validate chain
+
+
+async def validate_blockchain() -> bool:
+    """
+    Verifies the blocks that have been added to the blockchain since the
+    last validation, in a worker thread, so that the event loop is not
+    held up if the validator has to verify a long part of the chain.
+
+    Returns:
+        bool: True if the blockchain is valid, otherwise False.
+    """
+    if not isinstance(g.chain_validator, IncrementalChainValidator):
+        raise ValueError("chain_validator is not initialized.")
+    chain_validity: bool = False
     try:
-        transaction = Transaction(
-            sender=sender_id_hash,
-            receiver=receiver_id_hash,
-            amount=amount,
-            method=method
-        )
-        data: BlockData = (
-            [{"transaction": transaction}])
-        blockchain.add_block(data=data, difficulty=0)
+        print("Validating blockchain...")
+        chain_validity = await asyncio.to_thread(
+            g.chain_validator.validate_new_blocks)
     except Exception as e:
-        print(f"ERROR: Error adding transaction to blockchain: {e}")
-        await terminate_bot()
-    print("Transaction added to blockchain.")
+        # TODO Revert blockchain to previous state
+        print(f"ERROR: Error validating blockchain: {e}")
+        chain_validity = False
+    return chain_validity
+
+
+async def audit_blockchain() -> bool:
+    """
+    Verifies the entire blockchain in a worker thread, so that the bot stays
+    responsive during the audit.
+
+    Returns:
+        bool: True if the blockchain is valid, otherwise False.
+    """
+    if not isinstance(g.chain_validator, IncrementalChainValidator):
+        raise ValueError("chain_validator is not initialized.")
+    chain_validity: bool = await asyncio.to_thread(
+        g.chain_validator.full_audit)
+    return chain_validity
+
+
+async def audit_blockchain_parallel(
+        progress_callback: Callable[[int, int], Awaitable[None]] | None = None
+) -> Tuple[bool, int | None]:
+    """
+    Verifies the entire blockchain in a pool of worker processes.
+
+    The blockchain file is split into byte ranges, which are verified
+    independently, and the ranges are then stitched together by checking
+    that the first block of each range links to the last block of the range
+    before it. Unlike `audit_blockchain()`, this uses every CPU core, since
+    the hashing is not held back by the GIL.
+
+    Args:
+        progress_callback: A coroutine function that is called with the
+            number of verified ranges and the total number of ranges each
+            time a range has been verified. Defaults to None.
+
+    Returns:
+        Tuple[bool, int | None]: Whether the blockchain is valid, and the
+            index of the first invalid block, if any.
+    """
+    if not isinstance(g.chain_validator, IncrementalChainValidator):
+        raise ValueError("chain_validator is not initialized.")
+    chain_file_name: str = g.chain_validator.chain_file_name
+    if not os.path.exists(chain_file_name):
+        print(f"ERROR: Blockchain file '{chain_file_name}' not found.")
+        return False, None
+    worker_count: int = g.chain_audit_workers or os.cpu_count() or 1
+    # More ranges than workers, so that progress can be reported and
+    # a slow range does not hold up the rest of the pool
+    ranges: List[Tuple[int, int]] = await asyncio.to_thread(
+        split_chain_file, chain_file_name, worker_count * 4)
+    print(f"Auditing the blockchain in {len(ranges)} ranges "
+          f"with {worker_count} worker processes...")
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    results: List[ChainRangeResult] = []
+    # Spawn the workers rather than forking the bot, which runs
+    # several threads
+    with ProcessPoolExecutor(
+            max_workers=worker_count,
+            mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures: List[asyncio.Future[ChainRangeResult]] = [
+            loop.run_in_executor(
+                pool, verify_chain_range, chain_file_name, start, end)
+            for start, end in ranges]
+        for future in asyncio.as_completed(futures):
+            results.append(await future)
+            if progress_callback is not None:
+                await progress_callback(len(results), len(ranges))
+    first_invalid_index: int | None
+    error: str | None
+    last_index: int | None
+    last_hash: str | None
+    last_offset: int
+    first_invalid_index, error, last_index, last_hash, last_offset = (
+        stitch_chain_ranges(results))
+    if error is not None:
+        print(f"ERROR: Blockchain audit failed at block "
+              f"{first_invalid_index}: {error}")
+        return False, first_invalid_index
+    if last_index is not None and last_hash is not None:
+        g.chain_validator.trust_block(last_index, last_hash, last_offset)
+    print(f"Blockchain audit passed. Last block: {last_index}.")
+    return True, None
+
+
+async def run_scheduled_chain_audits() -> None:
+    """
+    Audits the entire blockchain on startup and then every
+    `g.chain_audit_interval` seconds.
+    Terminates the bot if the blockchain is invalid.
+    """
+    while True:
+        chain_validity: bool = await audit_blockchain()
+        if chain_validity is False:
+            await terminate_bot()
+        await asyncio.sleep(g.chain_audit_interval)
+
+
+def start_scheduled_chain_audits() -> None:
+    """
+    Starts the scheduled blockchain audits, unless they are already running.
+    """
+    if g.chain_audit_task is not None and not g.chain_audit_task.done():
+        return
+    g.chain_audit_task = asyncio.create_task(run_scheduled_chain_audits())
 # endregion
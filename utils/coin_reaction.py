@@ -1,7 +1,4 @@
 # region Imports
-# Standard Library
-from typing import List
-
 # Third party
 from discord import (Member, Message, Emoji, PartialEmoji, User, TextChannel,
                      VoiceChannel, CategoryChannel, ForumChannel, StageChannel,
@@ -12,11 +9,12 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
+from schemas.data_classes import TransactionReceipt
 from core.terminate_bot import terminate_bot
 from models.log import Log
 from models.user_save_data import UserSaveData
 from utils.blockchain_utils import (add_block_transaction,
-                                    get_last_block_timestamp)
+                                    validate_blockchain)
 
 # region Coin reaction
 
@@ -72,32 +70,25 @@ async def process_reaction(bot: Bot,
         sender_name: str = sender.name
         save_data: UserSaveData = UserSaveData(
             user_id=sender_id, user_name=sender_name)
-        message_mined_data: str | List[int] | bool | float | None = (
-            save_data.load("messages_mined"))
-        message_mined: List[int] = (
-            message_mined_data if isinstance(message_mined_data, list) else [])
-        if message_id in message_mined:
-            return
         # Add the message ID to the list of mined messages
-        message_mined.append(message_id)
-        save_data.save(key="messages_mined", value=message_mined)
+        if not save_data.add_mined_message(message_id):
+            return
 
         print(f"{sender} ({sender_id}) is mining 1 {g.coin} "
               f"for {receiver} ({receiver_id})...")
         if g.blockchain is None:
             raise ValueError("ERROR: g.blockchain is None.")
-        await add_block_transaction(blockchain=g.blockchain,
-                                    sender=sender,
-                                    receiver=receiver,
-                                    amount=1,
-                                    method="reaction"
+        receipt: TransactionReceipt = await add_block_transaction(
+            blockchain=g.blockchain,
+            sender=sender,
+            receiver=receiver,
+            amount=1,
+            method="reaction"
         )
 
         # Log the mining
-        last_block_timestamp: float | None = get_last_block_timestamp()
-        if last_block_timestamp is None:
-            print("ERROR: Could not get last block timestamp.")
-            await terminate_bot()
+        last_block_timestamp: float = receipt.timestamp
+        del receipt
 
         assert g.log is not None, (
             "g.log must be initialized before calling process_reaction")
@@ -112,15 +103,7 @@ async def process_reaction(bot: Bot,
             print(f"ERROR: Error logging mining: {e}")
             await terminate_bot()
 
-        chain_validity: bool | None = None
-        try:
-            print("Validating blockchain...")
-            chain_validity = g.blockchain.is_chain_valid()
-        except Exception as e:
-            # TODO Revert blockchain to previous state
-            print(f"ERROR: Error validating blockchain: {e}")
-            chain_validity = False
-
+        chain_validity: bool = await validate_blockchain()
         if chain_validity is False:
             await terminate_bot()
 
@@ -1,16 +1,17 @@
 # region Imports
 # Standard Library
-import os
-from os.path import exists, basename
+from os.path import exists
 from pathlib import Path
-from hashlib import sha256
-from typing import Dict
+from typing import Dict, List
 
 # Third party
 import pandas as pd
 
 # Local
-from models.user_save_data import UserSaveData
+import core.global_state as g
+from models.transaction_index import TransactionIndex
+from models.user_identity import UserIdentityIndex, hash_user_id
+from schemas.typed import TransactionRow
 from utils.formatting import format_timestamp
 # endregion
 
@@ -40,39 +41,36 @@ class DecryptedTransactionsSpreadsheet:
         if not exists(self.encrypted_spreadsheet_path):
             print("Encrypted transactions spreadsheet not found.")
             return None
-        if not exists(self.save_data_dir_path):
-            print("Save data directory not found.")
-            return None
+        assert isinstance(g.user_identity_index, UserIdentityIndex), (
+            "User identity index is not initialized.")
 
         print("Decrypting transactions spreadsheet...")
-        user_names: Dict[str, str] = {}
-        for subdir, _, _ in os.walk(self.save_data_dir_path):
-            try:
-                subdir_user_id: int = int(basename(subdir))
-                subdir_save_data = UserSaveData(subdir_user_id)
-                subdir_user_name: str = subdir_save_data.user_name
-                subdir_user_id_hashed: str = (
-                    sha256(str(subdir_user_id).encode()).hexdigest())
-                user_names[subdir_user_id_hashed] = subdir_user_name
-            except Exception as e:
-                print(f"ERROR: Error getting save data: {e}")
-                continue
-
-        # Load the data from the file
-        transactions: pd.DataFrame = (
-            pd.read_csv(  # pyright: ignore[reportUnknownMemberType]
-            self.encrypted_spreadsheet_path, sep="\t"))
+        user_names: Dict[str, str] = (
+            g.user_identity_index.get_user_names())
 
         # IMPROVE if user_id and user_name
         # Only keep transactions that involve the specified user as
         # identified by the ID or name
 
-        if user_id:
-            # Only keep transactions that involve the specified user
-            user_id_hashed: str = sha256(str(user_id).encode()).hexdigest()
-            transactions = transactions[
-                (transactions["Sender"] == user_id_hashed) |
-                (transactions["Receiver"] == user_id_hashed)]
+        transactions: pd.DataFrame
+        if user_id and isinstance(g.transaction_index, TransactionIndex):
+            # Only read the transactions that involve the specified user
+            user_id_hashed: str = hash_user_id(user_id)
+            user_transactions: List[TransactionRow] = (
+                g.transaction_index.query(party=user_id_hashed))
+            transactions = pd.DataFrame(
+                user_transactions, columns=g.transaction_index.columns)
+        else:
+            # Load the data from the file
+            transactions = (
+                pd.read_csv(  # pyright: ignore[reportUnknownMemberType]
+                self.encrypted_spreadsheet_path, sep="\t"))
+            if user_id:
+                # Only keep transactions that involve the specified user
+                user_id_hashed: str = hash_user_id(user_id)
+                transactions = transactions[
+                    (transactions["Sender"] == user_id_hashed) |
+                    (transactions["Receiver"] == user_id_hashed)]
 
         # Replace hashed user IDs with user names
         transactions["Sender"] = (
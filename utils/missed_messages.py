@@ -1,19 +1,189 @@
 # region Imports
 # Standard Library
-from typing import Dict, List
+import asyncio
+from time import perf_counter, time
+from typing import Dict, List, Set
 
-# Third party 
-from discord import Member, Emoji, PartialEmoji, User
+# Third party
+from discord import (Member, Message, Emoji, Object, PartialEmoji,
+                     TextChannel, User)
+from discord.reaction import Reaction
 from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
     Bot)
 
 # Local
 import core.global_state as g
-from utils.process_reaction import process_reaction
+from models.checkpoints import ChannelCheckpoints
+from utils.reaction_dispatcher import ReactionDispatcher
 # endregion
 # region Missed msgs
 
 
+def get_coin_reaction(message: Message) -> Reaction | None:
+    """
+    Returns the coin reaction of a message, without fetching its users.
+
+    Args:
+        message: The message.
+
+    Returns:
+        Reaction | None: The reaction with the coin emoji, or None if nobody
+            has reacted with it.
+    """
+    for reaction in message.reactions:
+        reaction_emoji: PartialEmoji | Emoji | str = reaction.emoji
+        if (isinstance(reaction_emoji, (Emoji, PartialEmoji)) and
+                reaction_emoji.id == g.coin_emoji_id):
+            return reaction
+    return None
+
+
+async def process_missed_message_reactions(message: Message,
+                                           channel: TextChannel) -> None:
+    """
+    Processes the coin reactions to a message that were added while the bot
+    was offline.
+
+    Only the users of the coin reaction are fetched, and the reacters that
+    have already mined the message are skipped with a single lookup for all
+    of them. The other reactions are dispatched to the queue of the message,
+    like new reactions, and processed together. This function returns once
+    they have been processed.
+
+    Args:
+        message: The message.
+        channel: The channel the message was sent in.
+
+    Raises:
+        ValueError: If a reaction could not be processed.
+    """
+    assert isinstance(g.reaction_dispatcher, ReactionDispatcher), (
+        "g.reaction_dispatcher has not been initialized.")
+    coin_reaction: Reaction | None = get_coin_reaction(message)
+    if coin_reaction is None:
+        return
+    message_id: int = message.id
+    message_author: Member | User = message.author
+    reacters: List[Member | User] = [
+        user async for user in coin_reaction.users()
+        if user.id != message_author.id]
+    if len(reacters) == 0:
+        return
+    miners: Set[int] = set()
+    if g.mined_messages_store is not None:
+        miners = g.mined_messages_store.get_miners(
+            message_id, (reacter.id for reacter in reacters))
+    # When the reactions were added is unknown, so they are timestamped
+    # when they are found, a millisecond apart to keep them in order
+    timestamp: float = time()
+    processed_futures: List[asyncio.Future[bool]] = []
+    for reacter in reacters:
+        if reacter.id in miners:
+            continue
+        processed_futures.append(g.reaction_dispatcher.dispatch({
+            "message_id": message_id,
+            "emoji": coin_reaction.emoji,
+            "reacter": reacter,
+            "channel_id": channel.id,
+            "reacter_message": message,
+            "channel": channel,
+            "message_author": message_author,
+            "message_author_id": message_author.id,
+            "timestamp": timestamp + len(processed_futures) / 1000,
+            "greet_new_players": False},
+            # All reacters are queued at once, so there is nothing to wait for
+            coalescing_window=0.0))
+    processed: List[bool] = await asyncio.gather(*processed_futures)
+    if not all(processed):
+        raise ValueError(f"Could not process the reactions "
+                         f"to message {message_id}.")
+
+
+async def process_missed_channel_messages(
+        channel: TextChannel,
+        after_message_id: int | None,
+        semaphore: asyncio.Semaphore,
+        limit: int | None = None) -> None:
+    """
+    Fetches the messages that were sent in a channel while the bot was
+    offline, processes their reactions, and saves a new checkpoint for
+    the channel.
+
+    Messages are fetched oldest first, starting after the given message, so
+    only the missed messages are fetched. A channel without checkpoints
+    only gets a checkpoint at its last message.
+
+    The catch-up cursor of the channel is moved after each processed
+    message, and cleared once the channel has been caught up.
+
+    Args:
+        channel: The channel to fetch messages from.
+        after_message_id: The catch-up cursor or, if there is none, the
+            newest checkpoint of the channel. None if the channel has
+            no checkpoints.
+        semaphore: Limits how many channels are processed at the same time.
+        limit: Limit the maximum number of messages to fetch, or None to
+            fetch all missed messages. Defaults to None.
+    """
+    async with semaphore:
+        started_at: float = perf_counter()
+        channel_id: int = channel.id
+        channel_name: str = channel.name
+        print("Fetching messages from "
+              f"channel: {channel_name} ({channel_id})...")
+        checkpoints: ChannelCheckpoints | None = (
+            g.all_channel_checkpoints.get(channel_id))
+        new_channel_messages_found: int = 0
+        fresh_last_message_id: int | None = None
+        caught_up: bool = False
+        try:
+            if after_message_id is None:
+                print(f"No checkpoints could be loaded for channel "
+                      f"{channel_name} ({channel_id}).")
+                # Start keeping track of the channel from its last message
+                async for message in channel.history(limit=1):
+                    fresh_last_message_id = message.id
+            else:
+                # Message IDs are snowflakes, which increase over time, so
+                # every message after the cursor or checkpoint was missed
+                async for message in channel.history(
+                        limit=limit,
+                        after=Object(id=after_message_id),
+                        oldest_first=True):
+                    await process_missed_message_reactions(message, channel)
+                    # The last message processed will be used as
+                    # the checkpoint
+                    fresh_last_message_id = message.id
+                    new_channel_messages_found += 1
+                    if checkpoints is not None:
+                        checkpoints.set_catch_up_cursor(fresh_last_message_id)
+                # Catch-up that stopped at the limit is continued next time
+                caught_up = (limit is None or
+                             new_channel_messages_found < limit)
+        except Exception as e:
+            print("ERROR: Error fetching messages "
+                  f"from channel {channel_name} ({channel_id}): {e}")
+        elapsed: float = perf_counter() - started_at
+        print(f"Messages from channel {channel_name} ({channel_id}) "
+              f"fetched in {elapsed:.2f} seconds "
+              f"({new_channel_messages_found} new messages).")
+        if checkpoints is None:
+            return
+        if caught_up:
+            checkpoints.set_catch_up_cursor(None)
+        if fresh_last_message_id is None:
+            if after_message_id is None:
+                print(f"WARNING: No channel messages found in channel "
+                      f"{channel_name} ({channel_id}).")
+            return
+        # Messages sent since the bot started may already have saved
+        # a newer checkpoint (message IDs increase over time)
+        if fresh_last_message_id > max(checkpoints.checkpoints, default=0):
+            print(f"Saving checkpoint for channel {channel_name} "
+                  f"({channel_id}): {fresh_last_message_id}")
+            checkpoints.save(fresh_last_message_id)
+
+
 async def process_missed_messages(limit: int | None = None) -> None:
     """
     This function iterates through all guilds and their text channels to fetch
@@ -21,7 +191,15 @@ async def process_missed_messages(limit: int | None = None) -> None:
     these messages and updates checkpoints to keep track of the last processed
     message in each channel.
 
-    This does not process reactions to messages older than the last checkpoint
+    Channels are processed concurrently, at most
+    `g.missed_messages_concurrency` at a time, starting with the channels
+    that were most recently active.
+
+    If an earlier run was interrupted, each channel resumes from its catch-up
+    cursor instead of its newest checkpoint, which may have been saved by
+    a message sent after that run started.
+
+    This does not process reactions to messages older than the newest checkpoint
     (i.e. older than the last message sent before the bot went offline). That
     would require keeping track of every single message and reactions on the
     server in a database.
@@ -33,85 +211,62 @@ async def process_missed_messages(limit: int | None = None) -> None:
 
         each channel.
     """
-    missed_messages_processed_message: str = "Missed messages processed."
     assert isinstance(g.bot, Bot), "bot has not been initialized."
     print("Processing missed messages...")
+    started_at: float = perf_counter()
+    channels: List[TextChannel] = [
+        channel for guild in g.bot.guilds for channel in guild.text_channels]
+    # Message IDs increase over time, so the channels with the highest
+    # last message ID were the most recently active
+    channels.sort(key=lambda channel: channel.last_message_id or 0,
+                  reverse=True)
+    # Find where to start before processing any channel, since messages
+    # sent while the missed messages are processed save new checkpoints
+    after_message_ids: Dict[int, int | None] = {}
+    resumed_channels: int = 0
+    for channel in channels:
+        checkpoints: ChannelCheckpoints | None = (
+            g.all_channel_checkpoints.get(channel.id))
+        after_message_id: int | None = None
+        if checkpoints is not None:
+            if checkpoints.catch_up_cursor is not None:
+                after_message_id = checkpoints.catch_up_cursor
+                resumed_channels += 1
+            elif len(checkpoints.checkpoints) > 0:
+                after_message_id = max(checkpoints.checkpoints)
+                # Remember where catch-up starts, in case it is interrupted
+                checkpoints.set_catch_up_cursor(after_message_id)
+        after_message_ids[channel.id] = after_message_id
+    if resumed_channels > 0:
+        print(f"Resuming interrupted catch-up in {resumed_channels} "
+              "channels.")
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(
+        max(1, g.missed_messages_concurrency))
+    await asyncio.gather(*(
+        process_missed_channel_messages(
+            channel=channel,
+            after_message_id=after_message_ids[channel.id],
+            semaphore=semaphore,
+            limit=limit)
+        for channel in channels))
+    elapsed: float = perf_counter() - started_at
+    print(f"Missed messages processed in {len(channels)} channels "
+          f"in {elapsed:.2f} seconds.")
 
-    for guild in g.bot.guilds:
-        print("Fetching messages from "
-              f"guild: {guild.name} ({guild.id})...")
-        for channel in guild.text_channels:
-            channel_id: int = channel.id
-            channel_name: str = channel.name
-            print("Fetching messages from "
-                  f"channel: {channel_name} ({channel_id})...")
-            channel_checkpoints: List[Dict[str, int]] | None = (
-                g.all_channel_checkpoints[channel.id].load())
-            if channel_checkpoints is not None:
-                print(f"Channel checkpoints loaded.")
-            else:
-                print("No checkpoints could be loaded.")
-            new_channel_messages_found: int = 0
-            fresh_last_message_id: int | None = None
-            checkpoint_reached: bool = False
-            # Fetch messages from the channel (reverse chronological order)
-            try:
-                async for message in channel.history(limit=limit):
-                    message_id: int = message.id
-                    if new_channel_messages_found == 0:
-                        # The first message found will be the last message sent
-                        # This will be used as the checkpoint
-                        fresh_last_message_id = message_id
-                    # print(f"{message.author}: "
-                    #       f"{message.content} ({message_id}).")
-                    if channel_checkpoints is not None:
-                        for checkpoint in channel_checkpoints:
-                            if message_id == checkpoint["last_message_id"]:
-                                print("Channel checkpoint reached.")
-                                checkpoint_reached = True
-                                break
-                        if checkpoint_reached:
-                            break
-                        new_channel_messages_found += 1
-                        sender: Member | User
-                        receiver: User | Member
-                        for reaction in message.reactions:
-                            async for user in reaction.users():
-                                # print("Reaction found: "
-                                #       f"{reaction.emoji}: {user}.")
-                                # print(f"Message ID: {message_id}.")
-                                # print(f"{message.author}: {message.content}")
-                                sender = user
-                                receiver = message.author
-                                emoji: PartialEmoji | Emoji | str = (
-                                    reaction.emoji)
-                                await process_reaction(message_id=message_id,
-                                                       emoji=emoji,
-                                                       reacter=sender,
-                                                       message_author=receiver,
-                                                       channel_id=channel_id,
-                                                       channel=channel,
-                                                       reacter_message=message,
-                                                       greet_new_players=False)
-                    del message_id
-            except Exception as e:
-                channel_name: str = channel.name
-                print("ERROR: Error fetching messages "
-                      f"from channel {channel_name} ({channel.id}): {e}")
-            print("Messages from "
-                  f"channel {channel.name} ({channel.id}) fetched.")
-            if fresh_last_message_id is None:
-                print("WARNING: No channel messages found.")
-            else:
-                if new_channel_messages_found > 0:
-                    print(f"Saving checkpoint: {fresh_last_message_id}")
-                    g.all_channel_checkpoints[channel.id].save(
-                        fresh_last_message_id)
-                else:
-                    print("Will not save checkpoint for this channel because "
-                          "no new messages were found.")
-        print(f"Messages from guild {guild.id} ({guild}) fetched.")
-    print(missed_messages_processed_message)
-    del missed_messages_processed_message
 
+def start_missed_messages_processing(limit: int | None = None) -> None:
+    """
+    Starts processing missed messages in the background, so that new events
+    are handled in the meantime, unless it is already running.
+
+    Args:
+        limit: Limit the maximum number of messages to fetch per channel.
+            Defaults to None.
+    """
+    if (g.missed_messages_task is not None and
+            not g.missed_messages_task.done()):
+        print("Missed messages are already being processed.")
+        return
+    g.missed_messages_task = asyncio.create_task(
+        process_missed_messages(limit=limit))
 # endregion
@@ -1,29 +1,35 @@
 # region Imports
 # Standard Library
 from random import shuffle
-from typing import List, Literal, Sequence
+from typing import Dict, List, Literal, Sequence, Tuple
 
 # Third party
 from discord import (Member, Message, Emoji, PartialEmoji, Permissions, User,
                      TextChannel, VoiceChannel, CategoryChannel, ForumChannel,
-                     StageChannel, Thread, Guild, AllowedMentions)
+                     StageChannel, Thread, Guild, AllowedMentions, NotFound)
 from discord.abc import PrivateChannel
 from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
     Bot)
 from discord.reaction import Reaction
 
 # Local
-from schemas.data_classes import ReactionUser
+from schemas.data_classes import ReactionUser, TransactionReceipt
+from schemas.typed import PendingTransaction, PreparedReaction, ReactionEvent
 import core.global_state as g
 from core.terminate_bot import terminate_bot
 from models.log import Log
+from models.mention_preferences import MentionPreferenceIndex
 from models.message_mining_registry import MessageMiningRegistryManager
 from models.user_save_data import UserSaveData
-from utils.blockchain_utils import (add_block_transaction,
-                                    get_last_block_timestamp)
+from utils.blockchain_utils import add_block_transactions, validate_blockchain
 from utils.formatting import format_coin_label
 # endregion
 
+# region Types
+# The timestamp of the block a log message belongs to, and the message
+LogMessage = Tuple[float | None, str]
+# endregion
+
 # region Coin reaction
 
 
@@ -42,6 +48,7 @@ async def process_reaction(message_id: int,
                            greet_new_players: bool = True) -> None:
     """
     Processes a reaction event to possibly mine a coin for a message author.
+    See `process_reactions()`.
 
     Args:
         emoji: The emoji used in the reaction.
@@ -50,253 +57,408 @@ async def process_reaction(message_id: int,
         message_author_id: The ID of the user who receives the coin. Defaults
             to None.
     """
-    # TODO Update docstring
-    # region Assertions
-    assert isinstance(g.bot, Bot), "g.bot has not been initialized."
-    assert g.blockchain is not None and hasattr(
-        g.blockchain, "add_block"), (
-            "g.blockchain has not been initialized.")
-    assert isinstance(g.log, Log), "g.log has not been initialized."
-    assert isinstance(g.message_mining_registry,
-                      MessageMiningRegistryManager), (
-        "g.message_mining_registry has not been initialized.")
-    # endregion
+    await process_reactions([{"message_id": message_id,
+                              "emoji": emoji,
+                              "reacter": reacter,
+                              "channel_id": channel_id,
+                              "reacter_message": reacter_message,
+                              "channel": channel,
+                              "message_author": message_author,
+                              "message_author_id": message_author_id,
+                              "timestamp": timestamp,
+                              "greet_new_players": greet_new_players}])
 
-    # region Checks & variables
-    emoji_id: int | str | None = 0
-    match emoji:
-        case Emoji():
-            emoji_id = emoji.id
-        case PartialEmoji() if emoji.id is not None:
-            emoji_id = emoji.id
-        case PartialEmoji():
-            return
-        case str():
-            return
-    if emoji_id != g.coin_emoji_id:
-        return
 
-    if message_author is None:
-        # Get message author from id
-        if message_author_id is not None:
-            message_author = await g.bot.fetch_user(message_author_id)
-        else:
-            raise ValueError("message_author_id is None.")
-    else:
-        message_author_id = message_author.id
+async def process_reactions(events: List[ReactionEvent]) -> None:
+    """
+    Processes reactions to the same message to possibly mine coins for the
+    message author, in the order they were added.
 
-    # Common variables (1/3)
-    reacter_id: int = reacter.id
+    The reactions are processed together: all their payouts are added as
+    a single block, and network mining posts a single mining update.
+    Each reacter earns, and makes the earlier miners earn, the same coins as
+    if the reactions had been processed one at a time.
 
-    if reacter_id == message_author_id:
+    Args:
+        events: The reaction events, all for the same message.
+    """
+    prepared_reactions: List[PreparedReaction] = (
+        await prepare_reactions(events))
+    if len(prepared_reactions) == 0:
         return
 
-    # Common variables (2/3)
-    reacter_name: str = reacter.name
-    reacter_save_data: UserSaveData = UserSaveData(
-        user_id=reacter_id, user_name=reacter_name)
-
-    # Check if the user has mined for the message already
-    message_mined_data: str | List[int] | bool | float | None = (
-        reacter_save_data.load("messages_mined"))
-    message_mined: List[int] = (
-        message_mined_data if isinstance(message_mined_data, list) else [])
-    if message_id in message_mined:
+    # region Register
+    # Add the message ID to the users' lists of messages mined for
+    # Doing this before rather than after the transaction
+    # as an anti-cheating precaution
+    registered_reactions: List[PreparedReaction] = []
+    for prepared_reaction in prepared_reactions:
+        if prepared_reaction["reacter_save_data"].add_mined_message(
+                prepared_reaction["message_id"]):
+            registered_reactions.append(prepared_reaction)
+        # Otherwise, the reacter mined the message while it was being fetched
+    if len(registered_reactions) == 0:
         return
+    # endregion
 
-    # Common variables (3/3)
-    message_author_name: str = message_author.name
-    if channel is None:
-        channel = g.bot.get_channel(channel_id)
-    last_block_timestamp: float | None = None
-    log_messages: dict[float | None, str] = {}
-    reacter_mention: str = reacter.mention
-    reacter_global_name: str | None = reacter.global_name
-    mined_for_log_message: str
+    log_messages: List[LogMessage]
+    if g.network_mining_enabled is False:
+        log_messages = await pay_classic_mining(registered_reactions)
+    else:
+        log_messages = await pay_network_mining(registered_reactions)
+    await finalize_reactions(registered_reactions, log_messages)
+# endregion
+
+# region Prepare
+
+
+async def prepare_reactions(
+        events: List[ReactionEvent]) -> List[PreparedReaction]:
+    """
+    Checks which reactions to a message can mine a coin, and fetches what is
+    needed to process them. The channel and the message are only fetched
+    once for all reactions. Nothing is saved.
+
+    Args:
+        events: The reaction events, all for the same message.
+
+    Returns:
+        List[PreparedReaction]: The reactions that can mine a coin,
+            in order.
+
+    Raises:
+        ValueError: If the message author, channel, or message could not
+            be found.
+    """
+    # region Assertions
+    assert isinstance(g.bot, Bot), "g.bot has not been initialized."
+    # endregion
+
+    prepared_reactions: List[PreparedReaction] = []
+    message_author: Member | User | None = None
+    channel: (VoiceChannel | StageChannel | ForumChannel | TextChannel |
+              CategoryChannel | Thread | PrivateChannel | None) = None
+    reacter_message: Message | None = None
     bot_channel_permissions: Permissions | None = None
     bot_can_read_history: bool | None = None
     bot_can_read_messages: bool | None = None
+    for event in events:
+        # region Checks & variables
+        emoji: PartialEmoji | Emoji | str = event["emoji"]
+        emoji_id: int | str | None = 0
+        match emoji:
+            case Emoji():
+                emoji_id = emoji.id
+            case PartialEmoji() if emoji.id is not None:
+                emoji_id = emoji.id
+            case PartialEmoji():
+                continue
+            case str():
+                continue
+        if emoji_id != g.coin_emoji_id:
+            continue
 
-    if channel is None:
-        raise ValueError("ERROR: Could not process reaction because "
-                         "channel is None.")
-    if not isinstance(channel, (VoiceChannel, TextChannel, Thread)):
-        print("WARNING: "
-              f"Skipping reaction because channel is {type(channel)}.")
-        return
+        message_id: int = event["message_id"]
+        message_author_id: int | None = event["message_author_id"]
+        if message_author is None:
+            message_author = event["message_author"]
+        if message_author is None:
+            # Get message author from id
+            if message_author_id is not None:
+                message_author = await g.bot.fetch_user(message_author_id)
+            else:
+                raise ValueError("message_author_id is None.")
+        message_author_id = message_author.id
 
-    if reacter_message is None:
-        # TODO Check which permissions are needed to fetch a message
-        bot_channel_permissions = channel.permissions_for(channel.guild.me)
-        bot_can_read_history = bot_channel_permissions.read_message_history
-        if not bot_can_read_history:
-            print("WARNING: Will not send reaction message "
-                  "because bot does not have permission to read message "
-                  f"history in channel {channel}.")
-            return
-        bot_can_read_messages = bot_channel_permissions.read_messages
-        if not bot_can_read_messages:
-            print("WARNING: Will not send reaction message "
-                  "because bot does not have permission to read messages "
-                  f"in channel {channel}.")
-            return
-        try:
-            reacter_message = await channel.fetch_message(message_id)
-        except Exception as e:
-            raise ValueError("ERROR: "
-                             f"Could not fetch message {message_id}: {e}")
-    # endregion
+        reacter: Member | User = event["reacter"]
+        reacter_id: int = reacter.id
 
-    # region Register
-    # Add the message ID to the user's list of messages mined for
-    # Doing this before rather than after the transaction
-    # as an anti-cheating precaution
-    message_mined.append(message_id)
-    reacter_save_data.save(key="messages_mined", value=message_mined)
+        if reacter_id == message_author_id:
+            continue
+
+        reacter_name: str = reacter.name
+        reacter_save_data: UserSaveData = UserSaveData(
+            user_id=reacter_id, user_name=reacter_name)
+
+        # Check if the user has mined for the message already
+        if reacter_save_data.has_mined_message(message_id):
+            continue
+
+        channel_id: int = event["channel_id"]
+        if channel is None:
+            channel = event["channel"]
+        if channel is None:
+            channel = g.bot.get_channel(channel_id)
+
+        if channel is None:
+            raise ValueError("ERROR: Could not process reaction because "
+                             "channel is None.")
+        if not isinstance(channel, (VoiceChannel, TextChannel, Thread)):
+            print("WARNING: "
+                  f"Skipping reaction because channel is {type(channel)}.")
+            return []
+
+        if reacter_message is None:
+            reacter_message = event["reacter_message"]
+        if reacter_message is None:
+            # TODO Check which permissions are needed to fetch a message
+            bot_channel_permissions = channel.permissions_for(
+                channel.guild.me)
+            bot_can_read_history = (
+                bot_channel_permissions.read_message_history)
+            if not bot_can_read_history:
+                print("WARNING: Will not send reaction message "
+                      "because bot does not have permission to read message "
+                      f"history in channel {channel}.")
+                return []
+            bot_can_read_messages = bot_channel_permissions.read_messages
+            if not bot_can_read_messages:
+                print("WARNING: Will not send reaction message "
+                      "because bot does not have permission to read "
+                      f"messages in channel {channel}.")
+                return []
+            try:
+                reacter_message = await channel.fetch_message(message_id)
+            except Exception as e:
+                raise ValueError("ERROR: "
+                                 f"Could not fetch message {message_id}: {e}")
+        # endregion
+        prepared_reactions.append({
+            "message_id": message_id,
+            "reacter": reacter,
+            "reacter_save_data": reacter_save_data,
+            "message_author": message_author,
+            "message_author_id": message_author_id,
+            "channel_id": channel_id,
+            "channel": channel,
+            "reacter_message": reacter_message,
+            "bot_channel_permissions": bot_channel_permissions,
+            "timestamp": event["timestamp"],
+            "greet_new_players": event["greet_new_players"]})
+    return prepared_reactions
+# endregion
+
+# region Payout
+
+
+async def pay_classic_mining(
+        prepared_reactions: List[PreparedReaction]) -> List[LogMessage]:
+    """
+    Mines 1 coin for the message author for each reaction, in a single block.
+
+    Args:
+        prepared_reactions: The registered reactions, all for the
+            same message.
+
+    Returns:
+        List[LogMessage]: The log messages of the mining.
+    """
+    # region Assertions
+    assert g.blockchain is not None and hasattr(
+        g.blockchain, "add_block"), (
+            "g.blockchain has not been initialized.")
     # endregion
 
-    if g.network_mining_enabled is False:
-        # region Classic mining
+    # region Classic mining
+    pending_transactions: List[PendingTransaction] = []
+    mined_for_log_messages: List[str] = []
+    for prepared_reaction in prepared_reactions:
+        reacter: Member | User = prepared_reaction["reacter"]
+        reacter_id: int = reacter.id
+        message_author: Member | User = prepared_reaction["message_author"]
+        message_author_id: int = prepared_reaction["message_author_id"]
         print(f"{reacter} ({reacter_id}) is mining 1 {g.coin} "
               f"for {message_author} ({message_author_id})...")
+        pending_transactions.append({"sender": reacter,
+                                     "receiver": message_author,
+                                     "amount": 1,
+                                     "method": "reaction"})
+        mined_for_log_messages.append(
+            f"{reacter} ({reacter_id}) mined 1 {g.coin} "
+            f"for {message_author} ({message_author_id}).")
 
-        await add_block_transaction(blockchain=g.blockchain,
-                                    sender=reacter,
-                                    receiver=message_author,
-                                    amount=1,
-                                    method="reaction")
-
-        # Set variables for logging
-        last_block_timestamp = get_last_block_timestamp()
-        mined_for_log_message = (f"{reacter} ({reacter_id}) mined 1 {g.coin} "
-                                 f"for {message_author} "
-                                 f"({message_author_id}).")
-        log_messages[last_block_timestamp] = mined_for_log_message
-        del last_block_timestamp
-        del mined_for_log_message
-        # endregion
-    else:
-        # region Network mining
-        print("--------------------")
-        print(f"Contributor {reacter} ({reacter_id}) is mining for "
+    receipt: TransactionReceipt = await add_block_transactions(
+        blockchain=g.blockchain,
+        transactions=pending_transactions)
+
+    # Set variables for logging
+    last_block_timestamp: float | None = receipt.timestamp
+    del receipt
+    return [(last_block_timestamp, mined_for_log_message)
+            for mined_for_log_message in mined_for_log_messages]
+    # endregion
+
+
+async def pay_network_mining(
+        prepared_reactions: List[PreparedReaction]) -> List[LogMessage]:
+    """
+    Pays out network mining for the reactions to a message, and posts
+    a mining update for all of them.
+
+    The payouts are calculated for each reaction in turn, exactly as if it
+    were the only new reaction: the message author and every earlier miner
+    earn one coin less than the participant before them. All payouts are
+    added as a single block.
+
+    The mining update is posted when the message first has more than one
+    miner, and the highlight when it first has five. After that, the
+    posted messages are edited instead.
+
+    Args:
+        prepared_reactions: The registered reactions, all for the
+            same message, in order.
+
+    Returns:
+        List[LogMessage]: The log messages of the mining.
+    """
+    # region Assertions
+    assert isinstance(g.bot, Bot), "g.bot has not been initialized."
+    assert g.blockchain is not None and hasattr(
+        g.blockchain, "add_block"), (
+            "g.blockchain has not been initialized.")
+    assert isinstance(g.message_mining_registry,
+                      MessageMiningRegistryManager), (
+        "g.message_mining_registry has not been initialized.")
+    assert isinstance(g.mention_preference_index,
+                      MentionPreferenceIndex), (
+        "g.mention_preference_index has not been initialized.")
+    # endregion
+
+    # region Network mining
+    first_reaction: PreparedReaction = prepared_reactions[0]
+    message_id: int = first_reaction["message_id"]
+    message_author: Member | User = first_reaction["message_author"]
+    message_author_id: int = first_reaction["message_author_id"]
+    message_author_name: str = message_author.name
+    channel_id: int = first_reaction["channel_id"]
+    reacter_message: Message = first_reaction["reacter_message"]
+    log_messages: List[LogMessage] = []
+    new_miners: List[Member | User] = [
+        prepared_reaction["reacter"]
+        for prepared_reaction in prepared_reactions]
+    new_miner_ids: List[int] = [new_miner.id for new_miner in new_miners]
+    print("--------------------")
+    for new_miner in new_miners:
+        print(f"Contributor {new_miner} ({new_miner.id}) is mining for "
               f"{message_author} ({message_author_id}) "
               f"(message {message_id})...")
 
-        # Find any existing miners for the message
-        coin_reacters: List[Member | User | ReactionUser] = []
-        coin_reacters_from_registry: List[ReactionUser] = (
-            g.message_mining_registry.get_reacters(message_id, sort=True))
-        # Add reactions missing from the registry
-        # They are sorted by user ID in descending order and cannot be
-        # sorted chronologically (at least with Discord.py 2.5.2)
-        # As missing reactions likely are from before the network mining
-        # update, we place them before the new miner
-        reactions: List[Reaction] = reacter_message.reactions
-        coin_reacters_from_discord: List[Member | User | ReactionUser] = []
-        for reaction in reactions:
-            reaction_emoji: PartialEmoji | Emoji | str = reaction.emoji
-            if not isinstance(reaction_emoji, (Emoji, PartialEmoji)):
-                continue
-            reaction_emoji_id: int | None = reaction_emoji.id
-            if reaction_emoji_id == g.coin_emoji_id:
-                coin_reacters_ids: List[int] = [
-                    r.id for r in coin_reacters_from_registry]
-                async for user in reaction.users():
-                    user_id: int = user.id
-                    if ((user_id not in coin_reacters_ids) and
-                        (user_id != message_author_id) and
-                            (user_id != reacter_id)):
-                        coin_reacters_from_discord.append(user)
-                break
-        # Randomize the order of the old reacters
-        # (otherwise the ones with lowest user ids would get most coins,
-        # which would be unfair if it doesn't correlate with the order they
-        # reacted in)
-        shuffle(coin_reacters_from_discord)
-        # Add them to the mining registry so that the order can be preserved
-        # (otherwise the reacters are shuffled anew each time a new reaction
-        # is added, which would actually be fair, but it would also be
-        # confusing for the users)
-        message_timestamp: float = reacter_message.created_at.timestamp()
-        if timestamp is None:
-            raise ValueError("ERROR: Timestamp is None.")
-        coin_reacters_from_discord_count: int = len(coin_reacters_from_discord)
-        for i, coin_reacter in enumerate(coin_reacters_from_discord):
-            coin_reacter_id: int = coin_reacter.id
-            coin_reacter_name: str = coin_reacter.name
-            coin_reacter_global_name: str | None = coin_reacter.global_name
-            coin_reacter_mention: str = coin_reacter.mention
-            # Subtract 1 second from the message timestamp
-            # for each coin reacter
-            # so that the order is preserved
-            seconds_to_subtract: float = coin_reacters_from_discord_count - i
-            reaction_timestamp: float = timestamp - seconds_to_subtract
-            g.message_mining_registry.add_reaction(
-                message_id=message_id,
-                message_timestamp=message_timestamp,
-                message_author_id=message_author_id,
-                message_author_name=message_author_name,
-                channel_id=channel_id,
-                user_id=coin_reacter_id,
-                user_name=coin_reacter_name,
-                user_global_name=coin_reacter_global_name,
-                user_mention=coin_reacter_mention,
-                created_at=reaction_timestamp)
-        # Add the current reaction to the message mining registry
+    # Find any existing miners for the message
+    coin_reacters_from_registry: List[ReactionUser] = [
+        reacter for reacter in
+        g.message_mining_registry.get_reacters(message_id, sort=True)
+        if reacter.id not in new_miner_ids]
+    # Add reactions missing from the registry
+    # They are sorted by user ID in descending order and cannot be
+    # sorted chronologically (at least with Discord.py 2.5.2)
+    # As missing reactions likely are from before the network mining
+    # update, we place them before the new miners
+    reactions: List[Reaction] = reacter_message.reactions
+    coin_reacters_from_discord: List[Member | User | ReactionUser] = []
+    for reaction in reactions:
+        reaction_emoji: PartialEmoji | Emoji | str = reaction.emoji
+        if not isinstance(reaction_emoji, (Emoji, PartialEmoji)):
+            continue
+        reaction_emoji_id: int | None = reaction_emoji.id
+        if reaction_emoji_id == g.coin_emoji_id:
+            coin_reacters_ids: List[int] = [
+                r.id for r in coin_reacters_from_registry]
+            async for user in reaction.users():
+                user_id: int = user.id
+                if ((user_id not in coin_reacters_ids) and
+                    (user_id != message_author_id) and
+                        (user_id not in new_miner_ids)):
+                    coin_reacters_from_discord.append(user)
+            break
+    # Randomize the order of the old reacters
+    # (otherwise the ones with lowest user ids would get most coins,
+    # which would be unfair if it doesn't correlate with the order they
+    # reacted in)
+    shuffle(coin_reacters_from_discord)
+    # Add them to the mining registry so that the order can be preserved
+    # (otherwise the reacters are shuffled anew each time a new reaction
+    # is added, which would actually be fair, but it would also be
+    # confusing for the users)
+    message_timestamp: float = reacter_message.created_at.timestamp()
+    timestamp: float | None = first_reaction["timestamp"]
+    if timestamp is None:
+        raise ValueError("ERROR: Timestamp is None.")
+    coin_reacters_from_discord_count: int = len(coin_reacters_from_discord)
+    for i, coin_reacter in enumerate(coin_reacters_from_discord):
+        coin_reacter_id: int = coin_reacter.id
+        coin_reacter_name: str = coin_reacter.name
+        coin_reacter_global_name: str | None = coin_reacter.global_name
+        coin_reacter_mention: str = coin_reacter.mention
+        # Subtract 1 second from the message timestamp
+        # for each coin reacter
+        # so that the order is preserved
+        seconds_to_subtract: float = coin_reacters_from_discord_count - i
+        reaction_timestamp: float = timestamp - seconds_to_subtract
         g.message_mining_registry.add_reaction(
             message_id=message_id,
             message_timestamp=message_timestamp,
             message_author_id=message_author_id,
             message_author_name=message_author_name,
             channel_id=channel_id,
-            user_id=reacter_id,
-            user_name=reacter_name,
-            user_global_name=reacter_global_name,
-            user_mention=reacter_mention,
-            created_at=timestamp)
-        reacter_reaction_user: ReactionUser = ReactionUser(
-            global_name=reacter_global_name,
-            id=reacter_id,
-            name=reacter_name,
-            mention=reacter_mention)
-        # Only in the edge case that there are existing reacters
-        # for the message in the registry _and_ we discover new ones with
-        # discord.py does it matter which which list we append first.
-        # Because time does not go backwards, the existing
-        # reacters in the registry are likely to have an older timestamp than
-        # the ones we just discovered with discord.py and added to the registry
-        # with a very new timestamp. Therefore, we append the ones that were
-        # already in the registry first.
-        # Otherwise, the order will not be the same next time someone reacts
-        # and the get_reacters method sorts them for us.
-        coin_reacters.extend(coin_reacters_from_registry)
-        coin_reacters.extend(coin_reacters_from_discord)
-        coin_reacters.append(reacter_reaction_user)
-        coin_reacters_from_registry.append(reacter_reaction_user)
-
-        reacters_count: int = len(coin_reacters)
-
-        # Create dictionary for immediate handout of coins
-        earnings: dict[Member | User | ReactionUser, int] = {}
-        # Add the message author as the first entry
-        # (they should get the most coins)
-        earnings[message_author] = 0
-        for miner in coin_reacters:
-            earnings[miner] = 0
-        # Add values to the keys in the earnings dictionary
-        for i, participant in enumerate(earnings.keys()):
-            participant_id: int = participant.id
+            user_id=coin_reacter_id,
+            user_name=coin_reacter_name,
+            user_global_name=coin_reacter_global_name,
+            user_mention=coin_reacter_mention,
+            created_at=reaction_timestamp)
+    # Add the new reactions to the message mining registry
+    for prepared_reaction in prepared_reactions:
+        new_miner: Member | User = prepared_reaction["reacter"]
+        g.message_mining_registry.add_reaction(
+            message_id=message_id,
+            message_timestamp=message_timestamp,
+            message_author_id=message_author_id,
+            message_author_name=message_author_name,
+            channel_id=channel_id,
+            user_id=new_miner.id,
+            user_name=new_miner.name,
+            user_global_name=new_miner.global_name,
+            user_mention=new_miner.mention,
+            created_at=prepared_reaction["timestamp"] or timestamp)
+    # Only in the edge case that there are existing reacters
+    # for the message in the registry _and_ we discover new ones with
+    # discord.py does it matter which which list we append first.
+    # Because time does not go backwards, the existing
+    # reacters in the registry are likely to have an older timestamp than
+    # the ones we just discovered with discord.py and added to the registry
+    # with a very new timestamp. Therefore, we append the ones that were
+    # already in the registry first.
+    # Otherwise, the order will not be the same next time someone reacts
+    # and the get_reacters method sorts them for us.
+    earlier_miners: List[Member | User | ReactionUser] = []
+    earlier_miners.extend(coin_reacters_from_registry)
+    earlier_miners.extend(coin_reacters_from_discord)
+
+    # The message author is the first participant
+    # (they should get the most coins)
+    participants: List[Member | User | ReactionUser] = [message_author]
+    participants.extend(earlier_miners)
+    # The coins each participant earns from the new reactions,
+    # keyed by user ID
+    batch_earnings: Dict[int, int] = {}
+
+    # Collect the payouts and set variables for logging
+    pending_transactions: List[PendingTransaction] = []
+    earned_messages: List[str] = []
+    for prepared_reaction in prepared_reactions:
+        reacter: Member | User = prepared_reaction["reacter"]
+        reacter_id: int = reacter.id
+        reacter_name: str = reacter.name
+        participants.append(reacter)
+        reacters_count: int = len(participants) - 1
+        for i, participant in enumerate(participants):
             # Each subsequent reacter gets one less coin than the previous one
             # The most recent one (the "reacter") gets 0 coins
-            coins_to_give: int = reacters_count - i
-            earnings[participant] = coins_to_give
-
-        # Add transaction blocks and set variables for logging
-        for i, (participant, coins) in enumerate(earnings.items()):
-            # Add block
+            coins: int = reacters_count - i
+            participant_id: int = participant.id
+            batch_earnings[participant_id] = (
+                batch_earnings.get(participant_id, 0) + coins)
             if coins <= 0:
                 continue
-            participant_id: int = participant.id
             participant_name: str = participant.name
             coin_label: str = format_coin_label(coins)
             method: Literal["reaction", "reaction_network"]
@@ -314,17 +476,10 @@ async def process_reaction(message_id: int,
                       f"miner #{i} {participant_name} ({participant_id}) "
                       f"is earning {coins} {coin_label} from having mined for "
                       f"the same message earlier (message {message_id}).")
-            await add_block_transaction(blockchain=g.blockchain,
-                                        sender=reacter,
-                                        receiver=participant,
-                                        amount=coins,
-                                        method=method)
-
-            # Set variables for logging
-            last_block_timestamp = get_last_block_timestamp()
-            if last_block_timestamp is None:
-                print("ERROR: Could not get last block timestamp.")
-                await terminate_bot()
+            pending_transactions.append({"sender": reacter,
+                                         "receiver": participant,
+                                         "amount": coins,
+                                         "method": method})
             earned_message: str
             if participant_id == message_author_id:
                 earned_message = (
@@ -339,138 +494,220 @@ async def process_reaction(message_id: int,
                     f"and miner #{i} {participant_name} ({participant_id}) "
                     f"earned {coins} {coin_label} from having mined for the "
                     f"same message earlier (message {message_id}).")
-            log_messages[last_block_timestamp] = earned_message
-            del last_block_timestamp
+            earned_messages.append(earned_message)
             del earned_message
 
-        allowed_network_mining_mentions_seq: (
-            Sequence[Member | User | ReactionUser]) = []
-        allowed_network_mining_highlights_mentions_seq: (
-            Sequence[Member | User | ReactionUser]) = []
-        allowed_network_mining_mentions: AllowedMentions = (
-            AllowedMentions.none())
-        allowed_network_mining_highlights_mentions: AllowedMentions = (
-            AllowedMentions.none())
-        mining_update_message_content: str | None = None
-        if reacters_count > 1:
-            # Make an update in the mining updates channel
-            mining_channel: (VoiceChannel | StageChannel | ForumChannel |
-                             TextChannel | CategoryChannel | Thread |
+    # Add all payouts of the reactions as a single block
+    network_receipt: TransactionReceipt = await add_block_transactions(
+        blockchain=g.blockchain,
+        transactions=pending_transactions)
+    del pending_transactions
+    last_block_timestamp: float | None = network_receipt.timestamp
+    del network_receipt
+    for earned_message in earned_messages:
+        log_messages.append((last_block_timestamp, earned_message))
+    del last_block_timestamp
+    del earned_messages
+
+    reacters_count = len(participants) - 1
+    allowed_network_mining_mentions_seq: (
+        Sequence[Member | User | ReactionUser]) = []
+    allowed_network_mining_highlights_mentions_seq: (
+        Sequence[Member | User | ReactionUser]) = []
+    allowed_network_mining_mentions: AllowedMentions = (
+        AllowedMentions.none())
+    allowed_network_mining_highlights_mentions: AllowedMentions = (
+        AllowedMentions.none())
+    mining_update_message_content: str | None = None
+    if reacters_count > 1:
+        # Make an update in the mining updates channel
+        mining_channel: (VoiceChannel | StageChannel | ForumChannel |
+                         TextChannel | CategoryChannel | Thread |
+                         PrivateChannel |
+                         None) = g.bot.get_channel(
+            g.mining_updates_channel_id)
+        if mining_channel is None:
+            print("WARNING: Will not send mining update "
+                  "because mining_channel is None.")
+        elif not isinstance(
+                mining_channel, (VoiceChannel, TextChannel, Thread)):
+            print("WARNING: Will not send mining update "
+                  f"because mining_channel is {type(mining_channel)}.")
+        else:
+            # Calculate how many coins the coins each miner has earned from
+            # the message since the message's first reaction
+            earnings_since_start: Dict[int, int] = {
+                participant.id: 0 for participant in participants}
+            for reaction in range(len(participants)):
+                for i in range(reaction):
+                    participant: Member | User | ReactionUser = (
+                        participants[i])
+                    coins_to_give: int = reaction - i
+                    earnings_since_start[participant.id] += coins_to_give
+            earnings_since_start_total: int = (
+                sum(earnings_since_start.values()))
+            # Set content for the mining update message
+            coin_label: str = (
+                format_coin_label(earnings_since_start_total))
+            participants_table: str = ""
+            for i, participant in enumerate(participants):
+                participant_id: int = participant.id
+                participant_mention_preference: bool
+                participant_highlights_mention_preference: bool
+                (participant_mention_preference,
+                 participant_highlights_mention_preference) = (
+                    g.mention_preference_index.get(
+                        participant_id, participant.name))
+                if ((participant_mention_preference is True) and
+                        (participant_id not in new_miner_ids)):
+                    allowed_network_mining_mentions_seq.append(participant)
+                if ((participant_highlights_mention_preference is True) and
+                        (participant_id not in new_miner_ids)):
+                    allowed_network_mining_highlights_mentions_seq.append(
+                        participant)
+                participant_mention: str = participant.mention
+                coins_since_start: int = earnings_since_start[participant_id]
+                participant_coins: int = batch_earnings.get(participant_id, 0)
+                title: str = ("Author"
+                              if participant_id == message_author_id
+                              else f"Contributor #{i}")
+                participants_table += (
+                    f"{title}: {participant_mention}: "
+                    f"{coins_since_start} (+{participant_coins})\n")
+            # The type checker expects the value of the users parameter
+            # to be a boolean or a sequence of snowflakes. In reality, it
+            # does not need to be a proper snowflake, as long as it has
+            # an "id" attribute. Adding diagnostic suppression is the
+            # easiest solution.
+            allowed_network_mining_mentions = (
+                AllowedMentions(
+                    users=(
+                        allowed_network_mining_mentions_seq
+                    )  # pyright: ignore[reportArgumentType]
+                ))
+            allowed_network_mining_highlights_mentions = (
+                AllowedMentions(
+                    users=(allowed_network_mining_highlights_mentions_seq
+                           )  # pyright: ignore[reportArgumentType]
+                ))
+            message_author_mention: str = message_author.mention
+            mining_update_message_content = (
+                f"A total of {earnings_since_start_total} {coin_label} "
+                f"has been mined for {message_author_mention}'s message!\n"
+                f"{participants_table}")
+            del coin_label
+            await publish_mining_update(
+                message_id=message_id,
+                reacter_message=reacter_message,
+                update_channel=mining_channel,
+                registry_key="mining_update_message_id",
+                content=mining_update_message_content,
+                allowed_mentions=allowed_network_mining_mentions)
+    if reacters_count >= 5:
+        highlights_channel: (VoiceChannel | StageChannel |
+                             ForumChannel | TextChannel |
+                             CategoryChannel | Thread |
                              PrivateChannel |
                              None) = g.bot.get_channel(
-                g.mining_updates_channel_id)
-            if mining_channel is None:
-                print("WARNING: Will not send mining update "
-                      "because mining_channel is None.")
-            elif not isinstance(
-                    mining_channel, (VoiceChannel, TextChannel, Thread)):
-                print("WARNING: Will not send mining update "
-                      f"because mining_channel is {type(mining_channel)}.")
-            else:
-                # Calculate how many coins the coins each miner has earned from
-                # the message since the message's first reaction
-                earnings_since_start: (
-                    dict[Member | User | ReactionUser, int]) = {}
-                earnings_since_start = {
-                    participant: 0 for participant in earnings.keys()}
-                participants = list(earnings.keys())
-                for reaction in range(len(earnings.keys())):
-                    for i in range(reaction):
-                        participant: Member | User | ReactionUser = (
-                            participants[i])
-                        coins_to_give: int = reaction - i
-                        earnings_since_start[participant] += coins_to_give
-                earnings_since_start_total: int = (
-                    sum(earnings_since_start.values()))
-                # Set content for the mining update message
-                coin_label: str = (
-                    format_coin_label(earnings_since_start_total))
-                participants_table: str = ""
-                for i, (participant, participant_coins) in enumerate(
-                        earnings.items()):
-                    participant_id: int = participant.id
-                    participant_save_data: UserSaveData = UserSaveData(
-                        user_id=participant.id,
-                        user_name=participant.name)
-                    participant_mention_preference: bool = (
-                        participant_save_data
-                        .network_mining_mentions_enabled)
-                    if ((participant_mention_preference is True) and
-                            (participant_id != reacter_id)):
-                        allowed_network_mining_mentions_seq.append(participant)
-                    participant_highlights_mention_preference: bool = (
-                        participant_save_data
-                        .network_mining_highlights_mentions_enabled)
-                    if ((participant_highlights_mention_preference is True) and
-                            (participant_id != reacter_id)):
-                        allowed_network_mining_highlights_mentions_seq.append(
-                            participant)
-                    participant_mention: str = participant.mention
-                    coins_since_start: int = earnings_since_start[participant]
-                    participant_id: int = participant.id
-                    title: str = ("Author"
-                                  if participant_id == message_author_id
-                                  else f"Contributor #{i}")
-                    participants_table += (
-                        f"{title}: {participant_mention}: "
-                        f"{coins_since_start} (+{participant_coins})\n")
-                # The type checker expects the value of the users parameter
-                # to be a boolean or a sequence of snowflakes. In reality, it
-                # does not need to be a proper snowflake, as long as it has
-                # an "id" attribute. Adding diagnostic suppression is the
-                # easiest solution.
-                allowed_network_mining_mentions = (
-                    AllowedMentions(
-                        users=(
-                            allowed_network_mining_mentions_seq
-                        )  # pyright: ignore[reportArgumentType]
-                    ))
-                allowed_network_mining_highlights_mentions = (
-                    AllowedMentions(
-                        users=(allowed_network_mining_highlights_mentions_seq
-                               )  # pyright: ignore[reportArgumentType]
-                    ))
-                message_author_mention: str = message_author.mention
-                mining_update_message_content = (
-                    f"A total of {earnings_since_start_total} {coin_label} "
-                    f"has been mined for {message_author_mention}'s message!\n"
-                    f"{participants_table}")
-                del coin_label
-                await reacter_message.forward(mining_channel)
-                await mining_channel.send(
-                    mining_update_message_content,
-                    allowed_mentions=(
-                        allowed_network_mining_mentions))
-        if reacters_count >= 5:
-            highlights_channel: (VoiceChannel | StageChannel |
-                                 ForumChannel | TextChannel |
-                                 CategoryChannel | Thread |
-                                 PrivateChannel |
-                                 None) = g.bot.get_channel(
-                g.mining_highlights_channel_id)
-            if highlights_channel is None:
-                print("WARNING: Will not forward mining update "
-                      "to highlights_channel because highlights_channel is "
-                      "None.")
-            elif not isinstance(
-                    highlights_channel, (VoiceChannel, TextChannel, Thread)):
-                print("WARNING: Will not forward mining update "
-                      f"to highlights_channel because highlights_channel is "
-                      f"{type(highlights_channel)}.")
-            elif mining_update_message_content is None:
-                print("WARNING: Will not forward mining update "
-                      "to highlights_channel because "
-                      "mining_update_message_content is None.")
-            else:
-                await reacter_message.forward(highlights_channel)
-                await highlights_channel.send(
-                    mining_update_message_content,
-                    allowed_mentions=(
-                        allowed_network_mining_highlights_mentions))
+            g.mining_highlights_channel_id)
+        if highlights_channel is None:
+            print("WARNING: Will not forward mining update "
+                  "to highlights_channel because highlights_channel is "
+                  "None.")
+        elif not isinstance(
+                highlights_channel, (VoiceChannel, TextChannel, Thread)):
+            print("WARNING: Will not forward mining update "
+                  f"to highlights_channel because highlights_channel is "
+                  f"{type(highlights_channel)}.")
+        elif mining_update_message_content is None:
+            print("WARNING: Will not forward mining update "
+                  "to highlights_channel because "
+                  "mining_update_message_content is None.")
+        else:
+            await publish_mining_update(
+                message_id=message_id,
+                reacter_message=reacter_message,
+                update_channel=highlights_channel,
+                registry_key="highlights_message_id",
+                content=mining_update_message_content,
+                allowed_mentions=allowed_network_mining_highlights_mentions)
+    return log_messages
+    # endregion
+
+
+async def publish_mining_update(
+        message_id: int,
+        reacter_message: Message,
+        update_channel: VoiceChannel | TextChannel | Thread,
+        registry_key: Literal["mining_update_message_id",
+                              "highlights_message_id"],
+        content: str,
+        allowed_mentions: AllowedMentions) -> None:
+    """
+    Posts the mining update of a message to an update channel, or edits the
+    update that was posted when the message first crossed the channel's
+    threshold. The mined message is only forwarded along with the
+    first update.
+
+    Discord does not notify users who are mentioned in an edit, so the
+    participants who want to be mentioned are only pinged when the update is
+    posted. Editing instead of posting a reply keeps each later update to a
+    single request, to stay under the rate limits.
+
+    The ID of the update is stored in the message mining registry. If the
+    update has been deleted, a new one is posted.
+
+    Args:
+        message_id: The ID of the mined message.
+        reacter_message: The mined message.
+        update_channel: The mining updates or highlights channel.
+        registry_key: The registry key of the channel's update message.
+        content: The content of the update.
+        allowed_mentions: Who to mention in the update.
+    """
+    assert isinstance(g.message_mining_registry,
+                      MessageMiningRegistryManager), (
+        "g.message_mining_registry has not been initialized.")
+    update_message_id: int | None = (
+        g.message_mining_registry.get_update_message_id(message_id,
+                                                        registry_key))
+    if update_message_id is not None:
+        try:
+            await update_channel.get_partial_message(update_message_id).edit(
+                content=content, allowed_mentions=allowed_mentions)
+            return
+        except NotFound:
+            print(f"WARNING: Mining update {update_message_id} of message "
+                  f"{message_id} not found in {update_channel}. "
+                  "A new one will be sent.")
+    await reacter_message.forward(update_channel)
+    update_message: Message = await update_channel.send(
+        content, allowed_mentions=allowed_mentions)
+    g.message_mining_registry.set_update_message_id(
+        message_id, registry_key, update_message.id)
+# endregion
+
+# region Finalize
+
+
+async def finalize_reactions(prepared_reactions: List[PreparedReaction],
+                             log_messages: List[LogMessage]) -> None:
+    """
+    Logs the mining, validates the new blocks, and informs message authors
+    about their first coin.
+
+    Args:
+        prepared_reactions: The registered reactions, all for the
+            same message.
+        log_messages: The log messages of the mining.
+    """
+    # region Assertions
+    assert isinstance(g.log, Log), "g.log has not been initialized."
+    # endregion
 
     # region Finalize mining
     # Log the mining
-    for timestamp, log_message in log_messages.items():
+    for timestamp, log_message in log_messages:
         if timestamp is None:
             print("ERROR: Could not get last block timestamp.")
             await terminate_bot()
@@ -482,29 +719,43 @@ async def process_reaction(message_id: int,
             print(f"ERROR: Error logging mining: {e}")
             await terminate_bot()
 
-    # Validate the blockchain
-    chain_validity: bool | None = None
-    try:
-        print("Validating blockchain...")
-        chain_validity = g.blockchain.is_chain_valid()
-    except Exception as e:
-        # TODO Revert blockchain to previous state
-        print(f"ERROR: Error validating blockchain: {e}")
-        chain_validity = False
+    # Validate the blocks added since the last validation
+    chain_validity: bool = await validate_blockchain()
     if chain_validity is False:
         await terminate_bot()
 
     if g.network_mining_enabled is True:
-        print(f"Contributor {reacter_name} ({reacter_id}) has mined "
-              f"for {message_author_name} ({message_author_id}) "
-              f"(message {message_id}).")
+        for prepared_reaction in prepared_reactions:
+            reacter: Member | User = prepared_reaction["reacter"]
+            message_author: Member | User = (
+                prepared_reaction["message_author"])
+            print(f"Contributor {reacter.name} ({reacter.id}) has mined "
+                  f"for {message_author.name} "
+                  f"({prepared_reaction['message_author_id']}) "
+                  f"(message {prepared_reaction['message_id']}).")
         print("--------------------")
     # endregion
 
+    for prepared_reaction in prepared_reactions:
+        await send_reaction_message(prepared_reaction)
+
+
+async def send_reaction_message(prepared_reaction: PreparedReaction) -> None:
+    """
+    Informs the message author about the coin if it's the first time they
+    receive a coin.
+
+    Args:
+        prepared_reaction: The registered reaction.
+    """
+    # region Assertions
+    assert isinstance(g.bot, Bot), "g.bot has not been initialized."
+    # endregion
+
     # region Info message
     # Inform message_author about the coin
     # if it's the first time they receive a coin
-    if not greet_new_players:
+    if not prepared_reaction["greet_new_players"]:
         return
     if g.reaction_messages_enabled is False:
         return
@@ -519,6 +770,16 @@ async def process_reaction(message_id: int,
         print(f"casino_channel_id: {g.casino_channel_id}")
         print(f"casino_channel: {g.casino_channel_id}")
         return
+    reacter: Member | User = prepared_reaction["reacter"]
+    reacter_save_data: UserSaveData = prepared_reaction["reacter_save_data"]
+    message_id: int = prepared_reaction["message_id"]
+    message_author: Member | User = prepared_reaction["message_author"]
+    message_author_id: int = prepared_reaction["message_author_id"]
+    message_author_name: str = message_author.name
+    channel: VoiceChannel | TextChannel | Thread = (
+        prepared_reaction["channel"])
+    bot_channel_permissions: Permissions | None = (
+        prepared_reaction["bot_channel_permissions"])
     mining_messages_enabled: bool = reacter_save_data.mining_messages_enabled
     if g.about_coin_formatted is None:
         error_message = ("ERROR: `g.about_coin_formatted` is None. This "
@@ -546,13 +807,13 @@ async def process_reaction(message_id: int,
     if bot_channel_permissions is None:
         # TODO Check which permissions are needed to send a message
         bot_channel_permissions = channel.permissions_for(channel.guild.me)
-    bot_can_read_history = bot_channel_permissions.read_message_history
+    bot_can_read_history: bool = bot_channel_permissions.read_message_history
     if not bot_can_read_history:
         print("WARNING: Will not send reaction message "
               "because bot does not have permission to read message "
               f"history in channel {channel}.")
         return
-    bot_can_read_messages = bot_channel_permissions.read_messages
+    bot_can_read_messages: bool = bot_channel_permissions.read_messages
     if not bot_can_read_messages:
         print("WARNING: Will not send reaction message "
               "because bot does not have permission to read messages "
@@ -625,10 +886,10 @@ async def process_reaction(message_id: int,
         del user_message
         del message_content
         del channel
-        del channel_id
         del reacter_mention
         save_data_message_author.reaction_message_received = True
     except Exception as e:
         raise ValueError(
             f"Could not send reaction message to {message_author}: {e}")
+    # endregion
 # endregion
@@ -0,0 +1,158 @@
+# region Imports
+# Standard library
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple
+
+# Local
+from schemas.typed import ReactionEvent
+from utils.process_reaction import process_reactions
+# endregion
+
+# region Types
+# A reaction event, the future to resolve when it has been processed, and
+# the event loop time until which to wait for more reactions to its message
+QueuedReaction = Tuple[ReactionEvent, "asyncio.Future[bool]", float]
+ReactionHandler = Callable[[List[ReactionEvent]], Awaitable[None]]
+# endregion
+
+# region Dispatcher
+
+
+class ReactionDispatcher:
+    """
+    Routes reaction events to a queue per message.
+
+    Each message with queued reactions has one worker task, which processes
+    the reactions to that message in the order they were dispatched.
+    Reactions to the same message therefore never interleave their reads and
+    writes of the message mining registry, while reactions to different
+    messages are processed concurrently. A worker exits as soon as its queue
+    is empty, so idle messages do not keep a task around.
+
+    After the first reaction to a message arrives, the worker waits for the
+    coalescing window to pass, and then processes all reactions queued by
+    then together, so a burst of reactions results in one payout and one
+    mining update.
+
+    Methods:
+        dispatch(event, coalescing_window):
+            Queues a reaction event for processing.
+        join():
+            Waits until all queued reactions have been processed.
+    """
+
+    def __init__(self,
+                 handler: ReactionHandler = process_reactions,
+                 coalescing_window: float = 0.0) -> None:
+        """
+        Initializes the dispatcher.
+
+        Args:
+            handler: The coroutine function that processes reactions to
+                a message. Defaults to `process_reactions()`.
+            coalescing_window: How many seconds to wait for more reactions
+                to a message before processing them. Defaults to 0.0.
+
+        Attributes:
+            handler: The coroutine function that processes reactions to
+                a message.
+            coalescing_window: The default coalescing window in seconds.
+            queues: The queued reactions of each message with a worker,
+                keyed by message ID.
+            workers: The worker task of each message, keyed by message ID.
+        """
+        self.handler: ReactionHandler = handler
+        self.coalescing_window: float = coalescing_window
+        self.queues: Dict[int, Deque[QueuedReaction]] = {}
+        self.workers: Dict[int, "asyncio.Task[None]"] = {}
+
+    def dispatch(self,
+                 event: ReactionEvent,
+                 coalescing_window: float | None = None
+                 ) -> "asyncio.Future[bool]":
+        """
+        Queues a reaction event for processing, and starts a worker for the
+        event's message if it does not have one.
+
+        Args:
+            event: The reaction event.
+            coalescing_window: How many seconds to wait for more reactions
+                to the message, if this is the first queued one, or None for
+                the dispatcher's window. Defaults to None.
+
+        Returns:
+            asyncio.Future[bool]: A future that is resolved when the event
+                has been processed, with True if it was processed without
+                errors, otherwise False. Errors are printed by the worker,
+                so the future does not have to be awaited.
+        """
+        if coalescing_window is None:
+            coalescing_window = self.coalescing_window
+        message_id: int = event["message_id"]
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        future: asyncio.Future[bool] = loop.create_future()
+        message_queue: Deque[QueuedReaction] | None = (
+            self.queues.get(message_id))
+        if message_queue is None:
+            message_queue = deque()
+            self.queues[message_id] = message_queue
+            self.workers[message_id] = asyncio.create_task(
+                self._run_worker(message_id, message_queue),
+                name=f"reaction-worker-{message_id}")
+        message_queue.append(
+            (event, future, loop.time() + coalescing_window))
+        return future
+
+    async def join(self) -> None:
+        """
+        Waits until all queued reactions have been processed. If called
+        from a worker, the worker itself is not waited for.
+        """
+        current_task: asyncio.Task[object] | None = asyncio.current_task()
+        while True:
+            workers: List[asyncio.Task[None]] = [
+                worker for worker in self.workers.values()
+                if worker is not current_task]
+            if len(workers) == 0:
+                return
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _run_worker(self,
+                          message_id: int,
+                          message_queue: Deque[QueuedReaction]) -> None:
+        """
+        Processes the queued reactions to a message until there are none
+        left, then removes the message's queue and worker.
+        """
+        batch: List[QueuedReaction] = []
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            # Nothing can be queued between the empty check and the removal
+            # of the queue, since there is no await in between
+            while len(message_queue) > 0:
+                # Wait for more reactions until the coalescing window of
+                # the first queued reaction has passed
+                delay: float = message_queue[0][2] - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                batch = list(message_queue)
+                message_queue.clear()
+                processed: bool = True
+                try:
+                    await self.handler([event for event, _, _ in batch])
+                except Exception as e:
+                    print(f"ERROR: Error processing {len(batch)} reactions "
+                          f"to message {message_id}: {e}")
+                    processed = False
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_result(processed)
+        finally:
+            del self.queues[message_id]
+            del self.workers[message_id]
+            # Let anyone waiting for the remaining reactions move on
+            for _, future, _ in batch + list(message_queue):
+                if not future.done():
+                    future.set_result(False)
+# endregion
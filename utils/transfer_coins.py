@@ -18,16 +18,16 @@ from discord.ext.commands import (  # pyright: ignore [reportMissingTypeStubs]
 
 # Local
 import core.global_state as g
+from schemas.data_classes import TransactionReceipt
 from schemas.typed import TransactionRequest
-from core.terminate_bot import terminate_bot
 from models.log import Log
 from models.transfers_waiting_approval import TransfersWaitingApproval
 from models.user_save_data import UserSaveData
-from utils.blockchain_utils import add_block_transaction
+from utils.blockchain_utils import (add_block_transaction, get_balance,
+                                    lock_account)
 from utils.donation_goal_apply_setting import apply_donation_reward
 from utils.formatting import format_coin_label
 from utils.roles import get_aml_officer_role
-from sponsorblockchain.models.block import Block
 # endregion
 
 # region Transfer
@@ -109,7 +109,7 @@ async def transfer_coins(sender: Member | User,
         return
 
     try:
-        balance = g.blockchain.get_balance(user_unhashed=sender_id)
+        balance = get_balance(sender_id)
     except Exception as e:
         bot_maintainer: User = await g.bot.fetch_user(g.bot_maintainer_id)
         bot_maintainer_mention: str = (
@@ -291,21 +291,27 @@ async def transfer_coins(sender: Member | User,
                 raise Exception(error_message)
             return
 
-    await add_block_transaction(blockchain=g.blockchain,
-                                sender=sender,
-                                receiver=receiver,
-                                amount=amount,
-                                method=method)
-    last_block: Block | None = g.blockchain.get_last_block()
-    if last_block is None:
-        print("ERROR: Last block is None.")
-        bot_maintainer: User = await g.bot.fetch_user(g.bot_maintainer_id)
-        bot_maintainer_mention: str = bot_maintainer.mention
-        await send_message(f"Error transferring {g.coins}. "
-                           f"{bot_maintainer} pls fix.")
-        await terminate_bot()
-        raise Exception("Last block is None.")
-    timestamp: float = last_block.timestamp
+    async with lock_account(sender_id):
+        # Check the balance again, since the sender may have spent coins
+        # while this transfer was waiting for a response
+        balance = get_balance(sender_id)
+        if balance is None or balance < amount:
+            print(f"{sender} ({sender_id}) no longer has enough {g.coins} "
+                  f"to transfer {amount} {coin_label_a} "
+                  f"to {receiver} ({receiver_id}). Balance: {balance}.")
+            await send_message(
+                f"You no longer have enough {g.coins} "
+                f"to transfer {amount} {coin_label_a}.", ephemeral=True)
+            return
+        del balance
+        receipt: TransactionReceipt = await add_block_transaction(
+            blockchain=g.blockchain,
+            sender=sender,
+            receiver=receiver,
+            amount=amount,
+            method=method)
+    timestamp: float = receipt.timestamp
+    del receipt
     g.log.log(line=f"{sender} ({sender_id}) transferred "
               f"{amount} {coin_label_a} "
               f"to {receiver} ({receiver_id}).",
@@ -9,11 +9,10 @@ from discord.ui import Item, View, Button
 
 # Local
 import core.global_state as g
-from core.terminate_bot import terminate_bot
+from schemas.data_classes import TransactionReceipt
 from models.log import Log
 from models.user_save_data import UserSaveData
-from utils.blockchain_utils import (add_block_transaction,
-                                    get_last_block_timestamp)
+from utils.blockchain_utils import add_block_transaction
 from sponsorblockchain.models.blockchain import Blockchain
 # endregion
 
@@ -113,7 +112,7 @@ class StartingBonusView(View):
                 "You may now play on the slot machines. Good luck!")
             await interaction.followup.send(message_content)
             del message_content
-            await add_block_transaction(
+            receipt: TransactionReceipt = await add_block_transaction(
                 blockchain=g.blockchain,
                 sender=g.casino_house_id,
                 receiver=self.invoker,
@@ -121,15 +120,11 @@ class StartingBonusView(View):
                 method="starting_bonus"
             )
             self.save_data.starting_bonus_available = False
-            last_block_timestamp: float | None = get_last_block_timestamp()
-            if last_block_timestamp is None:
-                print("ERROR: Could not get last block timestamp.")
-                await terminate_bot()
             g.log.log(
                 line=(f"{self.invoker} ({self.invoker_id}) won "
                       f"{bonus_amount} {g.coins} from the starting bonus."),
-                timestamp=last_block_timestamp)
-            del last_block_timestamp
+                timestamp=receipt.timestamp)
+            del receipt
             self.stop()
 
     async def on_timeout(self) -> None: